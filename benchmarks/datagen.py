@@ -0,0 +1,202 @@
+"""
+Generates a synthetic dataset for benchmarks.
+
+Rooms get random equipment and capacities. Events are booked on working days, between
+8:00 and 20:00, without collisions inside a room, and some of them span several rooms. Every
+event has an owner and a few participants, so room_event and user_event fan out like in
+real use. The first RESERVED_USERS users own and attend no events. All users share the password DATASET_PASSWORD, and so does every event's edit password.
+
+Run with:
+
+    python -m benchmarks.datagen --database bench.db --rooms 1000 --events 1000000 --users 100000
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+from project.app import create_app, prepare_database
+from project.functions import hash_password
+from project.models import db, Event, Room, User, room_event_m2m, user_event_m2m
+
+DATASET_PASSWORD = "bench123"
+# The first users own and attend no events, benchmarks may revoke their tokens.
+RESERVED_USERS = 2
+BATCH_SIZE = 10000
+DAY_BEGIN_HOUR = 8
+DAY_END_HOUR = 20
+
+
+def user_email(number):
+    """
+    Returns the email of the generated user with the given number, starting at 0.
+    """
+    return f"user{number}@bench.test"
+
+
+def event_owner(dataset, event_id):
+    """
+    Returns the ID of the owner of a generated event, or None if the dataset has no owners.
+
+    Args:
+        dataset (dict): The parameters returned by generate_dataset.
+        event_id (int): The ID of the event.
+    """
+    owners = dataset["users"] - RESERVED_USERS
+    if owners <= 0:
+        return None
+    return dataset["first_user_id"] + RESERVED_USERS + (event_id - dataset["first_event_id"]) * 7919 % owners
+
+
+def insert_batches(statement, rows):
+    """
+    Inserts rows from an iterable with one executemany per BATCH_SIZE rows.
+
+    Args:
+        statement (Insert): The INSERT statement.
+        rows (iterable): Dictionaries of column values.
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(statement, batch)
+            batch = []
+    if batch:
+        db.session.execute(statement, batch)
+
+
+def generate_dataset(rooms=1000, events=1000000, users=100000, max_rooms_per_event=3, max_participants=5,
+                     start=None, seed=0):
+    """
+    Fills the database of the current application context with a synthetic dataset.
+
+    Must be called within an application context, on a database holding only the admin user.
+
+    Args:
+        rooms (int): The number of rooms.
+        events (int): The number of events.
+        users (int): The number of users, besides the admin.
+        max_rooms_per_event (int): The largest number of rooms booked by one event.
+        max_participants (int): The largest number of participants of one event, owner included.
+        start (datetime): The first day with events. Defaults to tomorrow.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        dict: The parameters of the dataset, with the day after the last event in 'end'.
+    """
+    rng = random.Random(seed)
+    start = start or datetime.combine(datetime.today() + timedelta(days=1), datetime.min.time())
+    password = hash_password(DATASET_PASSWORD)
+
+    insert_batches(db.insert(Room), ({
+        "name": f"Room {number}", "description": f"Benchmark room {number}",
+        "capacity": rng.choice((4, 8, 12, 20, 40, 100)), "projector": rng.random() < 0.6,
+        "conditioning": rng.random() < 0.5, "tv": rng.random() < 0.3, "ethernet": rng.random() < 0.7,
+        "wifi": rng.random() < 0.9, "whiteboard": rng.random() < 0.6,
+    } for number in range(rooms)))
+
+    first_user_id = db.session.execute(db.select(db.func.max(User.id))).scalar() + 1
+    insert_batches(db.insert(User), ({
+        "email": user_email(number), "firstName": "User", "lastName": str(number), "password": password,
+        "role_id": 1,
+    } for number in range(users)))
+
+    first_room_id = db.session.execute(db.select(db.func.min(Room.id))).scalar()
+    first_event_id = (db.session.execute(db.select(db.func.max(Event.id))).scalar() or 0) + 1
+    dataset = {
+        "rooms": rooms, "events": events, "users": users, "seed": seed,
+        "first_room_id": first_room_id, "first_user_id": first_user_id, "first_event_id": first_event_id,
+    }
+
+    # Each event books a run of consecutive rooms from the first free slot of the first one.
+    free_from = [start.replace(hour=DAY_BEGIN_HOUR)] * rooms
+    last_end = start
+    events_rows, room_event_rows, user_event_rows = [], [], []
+    for number in range(events):
+        room = rng.randrange(rooms)
+        booked = range(room, min(rooms, room + rng.randint(1, max_rooms_per_event)))
+        begin = max(free_from[index] for index in booked) + timedelta(minutes=15 * rng.randint(0, 4))
+        end = begin + timedelta(minutes=rng.choice((30, 45, 60, 90, 120)))
+        if end.hour >= DAY_END_HOUR or end.date() != begin.date():
+            day = begin.date() + timedelta(days=1)
+            while day.weekday() >= 5:
+                day += timedelta(days=1)
+            end = datetime.combine(day, datetime.min.time()).replace(hour=DAY_BEGIN_HOUR) + (end - begin)
+            begin = datetime.combine(day, datetime.min.time()).replace(hour=DAY_BEGIN_HOUR)
+        last_end = max(last_end, end)
+
+        event_id = first_event_id + number
+        owner = event_owner(dataset, event_id)
+        events_rows.append({"name": f"Event {number}", "description": "Benchmark event", "link": None,
+                            "editPassword": password, "begin": begin, "end": end, "ownerId": owner})
+        for index in booked:
+            free_from[index] = end
+            room_event_rows.append({"room_id": first_room_id + index, "event_id": event_id})
+        if owner is not None:
+            participants = {owner} | {first_user_id + rng.randrange(RESERVED_USERS, users)
+                                      for _ in range(rng.randint(0, max_participants - 1))}
+            user_event_rows.extend({"user_id": user_id, "event_id": event_id} for user_id in sorted(participants))
+
+        if len(events_rows) == BATCH_SIZE or number == events - 1:
+            insert_batches(db.insert(Event), events_rows)
+            insert_batches(room_event_m2m.insert(), room_event_rows)
+            insert_batches(user_event_m2m.insert(), user_event_rows)
+            events_rows, room_event_rows, user_event_rows = [], [], []
+
+    db.session.commit()
+
+    dataset["start"] = start.isoformat()
+    dataset["end"] = (last_end + timedelta(days=1)).date().isoformat()
+    return dataset
+
+
+def create_dataset_database(path, rooms=1000, events=1000000, users=100000, seed=0):
+    """
+    Creates a SQLite database file holding a synthetic dataset.
+
+    The parameters of the dataset are stored next to it, in a '.json' file read by load_dataset.
+
+    Args:
+        path (str): The path of the database file, which must not exist.
+        rooms (int): The number of rooms.
+        events (int): The number of events.
+        users (int): The number of users, besides the admin.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        dict: The parameters of the dataset.
+    """
+    app = create_app("sqlite:///" + os.path.abspath(path))
+    prepare_database(app)
+    with app.app_context():
+        dataset = generate_dataset(rooms, events, users, seed=seed)
+    with open(path + ".json", "w") as metadata:
+        json.dump(dataset, metadata)
+    return dataset
+
+
+def load_dataset(path):
+    """
+    Returns the parameters of the dataset stored in the given database file by create_dataset_database.
+    """
+    with open(path + ".json") as metadata:
+        return json.load(metadata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", required=True, help="path of the SQLite file to create")
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        parser.error(f"{args.database} already exists.")
+    print(create_dataset_database(args.database, args.rooms, args.events, args.users, args.seed))
+
+
+if __name__ == "__main__":
+    main()
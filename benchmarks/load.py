@@ -0,0 +1,394 @@
+"""
+Load-tests every route of the API on a synthetic dataset, except the Server-Sent Event streams.
+
+Each endpoint is driven on its own, first through the Flask test client in this process,
+then over HTTP by concurrent clients against a local server. Throughput and latency
+percentiles are written per endpoint to a JSON file, which --compare diffs with the file
+of another commit.
+
+The dataset is generated by benchmarks.datagen on the first run and reused afterwards.
+Endpoints that change data book far after the generated events, so they do not collide with
+them, and tokens revoked by the run belong to users reserved for it. The streams of
+/room/<id>/stream and /rooms/stream are left out: each stays open for SSE_MAX_DURATION, so
+requests per second and latencies do not describe them.
+
+Run with:
+
+    python -m benchmarks.load --database bench.db --rooms 1000 --events 1000000 --users 100000 \\
+        --output results.json
+    python -m benchmarks.load --database bench.db --output new.json --compare results.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from benchmarks.datagen import DATASET_PASSWORD, RESERVED_USERS, create_dataset_database, event_owner, \
+    load_dataset, user_email
+from benchmarks.serving import wait_until_ready
+from project.functions import encode_cursor, generate_token
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+PERCENTILES = (50, 90, 99)
+
+
+class Scenario:
+    """
+    Builds the requests sent to each endpoint from the parameters of the dataset.
+
+    Attributes:
+        dataset (dict): The parameters returned by generate_dataset.
+        endpoints (dict): Maps endpoint names to (request factory, maximal number of requests)
+            pairs. A request factory returns (method, path, body, headers) tuples, where the
+            body is sent as JSON, or as is when it is a string.
+    """
+
+    def __init__(self, dataset, seed=0):
+        self.dataset = dataset
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._start = datetime.fromisoformat(dataset["start"])
+        self._end = datetime.combine(date.fromisoformat(dataset["end"]), datetime.min.time())
+        # Reserved users own no events: the first one gets its role changed, the second one logs out.
+        self._role_user_id = dataset["first_user_id"]
+        self._logout_user_id = dataset["first_user_id"] + 1
+        self._prefix = secrets.token_hex(4)
+        self.admin = {"Authorization": f"Bearer {generate_token(1, 4, 0)}"}
+        self.endpoints = {
+            "GET /": (lambda: ("GET", "/", None, {}), None),
+            "GET /rooms": (self.get_rooms, None),
+            "GET /rooms?detail=full": (lambda: ("GET", "/rooms?detail=full", None, {}), None),
+            "GET /rooms/export": (lambda: ("GET", "/rooms/export", None, {}), 20),
+            "GET /rooms/available": (self.get_rooms_available, None),
+            "GET /room/<id>": (lambda: ("GET", f"/room/{self.room_id()}", None, {}), None),
+            "POST /room": (self.post_room, None),
+            "GET /events": (self.get_events, None),
+            "GET /events?detail=full": (lambda: self.get_events("&detail=full"), None),
+            "GET /events/export": (lambda: ("GET", "/events/export", None, {}), 3),
+            "GET /events/history": (lambda: ("GET", "/events/history?limit=50", None, {}), None),
+            "GET /events/history?roomId": (
+                lambda: ("GET", f"/events/history?limit=50&roomId={self.room_id()}", None, {}), None),
+            "GET /events/changes": (lambda: ("GET", "/events/changes?limit=100", None, {}), None),
+            "GET /event/<id>": (lambda: ("GET", f"/event/{self.event_id()}", None, {}), None),
+            "GET /room/<id>/events": (lambda: ("GET", f"/room/{self.room_id()}/events", None, {}), None),
+            "GET /room/<id>/events?day": (self.get_room_events_day, None),
+            "GET /room/<id>/events?from&to": (self.get_room_events_range, None),
+            "POST /event": (self.post_event, None),
+            "POST /events/bulk": (self.post_events_bulk, 50),
+            "POST /event?recurrence": (self.post_series, None),
+            "GET /rooms/available?series": (self.get_rooms_available_series, None),
+            "POST /admin/import/events": (self.import_events, 50),
+            "GET /admin/export/rooms": (lambda: ("GET", "/admin/export/rooms", None, self.admin), 20),
+            "PATCH /event/<id>": (self.patch_event, None),
+            "POST /event/<id>/user": (self.add_participant, None),
+            "POST /register": (self.register, None),
+            "POST /login": (self.login, None),
+            "GET /logout": (self.logout, None),
+            "GET /user": (lambda: ("GET", "/user", None, self.user_headers()), None),
+            "GET /user/events": (lambda: ("GET", "/user/events", None, self.user_headers()), None),
+            "GET /user/events/history": (
+                lambda: ("GET", "/user/events/history", None, self.user_headers()), None),
+            "PATCH /user/<id>": (self.change_role, None),
+            "GET /stats/token-cache": (lambda: ("GET", "/stats/token-cache", None, self.admin), None),
+            "GET /stats/slow-queries": (lambda: ("GET", "/stats/slow-queries", None, self.admin), None),
+            "GET /metrics": (lambda: ("GET", "/metrics", None, {}), None),
+        }
+
+    def randrange(self, start, stop):
+        with self._lock:
+            return self._rng.randrange(start, stop)
+
+    def room_id(self):
+        return self.dataset["first_room_id"] + self.randrange(0, self.dataset["rooms"])
+
+    def event_id(self):
+        return self.dataset["first_event_id"] + self.randrange(0, max(1, self.dataset["events"]))
+
+    def user_id(self):
+        return self.dataset["first_user_id"] + self.randrange(RESERVED_USERS, self.dataset["users"])
+
+    def user_headers(self, user_id=None):
+        return {"Authorization": f"Bearer {generate_token(user_id or self.user_id(), 1, 0)}"}
+
+    def dataset_time(self):
+        days = max(1, (self._end - self._start).days)
+        return self._start + timedelta(days=self.randrange(0, days), hours=self.randrange(8, 19))
+
+    def free_time(self, minutes=60):
+        # Far after the generated events, so that bookings only collide with each other.
+        begin = self._end + timedelta(days=30 + self.randrange(0, 3000), hours=self.randrange(8, 19),
+                                      minutes=15 * self.randrange(0, 4))
+        return begin.strftime(DATE_FORMAT), (begin + timedelta(minutes=minutes)).strftime(DATE_FORMAT)
+
+    def event_body(self):
+        begin, end = self.free_time()
+        return {"name": "Load test", "description": None, "link": None, "begin": begin, "end": end,
+                "roomsId": [self.room_id()]}
+
+    def get_rooms(self):
+        cursor = encode_cursor(self.room_id())
+        return "GET", f"/rooms?cursor={cursor}", None, {}
+
+    def get_rooms_available(self):
+        begin = self.dataset_time()
+        return "GET", f"/rooms/available?begin={begin.strftime(DATE_FORMAT)}&end=" \
+                      f"{(begin + timedelta(hours=1)).strftime(DATE_FORMAT)}&projector=true&capacity=8", None, {}
+
+    def get_rooms_available_series(self):
+        # In the range booked by the recurring events of the run.
+        begin, end = self.free_time()
+        return "GET", f"/rooms/available?begin={begin}&end={end}", None, {}
+
+    def post_room(self):
+        return "POST", "/room", {"name": f"Load test {next(self._counter)}", "description": None, "capacity": 10,
+                                 "projector": True, "conditioning": False, "tv": False, "ethernet": True,
+                                 "wifi": True, "whiteboard": False}, self.admin
+
+    def get_events(self, query=""):
+        cursor = encode_cursor(self.dataset_time(), 0)
+        return "GET", f"/events?cursor={cursor}{query}", None, {}
+
+    def get_room_events_day(self):
+        day = self.dataset_time()
+        return "GET", f"/room/{self.room_id()}/events?day={day.day}&month={day.month}&year={day.year}", None, {}
+
+    def get_room_events_range(self):
+        begin = self.dataset_time()
+        return "GET", f"/room/{self.room_id()}/events?from={begin.strftime(DATE_FORMAT)}&to=" \
+                      f"{(begin + timedelta(days=7)).strftime(DATE_FORMAT)}", None, {}
+
+    def post_event(self):
+        return "POST", "/event", self.event_body(), self.user_headers()
+
+    def post_events_bulk(self):
+        return "POST", "/events/bulk", {"events": [self.event_body() for _ in range(20)], "mode": "partial"}, \
+            self.user_headers()
+
+    def post_series(self):
+        return "POST", "/event", dict(self.event_body(), recurrence={"frequency": "weekly", "count": 10}), \
+            self.user_headers()
+
+    def import_events(self):
+        body = "".join(json.dumps(self.event_body()) + "\n" for _ in range(20))
+        return "POST", "/admin/import/events", body, {**self.admin, "Content-Type": "application/x-ndjson"}
+
+    def patch_event(self):
+        body = self.event_body()
+        del body["roomsId"]
+        return "PATCH", f"/event/{self.event_id()}?password={DATASET_PASSWORD}", body, {}
+
+    def add_participant(self):
+        event_id = self.event_id()
+        number = self.user_id() - self.dataset["first_user_id"]
+        return "POST", f"/event/{event_id}/user", {"email": user_email(number)}, \
+            self.user_headers(event_owner(self.dataset, event_id))
+
+    def register(self):
+        return "POST", "/register", {"email": f"load-{self._prefix}-{next(self._counter)}@bench.test",
+                                     "firstName": "Load", "lastName": "Test", "password": DATASET_PASSWORD}, {}
+
+    def login(self):
+        number = self.user_id() - self.dataset["first_user_id"]
+        return "POST", "/login", {"email": user_email(number), "password": DATASET_PASSWORD}, {}
+
+    def logout(self):
+        return "GET", "/logout", None, self.user_headers(self._logout_user_id)
+
+    def change_role(self):
+        return "PATCH", f"/user/{self._role_user_id}", {"roleId": 1 + self.randrange(0, 2)}, self.admin
+
+
+def summarize(latencies, statuses, elapsed):
+    """
+    Computes the throughput and the latency percentiles of one endpoint.
+
+    Args:
+        latencies (list): The latencies of the requests in seconds.
+        statuses (list): The status codes of the requests.
+        elapsed (float): The wall-clock duration of the run in seconds.
+
+    Returns:
+        dict: The number of requests, requests per second, percentiles in ms and status code counts.
+    """
+    latencies = sorted(latencies)
+    summary = {"requests": len(latencies), "rps": round(len(latencies) / elapsed, 1) if elapsed else None}
+    for percentile in PERCENTILES:
+        index = min(len(latencies) - 1, len(latencies) * percentile // 100)
+        summary[f"p{percentile}_ms"] = round(latencies[index] * 1000, 3)
+    summary["statuses"] = {str(status): statuses.count(status) for status in sorted(set(statuses))}
+    return summary
+
+
+def run_test_client(app, scenario, requests):
+    """
+    Sends the requests of every endpoint, one at a time, through the Flask test client.
+
+    Returns:
+        dict: The summary of each endpoint.
+    """
+    client = app.test_client()
+    results = {}
+    for name, (factory, max_requests) in scenario.endpoints.items():
+        latencies, statuses = [], []
+        count = min(requests, max_requests or requests)
+        begin = time.perf_counter()
+        for _ in range(count):
+            method, path, body, headers = factory()
+            request_begin = time.perf_counter()
+            if isinstance(body, str):
+                response = client.open(path, method=method, data=body, headers=headers)
+            else:
+                response = client.open(path, method=method, json=body, headers=headers)
+            response.get_data()
+            latencies.append(time.perf_counter() - request_begin)
+            statuses.append(response.status_code)
+        results[name] = summarize(latencies, statuses, time.perf_counter() - begin)
+    return results
+
+
+def run_http(port, scenario, requests, clients):
+    """
+    Sends the requests of every endpoint from concurrent clients to a local server.
+
+    Returns:
+        dict: The summary of each endpoint.
+    """
+    def send(factory):
+        method, path, body, headers = factory()
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        if body is not None and not isinstance(body, str):
+            headers = {**headers, "Content-Type": "application/json"}
+            body = json.dumps(body)
+        begin = time.perf_counter()
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latency = time.perf_counter() - begin
+        connection.close()
+        return latency, response.status
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for name, (factory, max_requests) in scenario.endpoints.items():
+            count = min(requests, max_requests or requests)
+            begin = time.perf_counter()
+            outcomes = list(executor.map(lambda _: send(factory), range(count)))
+            results[name] = summarize([latency for latency, _ in outcomes], [status for _, status in outcomes],
+                                      time.perf_counter() - begin)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, results):
+    """
+    Prints the change of throughput and p99 latency of each endpoint against a baseline.
+    """
+    print(f"{'mode':<8}{'endpoint':<36}{'req/s':>10}{'change':>9}{'p99 ms':>10}{'change':>9}")
+    for mode, endpoints in results["modes"].items():
+        for name, summary in endpoints.items():
+            old = baseline.get("modes", {}).get(mode, {}).get(name)
+
+            def change(key):
+                if not old or not old.get(key) or summary.get(key) is None:
+                    return "n/a"
+                return f"{(summary[key] - old[key]) / old[key]:+.0%}"
+
+            print(f"{mode:<8}{name:<36}{summary['rps']:>10}{change('rps'):>9}{summary['p99_ms']:>10}"
+                  f"{change('p99_ms'):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", help="SQLite file of the dataset, generated when missing "
+                                           "(defaults to a temporary file)")
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent HTTP clients")
+    parser.add_argument("--modes", default="client,http", help="comma-separated list of 'client' and 'http'")
+    parser.add_argument("--server", choices=("werkzeug", "uvicorn"), default="werkzeug",
+                        help="HTTP server of 'http'")
+    parser.add_argument("--port", type=int, default=5200)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="results file of a previous run to compare with")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    from project.app import create_app
+
+    directory = None
+    if args.database is None:
+        directory = tempfile.TemporaryDirectory()
+        args.database = os.path.join(directory.name, "bench.db")
+    database_uri = "sqlite:///" + os.path.abspath(args.database)
+
+    if args.serve:
+        app = create_app(database_uri)
+        app.config["TESTING"] = True
+        if args.server == "werkzeug":
+            app.run(port=args.port, threaded=True)
+        else:
+            import uvicorn
+            from a2wsgi import WSGIMiddleware
+
+            uvicorn.run(WSGIMiddleware(app, workers=args.clients), host="127.0.0.1", port=args.port,
+                        log_level="warning")
+        return
+
+    if os.path.exists(args.database):
+        dataset = load_dataset(args.database)
+    else:
+        dataset = create_dataset_database(args.database, args.rooms, args.events, args.users)
+    app = create_app(database_uri)
+
+    results = {"commit": git_commit(), "date": datetime.now().isoformat(timespec="seconds"),
+               "dataset": dataset, "requests": args.requests, "clients": args.clients, "modes": {}}
+    modes = args.modes.split(",")
+
+    if "client" in modes:
+        results["modes"]["client"] = run_test_client(app, Scenario(dataset), args.requests)
+
+    if "http" in modes:
+        server = subprocess.Popen([sys.executable, "-m", "benchmarks.load", "--serve", "--database", args.database,
+                                   "--server", args.server, "--port", str(args.port), "--clients", str(args.clients)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(args.port)
+            results["modes"]["http"] = run_http(args.port, Scenario(dataset, seed=1), args.requests, args.clients)
+        finally:
+            server.terminate()
+            server.wait()
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(json.load(baseline), results)
+    else:
+        compare({}, results)
+
+    if directory is not None:
+        directory.cleanup()
+
+
+if __name__ == "__main__":
+    main()
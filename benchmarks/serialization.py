@@ -0,0 +1,69 @@
+"""
+Measures how many event rows per second the /events list serialization handles.
+
+The 'orm' path is the one list endpoints used before: ORM objects, obj_to_dict and the built-in
+json module. The 'rows' path selects EVENT_COLUMNS as row tuples and encodes them with
+FastJSONProvider, which uses orjson when it is installed.
+
+Run with:
+
+    python -m benchmarks.serialization --rows 20000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from flask.json.provider import DefaultJSONProvider
+from project.app import create_app
+from project.json_provider import FastJSONProvider
+from project.models import db, Event
+from project.serializers import EVENT_COLUMNS, serialize_rows
+
+
+def measure(function, repeat):
+    """
+    Returns the best duration of the given function in seconds, over several runs.
+    """
+    durations = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - begin)
+    return min(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app("sqlite://")
+    day = datetime(2030, 1, 1, 8, 0)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(Event), [
+            {"name": f"Event {number}", "description": "Benchmark event", "link": None, "editPassword": "x" * 128,
+             "begin": day + timedelta(minutes=number), "end": day + timedelta(minutes=number + 30), "ownerId": None}
+            for number in range(args.rows)])
+        db.session.commit()
+
+        default_provider = DefaultJSONProvider(app)
+        fast_provider = FastJSONProvider(app)
+
+        def orm_path():
+            db.session.expunge_all()
+            events = db.session.execute(db.select(Event).order_by(Event.begin, Event.id)).scalars().all()
+            default_provider.response([event.obj_to_dict() for event in events]).get_data()
+
+        def rows_path():
+            rows = db.session.execute(db.select(*EVENT_COLUMNS).order_by(Event.begin, Event.id)).all()
+            fast_provider.response(serialize_rows(rows)).get_data()
+
+        print(f"JSON backend of FastJSONProvider: {FastJSONProvider.backend}")
+        print(f"{'path':<8}{'rows/s':>12}")
+        for name, path in (("orm", orm_path), ("rows", rows_path)):
+            print(f"{name:<8}{args.rows / measure(path, args.repeat):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
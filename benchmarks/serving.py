@@ -0,0 +1,164 @@
+"""
+Compares the threaded Werkzeug server and uvicorn (see project.asgi) as HTTP front ends.
+
+Both run the synchronous application in a pool of threads, so the comparison measures how
+connections are accepted and dispatched, not a different way of executing requests.
+
+Each mode serves a fresh file-backed database in its own process. Concurrent clients then send
+a mix of room listings, room details and logins, and the number of requests per second and the
+latency percentiles are reported for each mode.
+
+Run with:
+
+    python -m benchmarks.serving --clients 32 --requests 2000
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = ("werkzeug", "uvicorn")
+ROOMS = 200
+
+
+def serve(mode, port, database_uri):
+    """
+    Serves the application in the given mode until the process is killed.
+
+    Args:
+        mode (str): 'werkzeug' for the threaded Werkzeug server, 'uvicorn' for uvicorn.
+        port (int): The port to listen on.
+        database_uri (str): The URI of the database.
+    """
+    from project.app import create_app, prepare_database
+    from project.functions import hash_password
+    from project.models import db, Room, User
+
+    if mode == "werkzeug":
+        app = create_app(database_uri)
+    else:
+        from project.asgi import create_asgi_app
+
+        asgi_app = create_asgi_app(database_uri)
+        app = asgi_app.app
+
+    prepare_database(app)
+    with app.app_context():
+        db.session.add_all([Room(name=str(number), capacity=number % 50, projector=number % 2 == 0)
+                            for number in range(ROOMS)])
+        db.session.add(User(email="bench@test.com", password=hash_password("bench123")))
+        db.session.commit()
+
+    if mode == "werkzeug":
+        app.run(port=port, threaded=True)
+    else:
+        import uvicorn
+
+        uvicorn.run(asgi_app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def send(port, method, path, body=None):
+    """
+    Sends one request and returns its latency in seconds.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    begin = time.perf_counter()
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    response.read()
+    latency = time.perf_counter() - begin
+    connection.close()
+    if response.status >= 500:
+        raise RuntimeError(f"{method} {path} failed with status {response.status}")
+    return latency
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            send(port, "GET", "/")
+            return
+        except (ConnectionError, OSError):
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start.")
+
+
+def run(port, clients, requests):
+    """
+    Sends the request mix from concurrent clients.
+
+    Returns:
+        dict: The requests per second and the p50/p99 latencies in milliseconds.
+    """
+    mix = [
+        ("GET", "/rooms?limit=50", None),
+        ("GET", "/room/1", None),
+        ("GET", "/rooms?limit=100", None),
+        ("POST", "/login", {"email": "bench@test.com", "password": "bench123"}),
+    ]
+    latencies = []
+    lock = threading.Lock()
+
+    def client(number):
+        method, path, body = mix[number % len(mix)]
+        latency = send(port, method, path, body)
+        with lock:
+            latencies.append(latency)
+
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(client, range(requests)))
+    elapsed = time.perf_counter() - begin
+
+    latencies.sort()
+    return {
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--serve", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.database)
+        return
+
+    results = {}
+    for offset, mode in enumerate(MODES):
+        port = args.port + offset
+        with tempfile.TemporaryDirectory() as directory:
+            database_uri = "sqlite:///" + os.path.join(directory, "bench.db")
+            server = subprocess.Popen([sys.executable, "-m", "benchmarks.serving", "--serve", mode,
+                                       "--port", str(port), "--database", database_uri],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_ready(port)
+                run(port, args.clients, min(args.requests, 200))
+                results[mode] = run(port, args.clients, args.requests)
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['rps']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,127 @@
+import itertools
+import math
+import queue
+import time
+import click
+from types import SimpleNamespace
 from flask_cors import CORS
-from flask import Flask, jsonify, request, abort
-from flask_login import LoginManager
+from flask import Flask, Response, g, jsonify, request, abort, stream_with_context
+import sqlalchemy as sa
 from sqlalchemy.orm.exc import NoResultFound
-from project.models import Room, Event, User, TokenBlacklist, db
+from project.models import ArchivedEvent, Room, Event, EventSeries, User, TokenBlacklist, UserTokenRevocation, db, \
+    room_event_archive_m2m, room_event_m2m, room_series_m2m, user_event_m2m, upgrade_schema
 from project.functions import *
-
-DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
-
-
-def create_app(database_uri="sqlite:///database.db"):
+from project.archive import ARCHIVED_EVENT_COLUMNS, EventArchive, add_archived_rooms
+from project.booking import BookingCoordinator, find_batch_conflicts, find_conflicting_events, \
+    find_conflicting_series, validate_event_dates
+from project.broker import ScheduleBroker
+from project.changes import ChangeFeed
+from project.identity import UserCache
+from project.json_provider import FastJSONProvider
+from project.metrics import metrics
+from project.occupancy import OccupancyIndex
+from project.recurrence import MAX_OCCURRENCES, find_series_occurrences, merge_occurrences, occurrence_to_dict, \
+    occurrences, validate_recurrence
+from project.response_cache import ResponseCache
+from project.serializers import DETAIL_LEVELS, EVENT_COLUMNS, ROOM_COLUMNS, ROOM_FEATURES, add_event_details, \
+    serialize_events, serialize_rows
+from project.revocation import RevocationList
+from project.slow_queries import SlowQueryLog
+from project.storage import configure_storage, register_pragmas
+from project.transfer import TRANSFER_FIELDS, TRANSFER_FORMATS, InvalidRecord, export_records, format_records, \
+    parse_event, parse_room, parse_series, parse_user, read_records
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+EXPORT_BATCH_SIZE = 500
+MAX_EVENTS_RANGE = timedelta(days=31)
+MAX_BULK_EVENTS = 1000
+IMPORT_BATCH_SIZE = 500
+
+
+def create_app(database_uri="sqlite:///database.db", storage_profile="production"):
     """
     Creates and configures the Flask application.
 
     Args:
         database_uri (str): The URI of the database. Defaults to "sqlite:///database.db".
+        storage_profile (str): The storage profile applied to file-backed SQLite databases,
+            'production' (default) or 'default'. See project.storage.STORAGE_PROFILES.
 
     Returns:
         Flask: The configured Flask application.
     """
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     app.secret_key = 'some key'
     app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    configure_storage(app, storage_profile)
 
     db.init_app(app)
-    CORS(app)
-
-    login_manager = LoginManager()
-    login_manager.init_app(app)
-    login_manager.login_view = 'login'
+    register_pragmas(app)
+    metrics.init_app(app)
+    with app.app_context():
+        metrics.init_engine(db.engine)
+    revocations = RevocationList(app)
+    occupancy = OccupancyIndex(app)
+    changes = ChangeFeed(app)
+    broker = ScheduleBroker(app, changes)
+    coordinator = BookingCoordinator(app)
+    room_cache = ResponseCache(app)
+    slow_queries = SlowQueryLog(app)
+    user_cache = UserCache(app)
+    archive = EventArchive(app, changes, broker)
+    CORS(app, expose_headers=["X-Next-Cursor", "ETag"])
+
+    @app.before_request
+    def reset_identity():
+        # The application context, and so flask.g, may outlive one request, e.g. in tests.
+        g.pop("claims", None)
+        g.pop("user", None)
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db():
+        """
+        Adds missing tables and indexes to an existing database.
+        """
+        upgrade_schema()
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.objects(id=user_id).first()
+    @app.cli.command("archive-events")
+    def archive_events():
+        """
+        Moves the events that ended more than ARCHIVE_HORIZON days ago to the archive tables.
+        """
+        click.echo(f"Archived {archive.archive()} events.")
+
+    @app.cli.command("import-data")
+    @click.argument("kind", type=click.Choice(list(TRANSFER_FIELDS)))
+    @click.argument("file", type=click.File("rb"))
+    @click.option("--format", "fmt", type=click.Choice(list(TRANSFER_FORMATS)),
+                  help="The format of the file, by default 'csv' for .csv files and 'ndjson' otherwise.")
+    @click.option("--restore", is_flag=True, help="Restore a backup of export-data, keeping IDs and password hashes.")
+    def import_data_command(kind, file, fmt, restore):
+        """
+        Imports rooms, events or users from a CSV or NDJSON file, see import_records.
+        """
+        fmt = fmt or ("csv" if file.name.endswith(".csv") else "ndjson")
+        results = import_records(kind, read_records(file, fmt), restore)
+        for number, result in enumerate(results, start=1):
+            if "error" in result:
+                click.echo(f"Record {number}: {result['error']}", err=True)
+        click.echo(f"Imported {sum('id' in result for result in results)} of {len(results)} {kind}.")
+
+    @app.cli.command("export-data")
+    @click.argument("kind", type=click.Choice(list(TRANSFER_FIELDS)))
+    @click.argument("file", type=click.File("wb"))
+    @click.option("--format", "fmt", type=click.Choice(list(TRANSFER_FORMATS)),
+                  help="The format of the file, by default 'csv' for .csv files and 'ndjson' otherwise.")
+    def export_data_command(kind, file, fmt):
+        """
+        Writes all rooms, events or users to a CSV or NDJSON file, in the format of import-data --restore.
+        """
+        fmt = fmt or ("csv" if file.name.endswith(".csv") else "ndjson")
+        for chunk in format_records(export_records(kind, EXPORT_BATCH_SIZE), kind, fmt):
+            file.write(chunk.encode("utf-8"))
 
     @app.route("/", methods=['GET'])
     def index():
@@ -40,21 +130,225 @@ def create_app(database_uri="sqlite:///database.db"):
         """
         return jsonify("Hello World!")
 
+    def get_page_params(default_limit, max_limit):
+        """
+        Reads the 'limit' and 'cursor' query parameters of a paginated endpoint.
+
+        Args:
+            default_limit (int): The page size used when no limit is given.
+            max_limit (int): The largest page size a client may request.
+
+        Returns:
+            int, list: The page size and the decoded cursor, or None for the first page.
+
+        Raises:
+            400: If the limit or the cursor is invalid.
+        """
+        limit = request.args.get("limit", default=default_limit, type=int)
+        if 0 > limit or limit > max_limit:
+            abort(400, description='Invalid value for limit parameter.')
+
+        cursor = request.args.get("cursor")
+        if cursor is not None:
+            cursor = decode_cursor(cursor)
+            if cursor is None:
+                abort(400, description='Invalid value for cursor parameter.')
+
+        return limit, cursor
+
+    def get_event_cursor(cursor):
+        """
+        Converts a decoded events cursor into its (begin, id) sort key.
+
+        Raises:
+            400: If the cursor does not hold an event sort key.
+        """
+        try:
+            begin, event_id = cursor
+            return datetime.fromisoformat(begin), int(event_id)
+        except (TypeError, ValueError):
+            abort(400, description='Invalid value for cursor parameter.')
+
+    def get_detail_param():
+        """
+        Reads the 'detail' query parameter selecting how much of each object is serialized.
+
+        Returns:
+            str: One of DETAIL_LEVELS, 'short' by default.
+
+        Raises:
+            400: If the detail level is invalid.
+        """
+        detail = request.args.get("detail", default="short")
+        if detail not in DETAIL_LEVELS:
+            abort(400, description='Invalid value for detail parameter.')
+        return detail
+
+    def paginated_response(items, next_cursor):
+        """
+        Creates a JSON list response with the cursor of the next page in the X-Next-Cursor header.
+
+        Args:
+            items (list): The items of the current page.
+            next_cursor (str): The cursor of the next page, or None if this is the last page.
+
+        Returns:
+            Response: The JSON response.
+        """
+        response = jsonify(items)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
+
+    def wants_ndjson():
+        """
+        Checks whether the client prefers newline-delimited JSON over a JSON list.
+
+        Returns:
+            bool: True if the Accept header favours application/x-ndjson.
+        """
+        return request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) \
+            == "application/x-ndjson"
+
+    def ndjson_response(query, serialize):
+        """
+        Streams all rows of a query as newline-delimited JSON.
+
+        Rows are fetched through a streaming cursor in batches of EXPORT_BATCH_SIZE and serialized
+        one at a time, so memory use does not depend on the size of the table.
+
+        Args:
+            query (Select): The query selecting the ORM objects to export.
+            serialize (callable): Converts an ORM object to a dictionary.
+
+        Returns:
+            Response: A streamed application/x-ndjson response.
+        """
+        def generate():
+            result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for obj in result.scalars():
+                yield app.json.dumps(serialize(obj)) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    def cached_response(cache, build):
+        """
+        Answers the request from the given response cache.
+
+        Clients sending the current ETag in If-None-Match get a 304 response without any
+        database access.
+
+        Args:
+            cache (ResponseCache): The cache of the endpoint.
+            build (callable): Creates the response when it is not cached.
+
+        Returns:
+            Response: The cached response, or a 304 response.
+        """
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        return cache.response(key, build).make_conditional(request)
+
+    @app.route("/rooms/export", methods=['GET'])
+    def export_rooms():
+        """
+        Stream all rooms with their full details as newline-delimited JSON, ordered by ID.
+
+        Returns:
+            A streamed application/x-ndjson response with one room object per line.
+        """
+        return ndjson_response(db.select(Room).order_by(Room.id), Room.obj_to_dict)
+
     @app.route("/rooms", methods=['GET'])
     def get_rooms():
         """
-        Retrieve all rooms from the database and return them as JSON.
+        Retrieve a page of rooms ordered by ID and return them as JSON.
+
+        Query Parameters:
+        - limit: The page size, between 0 and MAX_PAGE_SIZE (defaults to PAGE_SIZE)
+        - cursor: The X-Next-Cursor value of the previous page
+        - detail: 'short' (default) or 'full' for all the details of each room
+
+        Clients sending 'Accept: application/x-ndjson' receive the export of /rooms/export instead.
+        Pages are served from the room response cache, with an ETag.
+
+        Returns:
+            A JSON response containing a list of room objects.
+        """
+        if wants_ndjson():
+            return export_rooms()
+
+        return cached_response(room_cache, get_rooms_page)
+
+    def get_rooms_page():
+        """
+        Builds the /rooms response for the query parameters of the request.
+        """
+        limit, cursor = get_page_params(PAGE_SIZE, MAX_PAGE_SIZE)
+        detail = get_detail_param()
+
+        query = db.select(*ROOM_COLUMNS[detail]).order_by(Room.id).limit(limit + 1)
+        if cursor is not None:
+            if len(cursor) != 1 or not isinstance(cursor[0], int):
+                abort(400, description='Invalid value for cursor parameter.')
+            query = query.where(Room.id > cursor[0])
+
+        rooms = db.session.execute(query).all()
+        next_cursor = encode_cursor(rooms[limit - 1].id) if len(rooms) > limit > 0 else None
+
+        return paginated_response(serialize_rows(rooms[:limit]), next_cursor)
+
+    @app.route("/rooms/available", methods=['GET'])
+    def get_available_rooms():
+        """
+        Retrieve the rooms that are free for the whole given time range, ordered by ID.
+
+        Rooms are filtered on their attributes in the database, then checked against the
+        per-day occupancy index.
+
+        Query Parameters:
+        - begin: The start of the time range, in DATE_FORMAT
+        - end: The end of the time range, in DATE_FORMAT, on the same day as begin
+        - capacity: The minimal capacity of the room (optional)
+        - projector, conditioning, tv, ethernet, wifi, whiteboard: 'true' or 'false' (optional)
 
         Returns:
             A JSON response containing a list of room objects.
+
+        Raises:
+            400: If there are invalid values for the parameters.
         """
-        rooms = db.session.execute(db.select(Room)).all()
-        return jsonify([room[0].obj_to_dict_short() for room in rooms])
+        try:
+            begin = datetime.strptime(request.args.get("begin", default=""), DATE_FORMAT)
+            end = datetime.strptime(request.args.get("end", default=""), DATE_FORMAT)
+        except ValueError:
+            abort(400, description='Invalid value for date parameter.')
+        if begin >= end or begin.date() != end.date():
+            abort(400, description='Invalid value for date parameter.')
+
+        query = db.select(Room).order_by(Room.id)
+        capacity = request.args.get("capacity")
+        if capacity is not None:
+            try:
+                query = query.where(Room.capacity >= int(capacity))
+            except ValueError:
+                abort(400, description='Invalid value for capacity parameter.')
+        for feature in ROOM_FEATURES:
+            value = request.args.get(feature)
+            if value is None:
+                continue
+            if value.lower() not in ("true", "false"):
+                abort(400, description=f'Invalid value for {feature} parameter.')
+            query = query.where(getattr(Room, feature) == (value.lower() == "true"))
+
+        rooms = db.session.execute(query).scalars().all()
+        free_rooms_id = set(occupancy.find_free_rooms([room.id for room in rooms], begin, end))
+
+        return jsonify([room.obj_to_dict_short() for room in rooms if room.id in free_rooms_id])
 
     @app.route("/room/<room_id>", methods=['GET'])
     def get_room(room_id):
         """
-        Retrieve information about a specific room.
+        Retrieve information about a specific room, served from the room response cache with an ETag.
 
         Args:
             room_id (int): The ID of the room to retrieve.
@@ -65,12 +359,15 @@ def create_app(database_uri="sqlite:///database.db"):
         Raises:
             400: If the room ID is invalid.
         """
-        try:
-            room = db.session.execute(db.select(Room).filter_by(id=room_id)).scalar_one()
-        except NoResultFound:
-            abort(400, description='Invalid value for roomId parameter.')
-        else:
-            return jsonify(room.obj_to_dict())
+        def build():
+            try:
+                room = db.session.execute(db.select(Room).filter_by(id=room_id)).scalar_one()
+            except NoResultFound:
+                abort(400, description='Invalid value for roomId parameter.')
+            else:
+                return jsonify(room.obj_to_dict())
+
+        return cached_response(room_cache, build)
 
     @app.route("/room", methods=["POST"])
     def post_room():
@@ -94,20 +391,8 @@ def create_app(database_uri="sqlite:///database.db"):
         Returns:
             A JSON response indicating the success of the operation.
         """
-        token = request.headers.get('Authorization')
-        if token is None or token[:7] != 'Bearer ':
-            abort(401, description='Invalid token.')
-        else:
-            token = token[7:]
-
-        userId = get_id_from_token(token)
-        try:
-            userRoleId = db.session.execute(db.select(User.role_id).filter_by(id=userId)).scalar_one()
-        except NoResultFound:
-            abort(401, description='Invalid token.')
-        else:
-            if userRoleId not in (2, 4):
-                abort(401, description='Only Editor or Admin can add room')
+        if get_role_from_claims(get_token_claims()) not in (2, 4):
+            abort(401, description='Only Editor or Admin can add room')
 
         name = request.json["name"]
         description = request.json["description"]
@@ -123,26 +408,245 @@ def create_app(database_uri="sqlite:///database.db"):
                         conditioning=conditioning, tv=tv, ethernet=ethernet, whiteboard=whiteboard, wifi=wifi)
 
         db.session.add(new_room)
+        db.session.flush()
+        changes.record("room", [new_room.id], "insert")
         db.session.commit()
+        room_cache.bump()
+        broker.publish()
 
         return jsonify("The room has been added!")
 
+    @app.route("/events/export", methods=['GET'])
+    def export_events():
+        """
+        Stream all events as newline-delimited JSON, ordered by begin date.
+
+        Returns:
+            A streamed application/x-ndjson response with one event object per line.
+        """
+        return ndjson_response(db.select(Event).order_by(Event.begin, Event.id), Event.obj_to_dict)
+
     @app.route("/events", methods=['GET'])
     def get_events():
         """
-        Retrieve all events from the database.
+        Retrieve a page of events ordered by begin date.
+
+        Query Parameters:
+        - limit: The page size, between 0 and MAX_PAGE_SIZE (defaults to PAGE_SIZE)
+        - cursor: The X-Next-Cursor value of the previous page
+        - detail: 'short' (default) or 'full' to add the rooms and the number of participants of each event
+
+        Clients sending 'Accept: application/x-ndjson' receive the export of /events/export instead.
 
         Returns:
             A JSON response containing a list of event objects.
         """
-        events = db.session.execute(db.select(Event)).all()
-        return jsonify([event[0].obj_to_dict() for event in events])
+        if wants_ndjson():
+            return export_events()
+
+        limit, cursor = get_page_params(PAGE_SIZE, MAX_PAGE_SIZE)
+        detail = get_detail_param()
+
+        query = db.select(*EVENT_COLUMNS).order_by(Event.begin, Event.id).limit(limit + 1)
+        if cursor is not None:
+            query = query.where(sa.tuple_(Event.begin, Event.id) > get_event_cursor(cursor))
+
+        events = db.session.execute(query).all()
+        next_cursor = encode_cursor(events[limit - 1].begin, events[limit - 1].id) if len(events) > limit > 0 else None
+
+        events = serialize_rows(events[:limit])
+        if detail == "full":
+            add_event_details(events)
+        return paginated_response(events, next_cursor)
+
+    def archived_events_response(query, limit, cursor):
+        """
+        Creates the response of a page of archived events, ordered by begin date.
+
+        Args:
+            query (Select): The selection of the ARCHIVED_EVENT_COLUMNS of the events.
+            limit (int): The page size.
+            cursor (list): The decoded cursor of the page, or None for the first page.
+
+        Returns:
+            Response: The JSON response, with the rooms of each event.
+        """
+        query = query.order_by(ArchivedEvent.begin, ArchivedEvent.id).limit(limit + 1)
+        if cursor is not None:
+            query = query.where(sa.tuple_(ArchivedEvent.begin, ArchivedEvent.id) > get_event_cursor(cursor))
+
+        events = db.session.execute(query).all()
+        next_cursor = encode_cursor(events[limit - 1].begin, events[limit - 1].id) if len(events) > limit > 0 else None
+        return paginated_response(add_archived_rooms(serialize_rows(events[:limit])), next_cursor)
+
+    @app.route("/events/history", methods=['GET'])
+    def get_events_history():
+        """
+        Retrieve a page of archived events, i.e. events that ended more than ARCHIVE_HORIZON days ago.
+
+        Query Parameters:
+        - limit: The page size, between 0 and MAX_PAGE_SIZE (defaults to PAGE_SIZE)
+        - cursor: The X-Next-Cursor value of the previous page
+        - roomId: The ID of a room, to only retrieve the events held in it
+
+        Returns:
+            A JSON response containing a list of event objects with their rooms, sorted by the 'begin' attribute.
+
+        Raises:
+            400: If the room ID is invalid.
+        """
+        limit, cursor = get_page_params(PAGE_SIZE, MAX_PAGE_SIZE)
+
+        query = db.select(*ARCHIVED_EVENT_COLUMNS)
+        room_id = request.args.get("roomId")
+        if room_id is not None:
+            if not room_id.isdigit():
+                abort(400, description='Invalid value for roomId parameter.')
+            query = query.join(room_event_archive_m2m, room_event_archive_m2m.c.event_id == ArchivedEvent.id) \
+                .where(room_event_archive_m2m.c.room_id == int(room_id))
+        return archived_events_response(query, limit, cursor)
+
+    @app.route("/events/changes", methods=['GET'])
+    def get_changes():
+        """
+        Retrieve the changes to rooms, events and recurring events since a cursor.
+
+        Query Parameters:
+        - since: The X-Next-Cursor value of the previous response, omitted for all recorded changes
+        - limit: The page size, between 0 and MAX_PAGE_SIZE (defaults to MAX_PAGE_SIZE)
+
+        Returns:
+            A JSON response containing a list of changes in the order they were committed, each
+            with the current state of the changed object in 'data'. The X-Next-Cursor header is
+            always set, to the cursor to send as 'since' in the next request.
+
+        Raises:
+            400: If the limit or the cursor is invalid.
+        """
+        limit = request.args.get("limit", default=MAX_PAGE_SIZE, type=int)
+        if 0 > limit or limit > MAX_PAGE_SIZE:
+            abort(400, description='Invalid value for limit parameter.')
+
+        since = 0
+        if "since" in request.args:
+            try:
+                since, = decode_cursor(request.args["since"])
+                since = int(since)
+            except (TypeError, ValueError):
+                abort(400, description='Invalid value for since parameter.')
+
+        entries = changes.changes(since, limit)
+        return paginated_response(entries, encode_cursor(entries[-1]["seq"] if entries else since))
+
+    def event_stream_response(rooms_id):
+        """
+        Streams the changes concerning the given rooms as Server-Sent Events.
+
+        Each change of the change log is sent as a 'change' event whose id is its sequence
+        number and whose data is the change entry of GET /events/changes. A client resuming
+        with a Last-Event-ID header (or a 'lastEventId' query parameter) first receives the
+        changes it missed. A comment is sent as heartbeat every SSE_HEARTBEAT_INTERVAL seconds,
+        and the stream is closed after SSE_MAX_DURATION seconds. A client that reads too slowly
+        receives an 'overflow' event with the 'lastEventId' it received, and the stream is
+        closed; it has to reconnect to resume.
+
+        Args:
+            rooms_id (list): The IDs of the watched rooms, or None for all rooms.
+
+        Returns:
+            Response: A streamed text/event-stream response.
+
+        Raises:
+            400: If the last event ID is invalid.
+        """
+        last_event_id = request.headers.get("Last-Event-ID", request.args.get("lastEventId"))
+        try:
+            last_seq = int(last_event_id) if last_event_id is not None else None
+        except ValueError:
+            abort(400, description='Invalid value for lastEventId parameter.')
+
+        subscription = broker.subscribe(rooms_id)
+        heartbeat_interval = app.config["SSE_HEARTBEAT_INTERVAL"]
+        deadline = time.monotonic() + app.config["SSE_MAX_DURATION"]
+
+        def message(entry):
+            return f"id: {entry['seq']}\nevent: change\ndata: {app.json.dumps(entry)}\n\n"
+
+        def generate():
+            sent_seq = last_seq or 0
+            try:
+                if last_seq is not None:
+                    # The backlog is read batch by batch while it is sent, within its own
+                    # application context, so that its connection is released before the live changes.
+                    with app.app_context():
+                        for entry in broker.backfill(subscription, last_seq):
+                            sent_seq = entry["seq"]
+                            yield message(entry)
+                while time.monotonic() < deadline:
+                    if subscription.overflowed and subscription.queue.empty():
+                        yield f"event: overflow\ndata: {app.json.dumps({'lastEventId': sent_seq})}\n\n"
+                        return
+                    try:
+                        entry = subscription.queue.get(timeout=min(heartbeat_interval,
+                                                                   max(0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        yield ": heartbeat\n\n"
+                        continue
+                    # Entries published while the backlog was read are already sent.
+                    if entry["seq"] > sent_seq:
+                        sent_seq = entry["seq"]
+                        yield message(entry)
+            finally:
+                broker.unsubscribe(subscription)
+
+        return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.route("/room/<room_id>/stream", methods=['GET'])
+    def get_room_stream(room_id):
+        """
+        Streams the booking changes of a room as Server-Sent Events, see event_stream_response.
+
+        Args:
+            room_id (int): The ID of the room.
+
+        Raises:
+            400: If the room ID or the last event ID is invalid.
+        """
+        try:
+            room_id = int(room_id)
+        except ValueError:
+            abort(400, description='Invalid value for roomId parameter.')
+        if db.session.get(Room, room_id) is None:
+            abort(400, description='Invalid value for roomId parameter.')
+        return event_stream_response([room_id])
+
+    @app.route("/rooms/stream", methods=['GET'])
+    def get_rooms_stream():
+        """
+        Streams the booking changes of many rooms as Server-Sent Events, see event_stream_response.
+
+        Query Parameters:
+        - roomsId: Comma-separated IDs of the watched rooms, all rooms when omitted
+
+        Raises:
+            400: If the room IDs or the last event ID are invalid.
+        """
+        rooms_id = None
+        if "roomsId" in request.args:
+            try:
+                rooms_id = [int(room_id) for room_id in request.args["roomsId"].split(",")]
+            except ValueError:
+                abort(400, description='Invalid value for roomsId parameter.')
+        return event_stream_response(rooms_id)
 
     @app.route("/event/<event_id>", methods=['GET'])
     def get_event(event_id):
         """
         Retrieve an event by its ID.
 
+        Query Parameters:
+        - detail: 'short' (default) or 'full' to add the rooms and the number of participants of the event
+
         Args:
             event_id (int): The ID of the event to retrieve.
 
@@ -152,63 +656,105 @@ def create_app(database_uri="sqlite:///database.db"):
         Raises:
             400: If the event ID is invalid.
         """
+        detail = get_detail_param()
         try:
             event = db.session.execute(db.select(Event).filter_by(id=event_id)).scalar_one()
         except NoResultFound:
             abort(400, description='Invalid value for eventId parameter.')
         else:
-            return jsonify(event.obj_to_dict())
+            return jsonify(serialize_events([event], detail)[0])
 
     @app.route("/room/<room_id>/events", methods=['GET'])
     def get_events_for_room(room_id):
         """
         Retrieves events for a specific room based on the given parameters.
 
+        Without date parameters, returns up to 'limit' (at most 20) nearest upcoming events.
+        With 'day', 'month' and 'year', returns all events of that day. With 'from' and 'to'
+        (in DATE_FORMAT, at most 31 days apart), returns all events overlapping that range.
+        With 'detail=full', the rooms and the number of participants of each event are added.
+
+        The occurrences of recurring events are expanded for the requested range only and
+        merged in, with a null 'id' and the 'seriesId' of their series. At equal begin dates,
+        occurrences come first, ordered by descending series ID, then events by ascending ID.
+
         Args:
             room_id (int): The ID of the room.
 
         Returns:
-            A JSON response containing the events for the room.
+            A JSON response containing the events for the room, sorted by begin date.
 
         Raises:
             400: If there are invalid values for the parameters or if the room ID is invalid.
         """
-        if len(request.args) <= 1:
-            limit = request.args.get("limit", default=20, type=int)
-            if 0 > limit or limit > 20:
-                abort(400, description='Invalid value for limit parameter.')
-            try:
-                room = db.session.execute(db.select(Room).filter_by(id=room_id)).scalar_one()
-            except NoResultFound:
-                abort(400, description='Invalid value for roomId parameter.')
-            else:
-                events = room.events
-
-                result = [event.obj_to_dict() for event in events if event.begin >= datetime.today()]
-                sorted_result = sorted(result, key=lambda x: x['begin'])
+        try:
+            room_id = int(room_id)
+        except ValueError:
+            abort(400, description='Invalid value for roomId parameter.')
 
-                return jsonify(sorted_result[:limit])
+        query = db.select(*Event.__table__.c) \
+            .join(room_event_m2m, room_event_m2m.c.event_id == Event.id) \
+            .where(room_event_m2m.c.room_id == room_id) \
+            .order_by(Event.begin, Event.id)
 
-        else:
+        if "from" in request.args or "to" in request.args:
+            try:
+                range_begin = datetime.strptime(request.args.get("from", default=""), DATE_FORMAT)
+                range_end = datetime.strptime(request.args.get("to", default=""), DATE_FORMAT)
+            except ValueError:
+                abort(400, description='Invalid value for date parameter.')
+            if range_begin >= range_end or range_end - range_begin > MAX_EVENTS_RANGE:
+                abort(400, description='Invalid value for date parameter.')
+        elif {"day", "month", "year"} & request.args.keys():
             try:
                 day = request.args.get("day", default=None, type=int)
                 month = request.args.get("month", default=None, type=int)
                 year = request.args.get("year", default=None, type=int)
-                given_date = datetime(day=day, month=month, year=year)
-            except ValueError:
+                range_begin = datetime(day=day, month=month, year=year)
+            except (TypeError, ValueError):
                 abort(400, description='Invalid value for date parameter.')
-            else:
-                try:
-                    room = db.session.execute(db.select(Room).filter_by(id=room_id)).scalar_one()
-                except NoResultFound:
-                    abort(400, description='Invalid value for roomId parameter.')
-                else:
-                    events = room.events
+            range_end = range_begin + timedelta(days=1)
+        else:
+            limit = request.args.get("limit", default=20, type=int)
+            if 0 > limit or limit > 20:
+                abort(400, description='Invalid value for limit parameter.')
+            now = datetime.today()
+            query = query.where(Event.begin >= now).limit(limit)
+            range_begin = range_end = None
+
+        if range_begin is not None:
+            # Events never span more than a day, so the lower bound on begin keeps the range scan short.
+            query = query.where(Event.begin >= range_begin - timedelta(days=1), Event.begin < range_end,
+                                Event.end > range_begin)
+
+        detail = get_detail_param()
+        events = [dict(row._mapping) for row in db.session.execute(query)]
+        if range_begin is not None:
+            series_occurrences = [occurrence_to_dict(series, begin, end) for _, begin, end, series
+                                  in find_series_occurrences([room_id], range_begin, range_end)]
+        else:
+            series_list = db.session.execute(
+                db.select(EventSeries).join(room_series_m2m, room_series_m2m.c.series_id == EventSeries.id)
+                .where(room_series_m2m.c.room_id == room_id, EventSeries.lastEnd > now)).scalars().all()
+            series_occurrences = [occurrence_to_dict(series, begin, end) for _, series, begin, end
+                                  in merge_occurrences(series_list, (now, -math.inf), limit)]
+        if series_occurrences:
+            events = sorted(events + series_occurrences, key=event_sort_key)
+            if range_begin is None:
+                events = events[:limit]
+
+        if not events and db.session.get(Room, room_id) is None:
+            abort(400, description='Invalid value for roomId parameter.')
+        if detail == "full":
+            add_event_details(events)
 
-                    result = [event.obj_to_dict() for event in events if event.begin.date() == given_date.date()]
-                    sorted_result = sorted(result, key=lambda x: x['begin'])
+        return jsonify(events)
 
-                    return jsonify(sorted_result)
+    def event_sort_key(event):
+        """
+        Returns the (begin, id) sort key of an event dictionary, or (begin, -seriesId) for an occurrence.
+        """
+        return event["begin"], event["id"] if event["id"] is not None else -event["seriesId"]
 
     @app.route("/event", methods=["POST"])
     def post_event():
@@ -219,6 +765,8 @@ def create_app(database_uri="sqlite:///database.db"):
         It retrieves the necessary data from the request JSON payload, validates the data,
         generates an edit password for the event, and saves the event to the database.
 
+        With a 'recurrence' object, a recurring event is created instead, see post_series.
+
         Returns:
             A JSON response containing the ID of the newly created event and the edit password.
 
@@ -231,19 +779,12 @@ def create_app(database_uri="sqlite:///database.db"):
         link = request.json["link"]
         begin = request.json["begin"]
         end = request.json["end"]
-        roomsId = request.json["roomsId"]
+        roomsId = get_rooms_id()
 
-        token = request.headers.get('Authorization')
-        if token is None:
-            ownerId = "undefined"
-        else:
-            if token[:7] != 'Bearer ':
-                abort(401, description='Invalid token.')
-            else:
-                token = token[7:]
-            ownerId = get_id_from_token(token)
-            if type(ownerId) == str:
-                abort(401, description=ownerId)
+        ownerId = get_event_owner_id()
+
+        if request.json.get("recurrence") is not None:
+            return post_series(ownerId)
 
         password = generate_password()
 
@@ -251,38 +792,565 @@ def create_app(database_uri="sqlite:///database.db"):
                           begin=datetime.strptime(begin, DATE_FORMAT),
                           end=datetime.strptime(end, DATE_FORMAT), ownerId=ownerId)
 
-        event_duration = new_event.end - new_event.begin
-        if new_event.begin >= new_event.end:
-            abort(400, description='Begin date is greater than end date.')
-        if event_duration < timedelta(minutes=15):
-            abort(400, description='Event duration cant be shorter than 15 minutes.')
-        if new_event.begin.date() != new_event.end.date():
-            abort(400, description='Begin and end date have to be the same.')
-        if new_event.begin <= datetime.today():
-            abort(400, description='Invalid begin date.')
-
-        db.session.add(new_event)
-
-        for roomId in roomsId:
-            room = db.session.execute(db.select(Room).filter_by(id=roomId)).scalar_one()
-            events = room.events
-            for event in events:
-                if ((new_event.begin > event.begin) and (new_event.begin < event.end)) \
-                        or ((new_event.end > event.begin) and (new_event.end < event.end)):
-                    abort(400, description='Event date collides with an already existing event.')
-            room.events.append(new_event)
+        error = validate_event_dates(new_event.begin, new_event.end)
+        if error is not None:
+            abort(400, description=error)
+
+        rooms = db.session.execute(db.select(Room).where(Room.id.in_(roomsId))).scalars().all()
+        if len(rooms) != len(set(roomsId)):
+            abort(400, description='Invalid value for roomsId parameter.')
+
+        if ownerId is not None and user_cache.get(ownerId) is None:
+            abort(401, description='User with provided token doesnt exist.')
+
+        with coordinator.lock(roomsId):
+            if find_conflicting_events(roomsId, new_event.begin, new_event.end) \
+                    or find_conflicting_series(roomsId, new_event.begin, new_event.end):
+                abort(400, description='Event date collides with an already existing event.')
+
+            db.session.add(new_event)
+            # Assigning through the new event avoids loading the whole booking history of each room.
+            new_event.rooms = rooms
+            db.session.flush()
+            if ownerId is not None:
+                db.session.execute(user_event_m2m.insert(), [{"user_id": ownerId, "event_id": new_event.id}])
+            changes.record("event", [new_event.id], "insert")
+            db.session.commit()
+        occupancy.add_event(roomsId, new_event.begin, new_event.end)
+        broker.publish()
 
-        if ownerId != "undefined":
+        return jsonify({"id": new_event.id, "password": password})
+
+    def post_series(ownerId):
+        """
+        Create a recurring event from the payload of POST /event.
+
+        The recurrence rule is stored once, its occurrences are only expanded to be checked for
+        collisions, with the rules of POST /event, and later for the time ranges that queries ask for.
+
+        Request Body:
+        - recurrence: An object with:
+          - frequency: 'daily', 'weekly' or 'monthly'
+          - interval: The number of days, weeks or months between two occurrences (defaults to 1)
+          - count: The number of occurrences, at most MAX_OCCURRENCES
+          - until: The latest begin date of an occurrence, in DATE_FORMAT, instead of count
+          - exceptions: The dates (YYYY-MM-DD) of cancelled occurrences (defaults to none)
+
+        Args:
+            ownerId (int): The ID of the user booking the series, or None for anonymous bookings.
+
+        Returns:
+            A JSON response containing the ID of the new series ('seriesId') and the edit password.
+
+        Raises:
+            400: If the provided data is invalid or an occurrence collides with an existing event.
+            401: If the user of the provided token doesn't exist.
+        """
+        recurrence = request.json["recurrence"]
+        begin = datetime.strptime(request.json["begin"], DATE_FORMAT)
+        end = datetime.strptime(request.json["end"], DATE_FORMAT)
+        roomsId = get_rooms_id()
+
+        error = validate_event_dates(begin, end)
+        if error is not None:
+            abort(400, description=error)
+
+        if not isinstance(recurrence, dict):
+            abort(400, description='Invalid value for recurrence parameter.')
+        recurrence = dict(recurrence)
+        if recurrence.get("until") is not None:
             try:
-                user = db.session.execute(db.select(User).filter_by(id=ownerId)).scalar_one()
-            except NoResultFound:
-                abort(401, description='User with provided token doesnt exist.')
+                recurrence["until"] = datetime.strptime(recurrence["until"], DATE_FORMAT)
+            except (TypeError, ValueError):
+                abort(400, description='Invalid value for until parameter.')
+        error = validate_recurrence(begin, recurrence)
+        if error is not None:
+            abort(400, description=error)
+
+        rooms = db.session.execute(db.select(Room).where(Room.id.in_(roomsId))).scalars().all()
+        if len(rooms) != len(set(roomsId)):
+            abort(400, description='Invalid value for roomsId parameter.')
+
+        if ownerId is not None and user_cache.get(ownerId) is None:
+            abort(401, description='User with provided token doesnt exist.')
+
+        password = generate_password()
+        series = EventSeries(name=request.json["name"], description=request.json["description"],
+                             link=request.json["link"], editPassword=hash_password(password), begin=begin, end=end,
+                             ownerId=ownerId,
+                             frequency=recurrence["frequency"], interval=recurrence.get("interval", 1),
+                             count=recurrence.get("count"), until=recurrence.get("until"),
+                             exceptions=sorted(set(recurrence.get("exceptions", []))))
+
+        series_occurrences = list(itertools.islice(occurrences(series), MAX_OCCURRENCES + 1))
+        if not series_occurrences or len(series_occurrences) > MAX_OCCURRENCES:
+            abort(400, description=f'A recurring event must have between 1 and {MAX_OCCURRENCES} occurrences.')
+
+        with coordinator.lock(roomsId):
+            errors = find_batch_conflicts([(occurrence_begin, occurrence_end, set(roomsId))
+                                           for occurrence_begin, occurrence_end in series_occurrences])
+            if any(error is not None for error in errors):
+                abort(400, description='Event date collides with an already existing event.')
+
+            series.lastEnd = series_occurrences[-1][1]
+            db.session.add(series)
+            series.rooms = rooms
+            db.session.flush()
+            changes.record("series", [series.id], "insert")
+            db.session.commit()
+        for occurrence_begin, occurrence_end in series_occurrences:
+            occupancy.add_event(roomsId, occurrence_begin, occurrence_end)
+        broker.publish()
+
+        return jsonify({"seriesId": series.id, "password": password})
+
+    def get_rooms_id():
+        """
+        Returns the IDs of the rooms of the event in the request body, converted to integers.
+
+        Returns:
+            list: The room IDs.
+
+        Raises:
+            400: If the room IDs are not a list of integers.
+        """
+        try:
+            return [int(roomId) for roomId in request.json["roomsId"]]
+        except (TypeError, ValueError):
+            abort(400, description='Invalid value for roomsId parameter.')
+
+    def get_event_owner_id():
+        """
+        Returns the ID of the user booking an event, taken from the optional Authorization header.
+
+        Returns:
+            int: The user ID, or None for anonymous bookings.
+
+        Raises:
+            401: If the provided token is invalid.
+        """
+        if request.headers.get('Authorization') is None:
+            return None
+        return get_token_claims()['sub']
+
+    def insert_rows(model, rows):
+        """
+        Inserts rows with batched multi-row statements, for POST /events/bulk and the imports.
+
+        Rows without an 'id' get one from the database. Asking for the RETURNING rows in parameter
+        order makes SQLite insert rows one at a time, so the returned IDs are sorted instead: the IDs
+        generated by one statement increase in the order of its rows. Rows with an 'id' keep it;
+        on SQLite the next generated ID follows the largest one, but explicit IDs do not advance
+        the sequences of other databases, which have to be reset after a restore.
+
+        Args:
+            model (Model): The model of the table.
+            rows (list): The column values of each row, all with the same keys.
+
+        Returns:
+            list: The IDs of the rows, in the order of rows.
+        """
+        if "id" in rows[0]:
+            db.session.execute(model.__table__.insert(), rows)
+            return [row["id"] for row in rows]
+        return sorted(db.session.execute(model.__table__.insert().returning(model.id), rows).scalars())
+
+    @app.route("/events/bulk", methods=["POST"])
+    def post_events_bulk():
+        """
+        Create many events in one transaction.
+
+        Every event is validated with the rules of POST /event. Collisions are checked with one
+        query against the existing events of all involved rooms and with a sweep over the batch
+        itself, then the valid events are inserted with batched statements.
+
+        Request Body:
+        - events: A list of at most MAX_BULK_EVENTS events in the format of POST /event
+        - mode: 'atomic' (default) to book nothing unless every event is valid,
+                or 'partial' to book every valid event
+
+        Returns:
+            A JSON response with a 'results' list holding, in request order, either the 'id'
+            and 'password' of each booked event or the 'error' that prevented its booking.
+            When an atomic request is rejected, the results of valid events are null.
+
+        Raises:
+            400: If the request is malformed, or if any event is invalid in atomic mode.
+            401: If the provided token is invalid or its user doesn't exist.
+        """
+        if not isinstance(request.json, dict):
+            abort(400, description='Invalid value for events parameter.')
+        items = request.json.get("events")
+        mode = request.json.get("mode", "atomic")
+        if not isinstance(items, list) or not 0 < len(items) <= MAX_BULK_EVENTS:
+            abort(400, description='Invalid value for events parameter.')
+        if mode not in ("atomic", "partial"):
+            abort(400, description='Invalid value for mode parameter.')
+
+        ownerId = get_event_owner_id()
+        if ownerId is not None and user_cache.get(ownerId) is None:
+            abort(401, description='User with provided token doesnt exist.')
+
+        bookings = []
+        errors = []
+        for item in items:
+            try:
+                if not isinstance(item["name"], str):
+                    raise ValueError
+                booking = (datetime.strptime(item["begin"], DATE_FORMAT), datetime.strptime(item["end"], DATE_FORMAT),
+                           {int(roomId) for roomId in item["roomsId"]})
+            except (KeyError, TypeError, ValueError):
+                bookings.append(None)
+                errors.append('Invalid event data.')
             else:
-                user.events.append(new_event)
+                error = validate_event_dates(booking[0], booking[1])
+                bookings.append(booking if error is None else None)
+                errors.append(error)
+
+        requested_rooms_id = {roomId for booking in bookings if booking is not None for roomId in booking[2]}
+        existing_rooms_id = set(db.session.execute(
+            db.select(Room.id).where(Room.id.in_(requested_rooms_id))).scalars())
+        for index, booking in enumerate(bookings):
+            if booking is not None and not booking[2] <= existing_rooms_id:
+                bookings[index] = None
+                errors[index] = 'Invalid value for roomsId parameter.'
+
+        with coordinator.lock(requested_rooms_id & existing_rooms_id):
+            for index, error in enumerate(find_batch_conflicts(bookings)):
+                if error is not None:
+                    bookings[index] = None
+                    errors[index] = error
+
+            results = [{"error": error} if error is not None else None for error in errors]
+            if mode == "atomic" and any(error is not None for error in errors):
+                db.session.rollback()
+                return jsonify({"results": results}), 400
+
+            accepted = [index for index, booking in enumerate(bookings) if booking is not None]
+            if accepted:
+                passwords = [generate_password() for _ in accepted]
+                rows = [{"name": items[index]["name"], "description": items[index].get("description"),
+                         "link": items[index].get("link"), "editPassword": hash_password(password),
+                         "begin": bookings[index][0], "end": bookings[index][1], "ownerId": ownerId}
+                        for index, password in zip(accepted, passwords)]
+                eventsId = insert_rows(Event, rows)
+
+                db.session.execute(room_event_m2m.insert(), [{"room_id": roomId, "event_id": eventId}
+                                                             for index, eventId in zip(accepted, eventsId)
+                                                             for roomId in sorted(bookings[index][2])])
+                if ownerId is not None:
+                    db.session.execute(user_event_m2m.insert(), [{"user_id": ownerId, "event_id": eventId}
+                                                                 for eventId in eventsId])
+                changes.record("event", eventsId, "insert")
+                db.session.commit()
+
+        if accepted:
+            for index in accepted:
+                begin, end, roomsId = bookings[index]
+                occupancy.add_event(roomsId, begin, end)
+            broker.publish()
+            for index, eventId, password in zip(accepted, eventsId, passwords):
+                results[index] = {"id": eventId, "password": password}
+
+        return jsonify({"results": results})
 
+    def parse_batch(parse, batch, restore):
+        """
+        Converts a batch of imported records with a parse function of project.transfer.
+
+        Returns:
+            dict, list: The parsed rows by index in the batch, and the result of each record,
+            holding the 'error' of the records that could not be parsed and None for the others.
+        """
+        rows = {}
+        results = [None] * len(batch)
+        for index, record in enumerate(batch):
+            try:
+                rows[index] = parse(record, restore)
+            except InvalidRecord as error:
+                results[index] = {"error": str(error)}
+        return rows, results
+
+    def reject_rows(rows, results, rejected, error):
+        for index in rejected:
+            del rows[index]
+            results[index] = {"error": error}
+
+    def reject_duplicates(rows, results, column, taken, error):
+        """
+        Rejects the rows whose value of a unique column is already taken, or repeats the one of
+        an earlier row of the batch.
+        """
+        taken = set(taken)
+        rejected = []
+        for index, row in rows.items():
+            if row[column] in taken:
+                rejected.append(index)
+            taken.add(row[column])
+        reject_rows(rows, results, rejected, error)
+
+    def taken_ids(models, rows):
+        ids = [row["id"] for row in rows.values()]
+        return {taken_id for model in models
+                for taken_id in db.session.execute(db.select(model.id).where(model.id.in_(ids))).scalars()}
+
+    def import_rooms(batch, restore):
+        """
+        Imports a batch of room records in one transaction, see import_records.
+        """
+        rows, results = parse_batch(parse_room, batch, restore)
+        if restore:
+            reject_duplicates(rows, results, "id", taken_ids([Room], rows), 'Room with provided id already exist.')
+        if not rows:
+            return results
+
+        roomsId = insert_rows(Room, list(rows.values()))
+        changes.record("room", roomsId, "insert")
         db.session.commit()
+        room_cache.bump()
+        broker.publish()
+        for index, roomId in zip(rows, roomsId):
+            results[index] = {"id": roomId}
+        return results
 
-        return jsonify({"id": new_event.id, "password": password})
+    def import_users(batch, restore):
+        """
+        Imports a batch of user records in one transaction, see import_records.
+        """
+        rows, results = parse_batch(parse_user, batch, restore)
+        if restore:
+            reject_duplicates(rows, results, "id", taken_ids([User], rows), 'User with provided id already exist.')
+        reject_duplicates(rows, results, "email", db.session.execute(
+            db.select(User.email).where(User.email.in_([row["email"] for row in rows.values()]))).scalars(),
+            'User with provided email already exist.')
+        if not rows:
+            return results
+
+        usersId = insert_rows(User, list(rows.values()))
+        db.session.commit()
+        for index, userId in zip(rows, usersId):
+            user_cache.invalidate(userId)
+            results[index] = {"id": userId}
+        return results
+
+    def import_events(batch, restore):
+        """
+        Imports a batch of event records in one transaction, see import_records.
+
+        Collisions are checked as in POST /events/bulk: with one query against the existing events
+        of all rooms of the batch, and with a sweep over the batch itself.
+        """
+        rows, results = parse_batch(parse_event, batch, restore)
+        if restore:
+            reject_duplicates(rows, results, "id", taken_ids([Event, ArchivedEvent], rows),
+                              'Event with provided id already exist.')
+        roomsId = {index: row.pop("roomsId") for index, row in rows.items()}
+        # As in POST /event, the owner of an event is one of its participants.
+        participantsId = {index: row.pop("participantsId") | ({row["ownerId"]} if row["ownerId"] else set())
+                          for index, row in rows.items()}
+
+        requested_rooms_id = set().union(*roomsId.values())
+        existing_rooms_id = set(db.session.execute(
+            db.select(Room.id).where(Room.id.in_(requested_rooms_id))).scalars())
+        reject_rows(rows, results, [index for index in rows if not roomsId[index] <= existing_rooms_id],
+                    'Invalid value for roomsId parameter.')
+        requested_users_id = set().union(*(participantsId[index] for index in rows))
+        existing_users_id = set(db.session.execute(
+            db.select(User.id).where(User.id.in_(requested_users_id))).scalars())
+        reject_rows(rows, results, [index for index in rows if not participantsId[index] <= existing_users_id],
+                    'User with provided id doesnt exist.')
+
+        with coordinator.lock(requested_rooms_id & existing_rooms_id):
+            bookings = [(rows[index]["begin"], rows[index]["end"], roomsId[index]) if index in rows else None
+                        for index in range(len(batch))]
+            for index, error in enumerate(find_batch_conflicts(bookings)):
+                if error is not None:
+                    reject_rows(rows, results, [index], error)
+            if not rows:
+                db.session.rollback()
+                return results
+
+            passwords = {}
+            if not restore:
+                for index, row in rows.items():
+                    passwords[index] = generate_password()
+                    row["editPassword"] = hash_password(passwords[index])
+            eventsId = insert_rows(Event, list(rows.values()))
+            db.session.execute(room_event_m2m.insert(), [{"room_id": roomId, "event_id": eventId}
+                                                         for index, eventId in zip(rows, eventsId)
+                                                         for roomId in sorted(roomsId[index])])
+            participants = [{"user_id": userId, "event_id": eventId} for index, eventId in zip(rows, eventsId)
+                            for userId in sorted(participantsId[index])]
+            if participants:
+                db.session.execute(user_event_m2m.insert(), participants)
+            changes.record("event", eventsId, "insert")
+            db.session.commit()
+
+        for index, eventId in zip(rows, eventsId):
+            occupancy.add_event(roomsId[index], rows[index]["begin"], rows[index]["end"])
+            results[index] = {"id": eventId, "password": passwords[index]} if not restore else {"id": eventId}
+        broker.publish()
+        return results
+
+    def import_series(batch, restore):
+        """
+        Imports a batch of series records in one transaction, see import_records.
+
+        The occurrences of all series of the batch are checked at once with find_batch_conflicts,
+        and a series is rejected when any of its occurrences collides.
+        """
+        rows, results = parse_batch(parse_series, batch, restore)
+        if restore:
+            reject_duplicates(rows, results, "id", taken_ids([EventSeries], rows),
+                              'Event with provided id already exist.')
+        roomsId = {index: row.pop("roomsId") for index, row in rows.items()}
+
+        requested_rooms_id = set().union(*roomsId.values())
+        existing_rooms_id = set(db.session.execute(
+            db.select(Room.id).where(Room.id.in_(requested_rooms_id))).scalars())
+        reject_rows(rows, results, [index for index in rows if not roomsId[index] <= existing_rooms_id],
+                    'Invalid value for roomsId parameter.')
+        ownersId = {row["ownerId"] for row in rows.values()} - {None}
+        existing_users_id = set(db.session.execute(db.select(User.id).where(User.id.in_(ownersId))).scalars())
+        reject_rows(rows, results, [index for index, row in rows.items()
+                                    if row["ownerId"] is not None and row["ownerId"] not in existing_users_id],
+                    'User with provided id doesnt exist.')
+
+        series_occurrences = {index: list(itertools.islice(occurrences(SimpleNamespace(**row)),
+                                                           MAX_OCCURRENCES + 1))
+                              for index, row in rows.items()}
+        reject_rows(rows, results, [index for index in rows
+                                    if not 0 < len(series_occurrences[index]) <= MAX_OCCURRENCES],
+                    f'A recurring event must have between 1 and {MAX_OCCURRENCES} occurrences.')
+
+        with coordinator.lock(requested_rooms_id & existing_rooms_id):
+            bookings = [(index, (begin, end, roomsId[index])) for index in rows
+                        for begin, end in series_occurrences[index]]
+            errors = {}
+            for (index, _), error in zip(bookings, find_batch_conflicts([booking for _, booking in bookings])):
+                if error is not None:
+                    errors.setdefault(index, error)
+            for index, error in errors.items():
+                reject_rows(rows, results, [index], error)
+            if not rows:
+                db.session.rollback()
+                return results
+
+            passwords = {}
+            for index, row in rows.items():
+                row["lastEnd"] = series_occurrences[index][-1][1]
+                if not restore:
+                    passwords[index] = generate_password()
+                    row["editPassword"] = hash_password(passwords[index])
+            seriesId = insert_rows(EventSeries, list(rows.values()))
+            db.session.execute(room_series_m2m.insert(), [{"room_id": roomId, "series_id": series_id}
+                                                          for index, series_id in zip(rows, seriesId)
+                                                          for roomId in sorted(roomsId[index])])
+            changes.record("series", seriesId, "insert")
+            db.session.commit()
+
+        for index, series_id in zip(rows, seriesId):
+            for begin, end in series_occurrences[index]:
+                occupancy.add_event(roomsId[index], begin, end)
+            results[index] = {"id": series_id, "password": passwords[index]} if not restore else {"id": series_id}
+        broker.publish()
+        return results
+
+    def import_records(kind, records, restore=False):
+        """
+        Imports rooms, events, users or series, in transactions of IMPORT_BATCH_SIZE records.
+
+        Records are validated with the rules of POST /room, POST /event and POST /register, and
+        the valid records of each batch are inserted with batched statements, so that an invalid
+        record only prevents its own import.
+
+        Events may name their 'ownerId' and the 'participantsId' of their participants, and get a
+        new edit password. Series hold the fields of an event and of its recurrence, see
+        parse_series. Users may have a 'role_id' (1 by default). In restore mode, records keep
+        the 'id' of the backup they come from, and their password hashes; events and series may
+        then begin in the past.
+
+        Args:
+            kind (str): 'rooms', 'events', 'users' or 'series'.
+            records (iterable): The records, as yielded by read_records.
+            restore (bool): Whether the records come from a backup written by export_records.
+
+        Returns:
+            list: For each record, either the 'id' (and the 'password' of new events and series) of
+            the imported object, or the 'error' that prevented its import.
+        """
+        import_batch = {"rooms": import_rooms, "events": import_events, "users": import_users,
+                        "series": import_series}[kind]
+        records = iter(records)
+        results = []
+        for batch in iter(lambda: list(itertools.islice(records, IMPORT_BATCH_SIZE)), []):
+            results += import_batch(batch, restore)
+        return results
+
+    @app.route("/admin/import/<any(rooms, events, users, series):kind>", methods=["POST"])
+    def import_data(kind):
+        """
+        Import rooms, events, users or series from a CSV or NDJSON upload, see import_records.
+
+        The upload is parsed while it is received, and imported in transactions of IMPORT_BATCH_SIZE
+        records. Only users with the role of Admin can import data.
+
+        Query Parameters:
+        - restore: 'true' to restore a backup of GET /admin/export, keeping IDs and password hashes.
+          Explicit IDs only advance the ID sequence on SQLite: on other databases, the sequences
+          have to be reset to the largest restored IDs afterwards.
+
+        Request Body:
+        - A text/csv document with a header row, or an application/x-ndjson document, whose
+          records have the fields of TRANSFER_FIELDS
+
+        Returns:
+            A JSON response with a 'results' list holding, in upload order, either the 'id' of each
+            imported object (and the 'password' of new events and series) or the 'error' that
+            prevented its import.
+
+        Raises:
+            400: If the format or the restore parameter is invalid.
+            401: If the user is not an administrator.
+        """
+        if get_role_from_claims(get_token_claims()) != 4:
+            abort(401, description='Only administrator can import data.')
+        formats = {mimetype: fmt for fmt, mimetype in TRANSFER_FORMATS.items()}
+        if request.mimetype not in formats:
+            abort(400, description='Invalid value for Content-Type header.')
+        restore = request.args.get("restore", default="false")
+        if restore not in ("true", "false"):
+            abort(400, description='Invalid value for restore parameter.')
+
+        results = import_records(kind, read_records(request.stream, formats[request.mimetype]), restore == "true")
+        return jsonify({"results": results})
+
+    @app.route("/admin/export/<any(rooms, events, users, series):kind>", methods=["GET"])
+    def export_data(kind):
+        """
+        Stream all rooms, events, users or series in the format of POST /admin/import, for backups.
+
+        Events include the archived ones, their rooms and their participants, series their rooms,
+        and users their password hash. Only users with the role of Admin can export data.
+
+        Query Parameters:
+        - format: 'ndjson' (default) or 'csv'
+
+        Returns:
+            A streamed application/x-ndjson or text/csv response with one record per line, ordered by ID.
+
+        Raises:
+            400: If the format is invalid.
+            401: If the user is not an administrator.
+        """
+        if get_role_from_claims(get_token_claims()) != 4:
+            abort(401, description='Only administrator can export data.')
+        fmt = request.args.get("format", default="ndjson")
+        if fmt not in TRANSFER_FORMATS:
+            abort(400, description='Invalid value for format parameter.')
+
+        return Response(stream_with_context(format_records(export_records(kind, EXPORT_BATCH_SIZE), kind, fmt)),
+                        mimetype=TRANSFER_FORMATS[fmt])
 
     @app.route("/event/<event_id>", methods=["PATCH"])
     def patch_event(event_id):
@@ -303,6 +1371,7 @@ def create_app(database_uri="sqlite:///database.db"):
             400: If the event duration is shorter than 15 minutes.
             400: If the begin and end date are not the same.
             400: If the begin date is invalid.
+            400: If the new dates collide with another event in the rooms of the event.
         """
         if len(request.args) != 1:
             abort(400, "Invalid number of query parameters")
@@ -318,26 +1387,31 @@ def create_app(database_uri="sqlite:///database.db"):
             if datetime.today() > event.begin:
                 abort(400, "Cant edit event that already took place.")
 
-            event.name = request.json["name"]
-            event.description = request.json["description"]
-            event.link = request.json["link"]
             begin = datetime.strptime(request.json["begin"], DATE_FORMAT)
             end = datetime.strptime(request.json["end"], DATE_FORMAT)
 
-            event_duration = end - begin
-            if begin >= end:
-                abort(400, description='Begin date is greater than end date.')
-            if event_duration < timedelta(minutes=15):
-                abort(400, description='Event duration cant be shorter than 15 minutes.')
-            if begin.date() != end.date():
-                abort(400, description='Begin and end date have to be the same.')
-            if begin <= datetime.today():
-                abort(400, description='Invalid begin date.')
+            error = validate_event_dates(begin, end)
+            if error is not None:
+                abort(400, description=error)
 
-            event.begin = begin
-            event.end = end
+            roomsId = db.session.execute(db.select(room_event_m2m.c.room_id)
+                                         .where(room_event_m2m.c.event_id == event.id)).scalars().all()
+            old_begin, old_end = event.begin, event.end
+            with coordinator.lock(roomsId):
+                if find_conflicting_events(roomsId, begin, end, exclude_event_id=event.id) \
+                        or find_conflicting_series(roomsId, begin, end):
+                    abort(400, description='Event date collides with an already existing event.')
 
-            db.session.commit()
+                event.name = request.json["name"]
+                event.description = request.json["description"]
+                event.link = request.json["link"]
+                event.begin = begin
+                event.end = end
+                changes.record("event", [event.id], "update")
+                db.session.commit()
+            occupancy.remove_event(roomsId, old_begin, old_end)
+            occupancy.add_event(roomsId, begin, end)
+            broker.publish()
 
             return jsonify({"id": event.id, "password": password})
 
@@ -358,40 +1432,35 @@ def create_app(database_uri="sqlite:///database.db"):
                  the email is not provided, or the user with the provided email already exists.
 
         """
-        token = request.headers.get('Authorization')
-        if token is None or token[:7] != 'Bearer ':
-            abort(401, description='Invalid token.')
+        ownerId = get_token_claims()['sub']
+
+        try:
+            event = db.session.execute(db.select(Event).filter_by(id=event_id)).scalar_one()
+        except NoResultFound:
+            abort(400, description='Invalid value for eventId parameter.')
         else:
-            token = token[7:]
-            ownerId = get_id_from_token(token)
-            if type(ownerId) == str:
-                abort(401, description=ownerId)
+            if event.ownerId != ownerId:
+                abort(400, description='Only owner can add participants.')
+
+            email = request.json["email"]
+
+            if email is None:
+                abort(400, description='Email must be provided')
 
             try:
-                event = db.session.execute(db.select(Event).filter_by(id=event_id)).scalar_one()
+                user = db.session.execute(db.select(User).filter_by(email=email)).scalar_one()
             except NoResultFound:
-                abort(400, description='Invalid value for eventId parameter.')
+                abort(400, description='User with provided email doesnt exist.')
             else:
-                if event.ownerId != ownerId:
-                    abort(400, description='Only owner can add participants.')
-
-                email = request.json["email"]
-
-                if email is None:
-                    abort(400, description='Email must be provided')
-
-                try:
-                    user = db.session.execute(db.select(User).filter_by(email=email)).scalar_one()
-                except NoResultFound:
-                    abort(400, description='User with provided email doesnt exist.')
-                else:
-                    for existing_user in event.users:
-                        if existing_user == user:
-                            abort(400, description="User with provided email is already assigned.")
-                    user.events.append(event)
-                    db.session.commit()
+                for existing_user in event.users:
+                    if existing_user == user:
+                        abort(400, description="User with provided email is already assigned.")
+                user.events.append(event)
+                changes.record("event", [event.id], "update")
+                db.session.commit()
+                broker.publish()
 
-                return jsonify("Participant had been added.")
+            return jsonify("Participant had been added.")
 
     @app.route('/register', methods=['POST'])
     def register():
@@ -430,8 +1499,9 @@ def create_app(database_uri="sqlite:///database.db"):
 
         db.session.add(user)
         db.session.commit()
+        user_cache.invalidate(user.id)
 
-        token = generate_token(user.id)
+        token = generate_token(user.id, user.role_id, user.tokenVersion)
         return jsonify({"token": token})
 
     @app.route('/login', methods=['POST'])
@@ -453,7 +1523,7 @@ def create_app(database_uri="sqlite:///database.db"):
         except NoResultFound:
             abort(400, description='Invalid email and password.')
         else:
-            token = generate_token(user.id)
+            token = generate_token(user.id, user.role_id, user.tokenVersion)
             return jsonify({"token": token})
 
     @app.route("/logout", methods=["GET"])
@@ -466,39 +1536,139 @@ def create_app(database_uri="sqlite:///database.db"):
 
         
         user, exp_date, iat_date = get_values_from_token(token)
-        token_blacklist_element = TokenBlacklist(tokenValue=token, expirationDate=datetime.fromtimestamp(exp_date))
-        db.session.add(token_blacklist_element)
-        db.session.execute(db.delete(TokenBlacklist).where(TokenBlacklist.expirationDate < datetime.now()))
+        if type(user) == str:
+            abort(401, description=user)
+
+        expiration_date = datetime.fromtimestamp(exp_date)
+        # Expired rows are purged by the revocation sweeper, outside of the request.
+        db.session.add(TokenBlacklist(tokenValue=token, expirationDate=expiration_date))
         db.session.commit()
+        revocations.revoke(token, expiration_date)
+        token_cache.evict(token)
 
         return jsonify({"message": "success"})
         
-    def get_logged_user():
+    def get_token_claims():
         """
-        Retrieves the logged-in user based on the provided token in the request headers.
+        Authenticates the request from the token in the Authorization header without database access.
+
+        The token must not be revoked, must pass verification (answered from the token cache when
+        possible) and must carry the current security version of its user. The claims are
+        resolved once per request and kept in flask.g.
 
         Returns:
-            The logged-in user object.
+            dict: The claims of the token, with the user ID in 'sub' converted to int.
 
         Raises:
-            401: If the token is invalid or the user does not exist.
+            401: If the token is missing, revoked, expired or invalid.
         """
+        if "claims" in g:
+            return g.claims
+
         token = request.headers.get('Authorization')
         if token is None or token[:7] != 'Bearer ':
             abort(401, description='Invalid token.')
         else:
             token = token[7:]
 
-        if db.session.query((db.exists().where(TokenBlacklist.tokenValue == token))).scalar():
+        if revocations.is_revoked(token):
             abort(401, description='Invalid token.')
 
-        userId = get_id_from_token(token)
         try:
-            user = db.session.execute(db.select(User).filter_by(id=userId)).scalar_one()
-        except NoResultFound:
+            claims = dict(decode_token(token))
+            claims['sub'] = int(claims['sub'])
+        except jwt.ExpiredSignatureError:
+            abort(401, description='Signature expired. Please log in again.')
+        except (jwt.InvalidTokenError, KeyError, ValueError):
+            abort(401, description='Invalid token. Please log in again.')
+
+        if revocations.is_user_token_revoked(claims['sub'], claims.get('ver', 0)):
+            abort(401, description='Signature expired. Please log in again.')
+
+        g.claims = claims
+        return claims
+
+    def get_role_from_claims(claims):
+        """
+        Returns the role ID of the authenticated user.
+
+        Tokens issued before roles were added to the claims fall back to the user cache.
+
+        Args:
+            claims (dict): The claims returned by get_token_claims.
+
+        Returns:
+            int: The role ID of the user.
+
+        Raises:
+            401: If the user of a token without a role claim does not exist.
+        """
+        if 'role' in claims:
+            return claims['role']
+        return get_logged_user().role_id
+
+    def get_logged_user():
+        """
+        Retrieves the logged-in user based on the provided token in the request headers.
+
+        The user is resolved once per request, from the user cache, and kept in flask.g.
+
+        Returns:
+            Row: The USER_COLUMNS of the logged-in user.
+
+        Raises:
+            401: If the token is invalid or the user does not exist.
+        """
+        if "user" not in g:
+            g.user = user_cache.get(get_token_claims()['sub'])
+        if g.user is None:
             abort(401, description='Invalid token.')
-        else:
-            return user
+        return g.user
+
+    @app.route('/stats/token-cache', methods=['GET'])
+    def get_token_cache_stats():
+        """
+        Returns the hit and miss counters of the verified token cache.
+
+        Only administrators can read the token cache counters.
+
+        Returns:
+            A JSON response containing the number of hits, misses and cached tokens.
+
+        Raises:
+            401: If the logged-in user is not an administrator.
+        """
+        if get_role_from_claims(get_token_claims()) != 4:
+            abort(401, description="Only administrator can read token cache stats.")
+        return jsonify(token_cache.stats())
+
+    @app.route('/stats/slow-queries', methods=['GET'])
+    def get_slow_queries():
+        """
+        Returns the most recent SQL statements slower than the SLOW_QUERY_THRESHOLD setting.
+
+        Only administrators can read the slow-query log.
+
+        Returns:
+            A JSON response containing the slow statements, the most recent first, with their
+            parameters, route, duration, date and query plan.
+
+        Raises:
+            401: If the logged-in user is not an administrator.
+        """
+        if get_role_from_claims(get_token_claims()) != 4:
+            abort(401, description="Only administrator can read slow queries.")
+        return jsonify(slow_queries.entries())
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        """
+        Returns the request, SQL and operation metrics of this process in the Prometheus text format.
+
+        Returns:
+            A text/plain response with the metrics.
+        """
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
     @app.route('/user', methods=['GET'])
     def get_logged_user_data():
@@ -509,33 +1679,67 @@ def create_app(database_uri="sqlite:///database.db"):
             A JSON response containing the user's data.
         """
         user = get_logged_user()
-        return jsonify(user.obj_to_dict())
+        return jsonify({"email": user.email, "firstName": user.firstName, "lastName": user.lastName})
 
     @app.route('/user/events', methods=['GET'])
     def get_events_for_user():
         """
         Retrieves events for a specific user.
 
-        Returns:
-            A JSON response containing a list of events for the user, sorted by the 'begin' attribute.
-        """
-        token = request.headers.get('Authorization')
-        if token is None or token[:7] != 'Bearer ':
-            abort(401, description='Invalid token.')
-        else:
-            token = token[7:]
+        Query Parameters:
+        - limit: The page size, between 0 and 20 (defaults to 20)
+        - cursor: The X-Next-Cursor value of the previous page
+        - detail: 'short' (default) or 'full' to add the rooms and the number of participants of each event
 
-        limit = request.args.get("limit", default=20, type=int)
-        if 0 > limit or limit > 20:
-            abort(400, description='Invalid value for limit parameter.')
+        The occurrences of the recurring events of the user are merged in lazily, in the order
+        of get_events_for_room, so that only the occurrences of the page are expanded.
 
-        userId = get_id_from_token(token)
+        Returns:
+            A JSON response containing a page of events for the user, sorted by the 'begin' attribute.
+        """
+        userId = get_token_claims()['sub']
+        limit, cursor = get_page_params(20, 20)
+        detail = get_detail_param()
+
+        query = db.select(*EVENT_COLUMNS).where(Event.ownerId == userId).order_by(Event.begin, Event.id) \
+            .limit(limit + 1)
+        if cursor is not None:
+            query = query.where(sa.tuple_(Event.begin, Event.id) > get_event_cursor(cursor))
+
+        events = serialize_rows(db.session.execute(query).all())
+
+        after = get_event_cursor(cursor) if cursor is not None else None
+        series_query = db.select(EventSeries).where(EventSeries.ownerId == userId)
+        if after is not None:
+            series_query = series_query.where(EventSeries.lastEnd > after[0])
+        series_list = db.session.execute(series_query).scalars().all()
+        if series_list:
+            events = sorted(events + [occurrence_to_dict(series, begin, end) for _, series, begin, end
+                                      in merge_occurrences(series_list, after, limit + 1)], key=event_sort_key)
+
+        next_cursor = encode_cursor(*event_sort_key(events[limit - 1])) if len(events) > limit > 0 else None
+
+        events = events[:limit]
+        if detail == "full":
+            add_event_details(events)
+        return paginated_response(events, next_cursor)
+
+    @app.route('/user/events/history', methods=['GET'])
+    def get_events_history_for_user():
+        """
+        Retrieves the archived events of the logged-in user.
 
-        events = db.session.execute(db.select(Event).filter_by(ownerId=userId)).all()
-        result = [event[0].obj_to_dict() for event in events]
-        sorted_result = sorted(result, key=lambda x: x['begin'])
+        Query Parameters:
+        - limit: The page size, between 0 and 20 (defaults to 20)
+        - cursor: The X-Next-Cursor value of the previous page
 
-        return jsonify(sorted_result[:limit])
+        Returns:
+            A JSON response containing a page of archived events for the user, sorted by the 'begin' attribute.
+        """
+        userId = get_token_claims()['sub']
+        limit, cursor = get_page_params(20, 20)
+        return archived_events_response(db.select(*ARCHIVED_EVENT_COLUMNS).where(ArchivedEvent.ownerId == userId),
+                                        limit, cursor)
 
     @app.route('/user/<user_id>', methods=['PATCH'])
     def change_user_role(user_id):
@@ -553,8 +1757,7 @@ def create_app(database_uri="sqlite:///database.db"):
             400: If the provided role ID is invalid.
 
         """
-        logged_user = get_logged_user()
-        if logged_user.role_id != 4:
+        if get_role_from_claims(get_token_claims()) != 4:
             abort(401, description="Only administrator can change user role.")
         else:
             try:
@@ -567,23 +1770,38 @@ def create_app(database_uri="sqlite:///database.db"):
                     abort(400, "Invalid roleId value")
                 user.role_id = roleId
 
+                # Tokens issued before the change carry the old role, so they stop being accepted.
+                user.tokenVersion += 1
+                expiration_date = datetime.now() + TOKEN_LIFETIME
+                db.session.add(UserTokenRevocation(userId=user.id, tokenVersion=user.tokenVersion,
+                                                   expirationDate=expiration_date))
                 db.session.commit()
+                revocations.revoke_user_tokens(user.id, user.tokenVersion, expiration_date)
+                user_cache.invalidate(user.id)
 
                 return jsonify("Role has been changed!")
 
     return app
 
 
-if __name__ == "__main__":
-    app = create_app()
+def prepare_database(app):
+    """
+    Brings the database of the application up to date and makes sure the admin user exists.
 
+    Args:
+        app (Flask): The application.
+    """
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
         try:
             admin = db.session.execute(db.select(User).filter_by(email="admin")).scalar_one()
         except NoResultFound:
             admin = User(email="admin", password="admin", role_id=4)
             db.session.add(admin)
-            db.session.commit()            
+            db.session.commit()
 
+
+if __name__ == "__main__":
+    app = create_app()
+    prepare_database(app)
     app.run()
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from project.models import ArchivedEvent, Event, db, room_event_archive_m2m, room_event_m2m, \
+    user_event_archive_m2m, user_event_m2m
+
+# The columns of Event.obj_to_dict, in the archive.
+ARCHIVED_EVENT_COLUMNS = (ArchivedEvent.id, ArchivedEvent.name, ArchivedEvent.description, ArchivedEvent.link,
+                          ArchivedEvent.editPassword, ArchivedEvent.begin, ArchivedEvent.end, ArchivedEvent.ownerId)
+
+
+class EventArchive:
+    """
+    Moves past events, with their rooms and participants, from the event, room_event and
+    user_event tables to event_archive, room_event_archive and user_event_archive.
+
+    The booking paths only read current and future events, so the hot tables and their indexes
+    stay small enough to remain in the page cache while the history keeps growing in the
+    archive tables. Events that ended more than ARCHIVE_HORIZON days ago are moved every
+    ARCHIVE_INTERVAL seconds by a background thread, in transactions of ARCHIVE_BATCH_SIZE
+    events, and can be moved on demand with the 'archive-events' command. Each moved event gets
+    an 'archive' entry in the change log, in the transaction that moves it, and the entries are
+    pushed to the stream subscribers once committed.
+
+    Only single events are archived: EventSeries rows, and the rooms of the series, stay in
+    their tables, so that recurring events keep expanding into future occurrences.
+
+    Attributes:
+        app (Flask): The application whose events are archived.
+        changes (ChangeFeed): The change feed recording the archived events.
+        broker (ScheduleBroker): The broker pushing the archived events to the subscribers.
+    """
+
+    def __init__(self, app=None, changes=None, broker=None):
+        self.app = None
+        self.changes = None
+        self.broker = None
+        self._archiver = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, changes, broker)
+
+    def init_app(self, app, changes, broker):
+        """
+        Registers the archive on the given application.
+
+        Args:
+            app (Flask): The application. The age in days of the archived events is read from
+                its ARCHIVE_HORIZON setting (default 30), the interval in seconds of the
+                background archival from ARCHIVE_INTERVAL (default 1 hour, 0 disables it) and the
+                number of events moved per transaction from ARCHIVE_BATCH_SIZE (default 1000).
+            changes (ChangeFeed): The change feed of the application.
+            broker (ScheduleBroker): The schedule broker of the application.
+        """
+        self.app = app
+        self.changes = changes
+        self.broker = broker
+        app.config.setdefault("ARCHIVE_HORIZON", 30)
+        app.config.setdefault("ARCHIVE_INTERVAL", 3600)
+        app.config.setdefault("ARCHIVE_BATCH_SIZE", 1000)
+        app.extensions["archive"] = self
+
+        @app.before_request
+        def start_archiver():
+            self._start_archiver()
+
+    def archive(self, now=None):
+        """
+        Moves the events that ended more than ARCHIVE_HORIZON days ago to the archive tables.
+
+        Must be called within an application context.
+
+        Args:
+            now (datetime): The current date. Defaults to datetime.now().
+
+        Returns:
+            int: The number of archived events.
+        """
+        cutoff = (now or datetime.now()) - timedelta(days=self.app.config["ARCHIVE_HORIZON"])
+        archived = 0
+        while True:
+            # The newest event is kept so that SQLite never hands out the ID of an archived event again.
+            newest_id = db.select(sa.func.max(Event.id)).scalar_subquery()
+            events_id = db.session.execute(
+                db.select(Event.id).where(Event.begin < cutoff, Event.end < cutoff, Event.id < newest_id)
+                .order_by(Event.id).limit(self.app.config["ARCHIVE_BATCH_SIZE"])).scalars().all()
+            if not events_id:
+                if archived:
+                    self.broker.publish()
+                return archived
+
+            columns = [column.name for column in Event.__table__.c]
+            db.session.execute(ArchivedEvent.__table__.insert().from_select(
+                columns, db.select(*Event.__table__.c).where(Event.id.in_(events_id))))
+            for table, archive_table in ((room_event_m2m, room_event_archive_m2m),
+                                         (user_event_m2m, user_event_archive_m2m)):
+                db.session.execute(archive_table.insert().from_select(
+                    [column.name for column in table.c], db.select(*table.c).where(table.c.event_id.in_(events_id))))
+                db.session.execute(db.delete(table).where(table.c.event_id.in_(events_id)))
+            db.session.execute(db.delete(Event).where(Event.id.in_(events_id)))
+            self.changes.record("event", events_id, "archive")
+            db.session.commit()
+            archived += len(events_id)
+
+    def _start_archiver(self):
+        with self._lock:
+            interval = self.app.config["ARCHIVE_INTERVAL"]
+            if self._archiver is None and interval > 0:
+                self._archiver = threading.Thread(target=self._run_archiver, args=(interval,), daemon=True,
+                                                  name="event-archiver")
+                self._archiver.start()
+
+    def _run_archiver(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    self.archive()
+            except Exception:
+                self.app.logger.exception("Event archival failed.")
+
+
+def add_archived_rooms(events):
+    """
+    Adds the IDs of the rooms ('roomsId') to archived event dictionaries, with one query.
+
+    Args:
+        events (list): Dictionaries of archived events, holding at least the 'id' of the event.
+
+    Returns:
+        list: The same event dictionaries.
+    """
+    rooms_id = defaultdict(list)
+    if events:
+        for event_id, room_id in db.session.execute(
+                db.select(room_event_archive_m2m.c.event_id, room_event_archive_m2m.c.room_id)
+                .where(room_event_archive_m2m.c.event_id.in_([event["id"] for event in events]))
+                .order_by(room_event_archive_m2m.c.event_id, room_event_archive_m2m.c.room_id)):
+            rooms_id[event_id].append(room_id)
+    for event in events:
+        event["roomsId"] = rooms_id[event["id"]]
+    return events
@@ -0,0 +1,53 @@
+"""
+ASGI deployment adapter.
+
+The application built by create_app is served by uvicorn through the a2wsgi WSGI-to-ASGI
+adapter, e.g. to deploy it behind ASGI infrastructure. Only the connections are handled by the
+event loop: each request still runs the synchronous Flask application in a bounded pool of
+worker threads, the same blocking thread-per-request model as the threaded development server.
+Database access, password hashing and token signing are not made asynchronous, so this mode
+changes the HTTP front end, not how requests are executed. Routes and JSON contracts are the
+ones of project.app.
+
+An asyncio implementation, with an async SQLite driver and CPU-bound work offloaded to
+executors, is out of scope: it would duplicate every route of project.app as a coroutine.
+
+Requires the packages of requirements-asgi.txt. Run with:
+
+    python -m project.asgi
+"""
+from project.app import create_app, prepare_database
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    WSGIMiddleware = None
+
+ASGI_WORKERS = 32
+
+
+def create_asgi_app(database_uri="sqlite:///database.db", workers=ASGI_WORKERS):
+    """
+    Creates the application and wraps it into an ASGI application.
+
+    Args:
+        database_uri (str): The URI of the database. Defaults to "sqlite:///database.db".
+        workers (int): The number of threads running requests. Defaults to ASGI_WORKERS.
+
+    Returns:
+        WSGIMiddleware: The ASGI application. The Flask application is available as its 'app' attribute.
+
+    Raises:
+        RuntimeError: If the a2wsgi package is not installed.
+    """
+    if WSGIMiddleware is None:
+        raise RuntimeError("The ASGI adapter requires the a2wsgi package, see requirements-asgi.txt.")
+    return WSGIMiddleware(create_app(database_uri), workers=workers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    asgi_app = create_asgi_app()
+    prepare_database(asgi_app.app)
+    uvicorn.run(asgi_app, host="127.0.0.1", port=5000)
@@ -0,0 +1,208 @@
+import bisect
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from project.models import Event, Room, db, room_event_m2m
+from project.recurrence import find_series_occurrences
+
+MIN_EVENT_DURATION = timedelta(minutes=15)
+
+
+def find_conflicting_events(rooms_id, begin, end, exclude_event_id=None):
+    """
+    Finds events booked in any of the given rooms that overlap the given time range.
+
+    All rooms are checked with a single range query over the room_event association.
+    Two intervals collide when each of them begins before the other one ends, which also
+    covers identical intervals and intervals that fully contain one another. Intervals that
+    only touch (one ends exactly when the other begins) do not collide.
+
+    Args:
+        rooms_id (list): The IDs of the rooms to check.
+        begin (datetime): The start of the time range.
+        end (datetime): The end of the time range.
+        exclude_event_id (int): The ID of an event to ignore, e.g. the one being edited.
+
+    Returns:
+        list: The IDs of the conflicting events in ascending order.
+    """
+    if not rooms_id:
+        return []
+
+    query = db.select(Event.id).distinct() \
+        .join(room_event_m2m, room_event_m2m.c.event_id == Event.id) \
+        .where(room_event_m2m.c.room_id.in_(rooms_id), Event.begin < end, Event.end > begin) \
+        .order_by(Event.id)
+    if exclude_event_id is not None:
+        query = query.where(Event.id != exclude_event_id)
+
+    return list(db.session.execute(query).scalars())
+
+
+def find_conflicting_series(rooms_id, begin, end):
+    """
+    Finds recurring events with an occurrence in any of the given rooms that overlaps the given time range.
+
+    Args:
+        rooms_id (list): The IDs of the rooms to check.
+        begin (datetime): The start of the time range.
+        end (datetime): The end of the time range.
+
+    Returns:
+        list: The IDs of the conflicting series in ascending order.
+    """
+    return sorted({series.id for _, _, _, series in find_series_occurrences(rooms_id, begin, end)})
+
+
+def validate_event_dates(begin, end, allow_past=False):
+    """
+    Validates the dates of an event against the booking rules.
+
+    Args:
+        begin (datetime): The start of the event.
+        end (datetime): The end of the event.
+        allow_past (bool): Whether the event may begin in the past, e.g. when restoring a backup.
+
+    Returns:
+        str or None: The description of the first broken rule, or None if the dates are valid.
+    """
+    if begin >= end:
+        return 'Begin date is greater than end date.'
+    if end - begin < MIN_EVENT_DURATION:
+        return 'Event duration cant be shorter than 15 minutes.'
+    if begin.date() != end.date():
+        return 'Begin and end date have to be the same.'
+    if not allow_past and begin <= datetime.today():
+        return 'Invalid begin date.'
+    return None
+
+
+def find_batch_conflicts(bookings):
+    """
+    Checks a batch of bookings for collisions with existing events and with each other.
+
+    Existing events in all rooms of the batch are fetched with a single range query, and so are
+    the series booked in them, whose occurrences are expanded over the range of the batch. Each booking
+    is checked against them per room, then the remaining bookings are swept in order of their
+    begin date, so that a booking colliding with an earlier accepted one of the batch is rejected.
+
+    Args:
+        bookings (list): (begin, end, rooms_id) tuples, None for bookings that are already rejected.
+
+    Returns:
+        list: For each booking, the description of its collision or None if it can be booked.
+    """
+    errors = [None] * len(bookings)
+    candidates = [(index, booking) for index, booking in enumerate(bookings) if booking is not None]
+    if not candidates:
+        return errors
+
+    rooms_id = {room_id for _, (_, _, booking_rooms_id) in candidates for room_id in booking_rooms_id}
+    batch_begin = min(begin for _, (begin, _, _) in candidates)
+    batch_end = max(end for _, (_, end, _) in candidates)
+    rows = db.session.execute(
+        db.select(room_event_m2m.c.room_id, Event.begin, Event.end)
+        .join(Event, room_event_m2m.c.event_id == Event.id)
+        .where(room_event_m2m.c.room_id.in_(rooms_id), Event.begin < batch_end, Event.end > batch_begin)).all()
+    rows += [(room_id, begin, end) for room_id, begin, end, _ in find_series_occurrences(rooms_id, batch_begin,
+                                                                                         batch_end)]
+    rows.sort()
+
+    # Per room: begin dates in ascending order and the running maximum of end dates.
+    existing = {}
+    for room_id, begin, end in rows:
+        begins, max_ends = existing.setdefault(room_id, ([], []))
+        begins.append(begin)
+        max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+    for index, (begin, end, booking_rooms_id) in candidates:
+        for room_id in booking_rooms_id:
+            begins, max_ends = existing.get(room_id, ([], []))
+            position = bisect.bisect_left(begins, end)
+            if position and max_ends[position - 1] > begin:
+                errors[index] = 'Event date collides with an already existing event.'
+                break
+
+    booked_until = {}
+    for index, (begin, end, booking_rooms_id) in sorted(candidates, key=lambda candidate: candidate[1][0]):
+        if errors[index] is not None:
+            continue
+        if any(booked_until.get(room_id, begin) > begin for room_id in booking_rooms_id):
+            errors[index] = 'Event date collides with another event of the batch.'
+            continue
+        for room_id in booking_rooms_id:
+            booked_until[room_id] = max(end, booked_until.get(room_id, end))
+
+    return errors
+
+
+class BookingCoordinator:
+    """
+    Serializes the bookings that touch the same rooms, from the collision check to the commit.
+
+    Within a process, rooms are mapped to BOOKING_LOCK_STRIPES locks by their ID, so that only
+    requests sharing a stripe wait for each other. Stripes are acquired in ascending order,
+    which rules out deadlocks between requests booking several rooms. Across worker processes,
+    the database guarantees the same: on SQLite the transaction is started with BEGIN IMMEDIATE,
+    which takes the write lock before the collision check, and on other databases the rows of
+    the booked rooms are locked with SELECT ... FOR UPDATE, in ascending order as well.
+
+    Attributes:
+        app (Flask): The application whose bookings are coordinated.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._stripes = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the coordinator on the given application.
+
+        Args:
+            app (Flask): The application. The number of locks is read from its
+                BOOKING_LOCK_STRIPES setting (default 64).
+        """
+        self.app = app
+        app.config.setdefault("BOOKING_LOCK_STRIPES", 64)
+        self._stripes = [threading.Lock() for _ in range(app.config["BOOKING_LOCK_STRIPES"])]
+        app.extensions["booking_coordinator"] = self
+
+    @contextmanager
+    def lock(self, rooms_id):
+        """
+        Holds the locks of the given rooms while the block checks collisions and commits.
+
+        Must be called within an application context, before the transaction writes anything.
+        The transaction is rolled back if the block raises, e.g. when a collision aborts the request.
+
+        Args:
+            rooms_id (iterable): The IDs of the rooms to book.
+        """
+        rooms_id = sorted(set(rooms_id))
+        stripes = sorted({room_id % len(self._stripes) for room_id in rooms_id})
+        acquired = []
+        try:
+            for stripe in stripes:
+                self._stripes[stripe].acquire()
+                acquired.append(stripe)
+            self._lock_rooms(rooms_id)
+            yield
+        except BaseException:
+            db.session.rollback()
+            raise
+        finally:
+            for stripe in reversed(acquired):
+                self._stripes[stripe].release()
+
+    @staticmethod
+    def _lock_rooms(rooms_id):
+        connection = db.session.connection()
+        if connection.dialect.name == "sqlite":
+            # A transaction that is already open has written, so it already holds the write lock.
+            if not connection.connection.dbapi_connection.in_transaction:
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+        elif rooms_id:
+            db.session.execute(db.select(Room.id).where(Room.id.in_(rooms_id)).order_by(Room.id).with_for_update())
@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+from project.models import ChangeLog, db
+
+BACKFILL_BATCH_SIZE = 500
+
+
+class Subscription:
+    """
+    The bounded buffer of changes waiting to be sent to one subscriber.
+
+    Attributes:
+        rooms_id (set): The IDs of the watched rooms, or None for all rooms.
+        queue (Queue): The pending change entries, at most SSE_BUFFER_SIZE of them.
+        overflowed (bool): Whether a change was dropped because the buffer was full. The
+            subscriber must then resume from the change log.
+    """
+
+    def __init__(self, rooms_id, size):
+        self.rooms_id = rooms_id
+        self.queue = queue.Queue(maxsize=size)
+        self.overflowed = False
+
+    def wants(self, entry):
+        """
+        Checks whether a change entry concerns one of the watched rooms.
+        """
+        if self.rooms_id is None:
+            return True
+        if entry["entity"] == "room":
+            return entry["entityId"] in self.rooms_id
+        return entry["data"] is not None and not self.rooms_id.isdisjoint(entry["data"]["roomsId"])
+
+    def offer(self, entry):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.overflowed = True
+
+
+class ScheduleBroker:
+    """
+    Pushes the entries of the change log to the subscribers watching the rooms they concern.
+
+    The change log is the single source of the pushed changes, so the broker never sends a
+    change that was not committed, and every change has the sequence number of its entry as
+    id. publish() is called by the endpoints right after they commit: it reads the entries
+    added since the last published one and hands them to the subscribers. Changes committed by
+    other worker processes are picked up by a background thread calling publish() every
+    SSE_POLL_INTERVAL seconds.
+
+    Each subscriber has a buffer of SSE_BUFFER_SIZE entries. A subscriber that does not keep up
+    stops receiving changes once its buffer is full, so slow consumers cannot exhaust memory;
+    it has to reconnect and resume from its last change with backfill().
+
+    Attributes:
+        app (Flask): The application whose change log is pushed.
+        changes (ChangeFeed): The change feed reading the change log.
+    """
+
+    def __init__(self, app=None, changes=None):
+        self.app = None
+        self.changes = None
+        self._subscriptions = set()
+        self._last_seq = None
+        self._poller = None
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, changes)
+
+    def init_app(self, app, changes):
+        """
+        Registers the broker on the given application.
+
+        Args:
+            app (Flask): The application. The buffer size of each subscriber is read from its
+                SSE_BUFFER_SIZE setting (default 100), the interval in seconds of the poll for
+                changes of other processes from SSE_POLL_INTERVAL (default 1, 0 disables it),
+                the interval in seconds of heartbeats from SSE_HEARTBEAT_INTERVAL (default 15)
+                and the duration in seconds after which streams are closed from
+                SSE_MAX_DURATION (default 300).
+            changes (ChangeFeed): The change feed of the application.
+        """
+        self.app = app
+        self.changes = changes
+        app.config.setdefault("SSE_BUFFER_SIZE", 100)
+        app.config.setdefault("SSE_POLL_INTERVAL", 1)
+        app.config.setdefault("SSE_HEARTBEAT_INTERVAL", 15)
+        app.config.setdefault("SSE_MAX_DURATION", 300)
+        app.extensions["broker"] = self
+
+    def subscribe(self, rooms_id=None):
+        """
+        Registers a subscriber. Must be called within an application context.
+
+        Args:
+            rooms_id (iterable): The IDs of the watched rooms, or None for all rooms.
+
+        Returns:
+            Subscription: The subscription, to pass to unsubscribe once the subscriber is gone.
+        """
+        subscription = Subscription(set(rooms_id) if rooms_id is not None else None,
+                                    self.app.config["SSE_BUFFER_SIZE"])
+        with self._publish_lock:
+            if self._last_seq is None:
+                self._last_seq = self._max_seq()
+            with self._lock:
+                self._subscriptions.add(subscription)
+        self._start_poller()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def backfill(self, subscription, since):
+        """
+        Reads the entries after a sequence number that concern the rooms of a subscription.
+
+        The change log is read lazily, BACKFILL_BATCH_SIZE entries at a time, so a subscriber
+        resuming from far behind never holds its whole backlog in memory. Must be iterated
+        within an application context, after subscribe, so that no entry is missed between the
+        backfill and the live changes.
+
+        Args:
+            subscription (Subscription): The subscription.
+            since (int): The sequence number of the last entry the subscriber received.
+
+        Yields:
+            dict: The change entries, in sequence order.
+        """
+        while True:
+            batch = self.changes.changes(since, BACKFILL_BATCH_SIZE)
+            for entry in batch:
+                if subscription.wants(entry):
+                    yield entry
+            if len(batch) < BACKFILL_BATCH_SIZE:
+                return
+            since = batch[-1]["seq"]
+
+    def publish(self):
+        """
+        Hands the entries added to the change log since the last call to the subscribers.
+
+        Does nothing while there are no subscribers. Must be called within an application context.
+        """
+        with self._publish_lock:
+            with self._lock:
+                subscriptions = list(self._subscriptions)
+            if not subscriptions:
+                self._last_seq = None
+                return
+            while True:
+                entries = self.changes.changes(self._last_seq, BACKFILL_BATCH_SIZE)
+                for entry in entries:
+                    for subscription in subscriptions:
+                        if subscription.wants(entry):
+                            subscription.offer(entry)
+                if entries:
+                    self._last_seq = entries[-1]["seq"]
+                if len(entries) < BACKFILL_BATCH_SIZE:
+                    return
+
+    @staticmethod
+    def _max_seq():
+        return db.session.execute(db.select(db.func.max(ChangeLog.seq))).scalar() or 0
+
+    def _start_poller(self):
+        with self._lock:
+            interval = self.app.config["SSE_POLL_INTERVAL"]
+            if self._poller is None and interval > 0:
+                self._poller = threading.Thread(target=self._run_poller, args=(interval,), daemon=True,
+                                                name="schedule-broker-poller")
+                self._poller.start()
+
+    def _run_poller(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    self.publish()
+            except Exception:
+                self.app.logger.exception("Schedule broker poll failed.")
@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import sqlalchemy as sa
+from project.archive import ARCHIVED_EVENT_COLUMNS, add_archived_rooms
+from project.models import ArchivedEvent, ChangeLog, Event, EventSeries, Room, db, room_series_m2m
+from project.serializers import EVENT_COLUMNS, ROOM_COLUMNS, add_event_details, serialize_rows
+
+ENTITIES = ("room", "event", "series")
+
+
+class ChangeFeed:
+    """
+    Records the inserts, updates and archival of rooms, events and series in the ChangeLog
+    table, and reads them back in sequence order so that clients can sync incrementally.
+
+    Changes are recorded by the endpoints before they commit, in the same transaction. Entries
+    only name the changed object: when they are read, the current state of the objects is
+    loaded with one query per entity type, so the cost of a sync is proportional to the
+    number of changes since the client's cursor, not to the size of the tables.
+
+    Entries older than CHANGE_LOG_RETENTION seconds are compacted by a background thread
+    every CHANGE_LOG_COMPACT_INTERVAL seconds: only the latest entry of each object is kept.
+    Since entries carry the current state of their object, a client syncing from any cursor
+    still receives the latest state of every object changed after it.
+
+    Attributes:
+        app (Flask): The application whose database holds the log.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._compactor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the change feed on the given application.
+
+        Args:
+            app (Flask): The application. The retention in seconds is read from its
+                CHANGE_LOG_RETENTION setting (default 7 days) and the compaction interval in
+                seconds from CHANGE_LOG_COMPACT_INTERVAL (default 1 hour, 0 disables it).
+        """
+        self.app = app
+        app.config.setdefault("CHANGE_LOG_RETENTION", 7 * 24 * 3600)
+        app.config.setdefault("CHANGE_LOG_COMPACT_INTERVAL", 3600)
+        app.extensions["changes"] = self
+
+    def record(self, entity, entities_id, operation):
+        """
+        Adds entries for changed objects to the current transaction.
+
+        Args:
+            entity (str): One of ENTITIES.
+            entities_id (iterable): The IDs of the changed objects.
+            operation (str): 'insert', 'update' or 'archive'.
+        """
+        now = datetime.now()
+        rows = [{"entity": entity, "entityId": entity_id, "operation": operation, "date": now}
+                for entity_id in entities_id]
+        if rows:
+            db.session.execute(db.insert(ChangeLog), rows)
+        self._start_compactor()
+
+    def changes(self, since=0, limit=100):
+        """
+        Returns the entries recorded after a sequence number, with the current state of their objects.
+
+        Args:
+            since (int): The sequence number of the last entry the client has seen, 0 for all entries.
+            limit (int): The maximal number of entries to return.
+
+        Returns:
+            list: Dictionaries with the 'seq', 'entity', 'entityId', 'operation' and 'date' of each
+                entry, and the current dictionary of its object in 'data', in sequence order.
+        """
+        entries = db.session.execute(
+            db.select(ChangeLog.seq, ChangeLog.entity, ChangeLog.entityId, ChangeLog.operation, ChangeLog.date)
+            .where(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit)).all()
+        entries = serialize_rows(entries)
+
+        entities_id = defaultdict(set)
+        for entry in entries:
+            entities_id[entry["entity"]].add(entry["entityId"])
+        data = {(entity, obj["id"]): obj for entity, ids in entities_id.items()
+                for obj in self._load(entity, ids)}
+
+        for entry in entries:
+            entry["data"] = data.get((entry["entity"], entry["entityId"]))
+        return entries
+
+    def compact(self, now=None):
+        """
+        Removes the entries older than the retention that are followed by a newer entry of the same object.
+
+        Must be called within an application context.
+
+        Args:
+            now (datetime): The current date. Defaults to datetime.now().
+
+        Returns:
+            int: The number of removed entries.
+        """
+        cutoff = (now or datetime.now()) - timedelta(seconds=self.app.config["CHANGE_LOG_RETENTION"])
+        newer = sa.orm.aliased(ChangeLog)
+        superseded = db.select(newer.seq).where(newer.entity == ChangeLog.entity,
+                                                newer.entityId == ChangeLog.entityId,
+                                                newer.seq > ChangeLog.seq).exists()
+        removed = db.session.execute(db.delete(ChangeLog).where(ChangeLog.date < cutoff, superseded)).rowcount
+        db.session.commit()
+        return removed
+
+    @staticmethod
+    def _load(entity, ids):
+        if entity == "room":
+            return serialize_rows(db.session.execute(db.select(*ROOM_COLUMNS["full"]).where(Room.id.in_(ids))))
+        if entity == "event":
+            events = add_event_details(serialize_rows(db.session.execute(
+                db.select(*EVENT_COLUMNS).where(Event.id.in_(ids)))))
+            # Archived events are read from the archive, so that subscribers of their rooms see them leave.
+            archived_ids = set(ids) - {event["id"] for event in events}
+            if archived_ids:
+                events += add_archived_rooms(serialize_rows(db.session.execute(
+                    db.select(*ARCHIVED_EVENT_COLUMNS).where(ArchivedEvent.id.in_(archived_ids)))))
+            return events
+
+        series_list = [series.obj_to_dict() for series in db.session.execute(
+            db.select(EventSeries).where(EventSeries.id.in_(ids))).scalars()]
+        rooms_id = defaultdict(list)
+        for series_id, room_id in db.session.execute(
+                db.select(room_series_m2m.c.series_id, room_series_m2m.c.room_id)
+                .where(room_series_m2m.c.series_id.in_(ids))
+                .order_by(room_series_m2m.c.series_id, room_series_m2m.c.room_id)):
+            rooms_id[series_id].append(room_id)
+        for series in series_list:
+            series["roomsId"] = rooms_id[series["id"]]
+        return series_list
+
+    def _start_compactor(self):
+        with self._lock:
+            interval = self.app.config["CHANGE_LOG_COMPACT_INTERVAL"]
+            if self._compactor is None and interval > 0:
+                self._compactor = threading.Thread(target=self._run_compactor, args=(interval,), daemon=True,
+                                                   name="change-log-compactor")
+                self._compactor.start()
+
+    def _run_compactor(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    self.compact()
+            except Exception:
+                self.app.logger.exception("Change log compaction failed.")
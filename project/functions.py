@@ -1,11 +1,20 @@
+import base64
 import hashlib
+import json
 import re
 import jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import secrets
 import string
+import threading
+import time
+from project.metrics import metrics
 
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
 SECRET_KEY = 'some key'
+TOKEN_CACHE_SIZE = 4096
+TOKEN_LIFETIME = timedelta(days=1)
 
 
 import hashlib
@@ -21,7 +30,8 @@ def hash_password(password):
         str: The hashed password.
 
     """
-    hashedPassword = hashlib.sha512(password.encode("utf-8")).hexdigest()
+    with metrics.timer("hash_password"):
+        hashedPassword = hashlib.sha512(password.encode("utf-8")).hexdigest()
     return hashedPassword
 
 
@@ -39,25 +49,146 @@ def validate_email(email):
                      r"(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?$", email)
 
 
-def generate_token(user_id):
+def generate_token(user_id, role_id=None, token_version=None):
     """
     Generates a JWT token for the given user ID.
 
+    When the role and the security version of the user are given, they are included in the
+    token ('role' and 'ver' claims), so that requests can be authorized without a User query.
+
     Args:
         user_id (str): The ID of the user.
+        role_id (int): The role ID of the user.
+        token_version (int): The security version of the user.
 
     Returns:
         str: The generated JWT token.
     """
     payload = {
-        'exp': datetime.utcnow() + timedelta(days=1),
+        'exp': datetime.utcnow() + TOKEN_LIFETIME,
         'iat': datetime.utcnow(),
-        'sub': user_id
+        'sub': str(user_id)
     }
-    token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+    if role_id is not None:
+        payload['role'] = int(role_id)
+    if token_version is not None:
+        payload['ver'] = token_version
+    with metrics.timer("jwt_encode"):
+        token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
     return token
 
 
+class TokenCache:
+    """
+    A bounded LRU cache of verified JWT claims, keyed by token.
+
+    An entry expires together with its token (at the 'exp' claim), and the least recently
+    used entry is dropped once the cache is full. The cache is safe to use from many threads.
+
+    Attributes:
+        max_size (int): The maximum number of cached tokens.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that required a signature check.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """
+        Returns the cached claims of the given token.
+
+        Args:
+            token (str): The JWT token.
+
+        Returns:
+            dict or None: The claims, or None if the token is not cached or has expired.
+        """
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is not None and payload['exp'] <= time.time():
+                del self._entries[token]
+                payload = None
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return payload
+
+    def put(self, token, payload):
+        """
+        Caches the verified claims of the given token.
+
+        Args:
+            token (str): The JWT token.
+            payload (dict): The verified claims of the token.
+        """
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, token):
+        """
+        Removes the given token from the cache, e.g. after it has been revoked.
+
+        Args:
+            token (str): The JWT token.
+        """
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self):
+        """
+        Removes all tokens from the cache and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The number of hits, misses and currently cached tokens.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+token_cache = TokenCache()
+
+
+def decode_token(token):
+    """
+    Verifies the given JWT token and returns its claims, using the token cache.
+
+    Args:
+        token (str): The JWT token to decode.
+
+    Returns:
+        dict: The claims of the token.
+
+    Raises:
+        jwt.ExpiredSignatureError: If the token has expired.
+        jwt.InvalidTokenError: If the token is invalid.
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        with metrics.timer("jwt_decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        token_cache.put(token, payload)
+    return payload
+
+
 def get_id_from_token(token):
     """
     Retrieves the user ID from the given JWT token.
@@ -66,15 +197,15 @@ def get_id_from_token(token):
         token (str): The JWT token to decode.
 
     Returns:
-        str: The user ID extracted from the token.
+        int: The user ID extracted from the token.
 
     Raises:
         str: If the token has expired, returns 'Signature expired. Please log in again.'
         str: If the token is invalid, returns 'Invalid token. Please log in again.'
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        return payload['sub']
+        payload = decode_token(token)
+        return int(payload['sub'])
     except jwt.ExpiredSignatureError:
         return 'Signature expired. Please log in again.'
     except jwt.InvalidTokenError:
@@ -89,15 +220,15 @@ def get_values_from_token(token):
         token (str): The JWT token to decode.
 
     Returns:
-        str, datetime, datetime: user_id, expiration, issued
+        int, datetime, datetime: user_id, expiration, issued
 
     Raises:
         str: If the token has expired, returns 'Signature expired. Please log in again.'
         str: If the token is invalid, returns 'Invalid token. Please log in again.'
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        return payload['sub'], payload['exp'], payload['iat']
+        payload = decode_token(token)
+        return int(payload['sub']), payload['exp'], payload['iat']
     except jwt.ExpiredSignatureError:
         return 'Signature expired. Please log in again.', datetime.now(), datetime.now()
     except jwt.InvalidTokenError:
@@ -113,3 +244,34 @@ def generate_password():
     """
     alphabet = string.ascii_letters + string.digits
     return ''.join(secrets.choice(alphabet) for _ in range(8))
+
+
+def encode_cursor(*values):
+    """
+    Encodes the sort key of the last row of a page into an opaque pagination cursor.
+
+    Args:
+        *values: The sort key values. Datetime values are stored in ISO format.
+
+    Returns:
+        str: The URL-safe cursor.
+    """
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a pagination cursor created by encode_cursor.
+
+    Args:
+        cursor (str): The cursor to decode.
+
+    Returns:
+        list or None: The sort key values, or None if the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
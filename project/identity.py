@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from project.models import User, db
+
+# The columns of the cached User rows.
+USER_COLUMNS = (User.id, User.email, User.firstName, User.lastName, User.role_id, User.tokenVersion)
+
+
+class UserCache:
+    """
+    A bounded LRU cache of User rows keyed by user ID, whose entries expire after USER_CACHE_TTL seconds.
+
+    It lets authenticated requests resolve their user without a query. Rows are immutable
+    snapshots of USER_COLUMNS, safe to share between threads and requests. Unknown IDs are
+    cached too, as None. Endpoints that change a user call invalidate() after they commit;
+    changes made by other worker processes are seen once the entry expires.
+
+    Attributes:
+        app (Flask): The application whose database backs the cache.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that required a query.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the user cache on the given application.
+
+        Args:
+            app (Flask): The application. The lifetime in seconds of the entries is read from its
+                USER_CACHE_TTL setting (default 30, 0 disables the cache) and their maximal
+                number from USER_CACHE_SIZE (default 4096).
+        """
+        self.app = app
+        app.config.setdefault("USER_CACHE_TTL", 30)
+        app.config.setdefault("USER_CACHE_SIZE", 4096)
+        app.extensions["user_cache"] = self
+
+    def get(self, user_id):
+        """
+        Returns the row of a user, from the cache or from the database.
+
+        Must be called within an application context.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            Row or None: The USER_COLUMNS of the user, or None if the user doesn't exist.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        loaded_at = time.monotonic()
+        user = db.session.execute(db.select(*USER_COLUMNS).where(User.id == user_id)).one_or_none()
+        ttl = self.app.config["USER_CACHE_TTL"]
+        if ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (loaded_at + ttl, user)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.app.config["USER_CACHE_SIZE"]:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        """
+        Removes a user from the cache, e.g. after it has been registered or its role has changed.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """
+        Removes all users from the cache and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The number of hits, misses and currently cached users.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
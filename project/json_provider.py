@@ -0,0 +1,75 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    A JSON provider encoding with orjson when it is installed, and with the built-in json module
+    of DefaultJSONProvider otherwise.
+
+    The output is the same as the one of DefaultJSONProvider, apart from non-ASCII characters
+    that orjson writes as UTF-8 instead of escape sequences. Dates keep the RFC 822 format of
+    Flask: orjson passes them to the 'default' function of the provider.
+
+    Attributes:
+        backend (str): 'orjson' or 'json', the library used for encoding.
+    """
+    backend = "orjson" if orjson is not None else "json"
+
+    def dumps(self, obj, **kwargs):
+        """
+        Serializes data as JSON to a string.
+
+        Calls with keyword arguments, such as 'indent', are handled by DefaultJSONProvider.
+
+        Args:
+            obj: The data to serialize.
+            **kwargs: Passed to json.dumps.
+
+        Returns:
+            str: The JSON document.
+        """
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        """
+        Deserializes data as JSON from a string or bytes.
+
+        Args:
+            s (str or bytes): The JSON document.
+            **kwargs: Passed to json.loads.
+
+        Returns:
+            The deserialized data.
+        """
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """
+        Serializes the given arguments as JSON into a Response, like DefaultJSONProvider.response,
+        without an intermediate string.
+
+        Returns:
+            Response: The JSON response.
+        """
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent) + b"\n", mimetype=self.mimetype)
+
+    def _encode(self, obj, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """
+    A cumulative histogram in the Prometheus sense: per-bucket counts, a sum and a count.
+
+    Attributes:
+        buckets (tuple): The upper bounds of the buckets, in ascending order.
+        counts (list): The number of observations of each bucket, plus one for +Inf.
+        sum (float): The sum of all observations.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        """
+        Returns the exposition lines of the histogram.
+
+        Args:
+            name (str): The name of the metric.
+            labels (str): The formatted labels, e.g. 'route="/rooms",method="GET"'.
+
+        Returns:
+            list: The _bucket, _sum and _count lines.
+        """
+        prefix = labels + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """
+    Collects request, SQL and operation metrics of the process and renders them in the
+    Prometheus text format.
+
+    Per route and method, it records the latency of requests, their number by status code,
+    and the number and duration of the SQL statements each request issued. Operations such as
+    password hashing and token signing are timed through timer(). Each application keeps its own
+    METRICS_ENABLED switch in app.extensions, and nothing is recorded for an application whose
+    switch is off, or outside an application context.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._statuses = {}
+        self._statements = {}
+        self._sql_durations = {}
+        self._operations = {}
+
+    def init_app(self, app):
+        """
+        Registers the request hooks and the SQL engine events on the given application.
+
+        Args:
+            app (Flask): The application. Metrics are recorded while its METRICS_ENABLED setting is True (default).
+        """
+        app.config.setdefault("METRICS_ENABLED", True)
+        app.extensions["metrics"] = self
+        app.extensions["metrics_enabled"] = app.config["METRICS_ENABLED"]
+
+        @app.before_request
+        def start_request():
+            app.extensions["metrics_enabled"] = app.config["METRICS_ENABLED"]
+            if app.extensions["metrics_enabled"]:
+                g.metrics = [time.perf_counter(), 0, 0.0, None]
+
+        @app.after_request
+        def record_status(response):
+            if "metrics" in g:
+                g.metrics[3] = response.status_code
+            return response
+
+        @app.teardown_request
+        def finish_request(exception):
+            state = g.pop("metrics", None)
+            if state is not None:
+                begin, statements, sql_duration, status = state
+                route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+                self._observe_request((route, request.method), status or 500, time.perf_counter() - begin,
+                                      statements, sql_duration)
+
+    @property
+    def enabled(self):
+        """
+        bool: Whether metrics are recorded for the current application.
+        """
+        return has_app_context() and current_app.extensions.get("metrics_enabled", False)
+
+    def init_engine(self, engine):
+        """
+        Counts and times the SQL statements that the given engine executes during requests.
+
+        Args:
+            engine (Engine): The SQLAlchemy engine.
+        """
+        import sqlalchemy as sa
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if self.enabled:
+                conn.info.setdefault("metrics_begin", []).append(time.perf_counter())
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            begins = conn.info.get("metrics_begin")
+            if begins:
+                duration = time.perf_counter() - begins.pop()
+                if has_request_context() and "metrics" in g:
+                    g.metrics[1] += 1
+                    g.metrics[2] += duration
+
+        def handle_error(context):
+            # after_cursor_execute is not called for a failed statement.
+            begins = context.connection.info.get("metrics_begin") if context.connection is not None else None
+            if begins:
+                begins.pop()
+
+        sa.event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        sa.event.listen(engine, "after_cursor_execute", after_cursor_execute)
+        sa.event.listen(engine, "handle_error", handle_error)
+
+    def timer(self, operation):
+        """
+        Returns a context manager that records the duration of an operation.
+
+        Args:
+            operation (str): The name of the operation, e.g. 'hash_password'.
+
+        Returns:
+            OperationTimer: The context manager.
+        """
+        return OperationTimer(self, operation)
+
+    def observe_operation(self, operation, duration):
+        with self._lock:
+            histogram = self._operations.get(operation)
+            if histogram is None:
+                histogram = self._operations[operation] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(duration)
+
+    def _observe_request(self, key, status, duration, statements, sql_duration):
+        with self._lock:
+            if key not in self._latencies:
+                self._latencies[key] = Histogram(LATENCY_BUCKETS)
+                self._statements[key] = Histogram(STATEMENT_BUCKETS)
+                self._sql_durations[key] = Histogram(LATENCY_BUCKETS)
+            self._latencies[key].observe(duration)
+            self._statements[key].observe(statements)
+            self._sql_durations[key].observe(sql_duration)
+            self._statuses[key + (status,)] = self._statuses.get(key + (status,), 0) + 1
+
+    def render(self):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        def labels(route, method):
+            return f'route="{escape(route)}",method="{method}"'
+
+        lines = []
+        with self._lock:
+            lines += ["# HELP http_requests_total Number of requests by route, method and status code.",
+                      "# TYPE http_requests_total counter"]
+            for (route, method, status), count in sorted(self._statuses.items()):
+                lines.append(f'http_requests_total{{{labels(route, method)},status="{status}"}} {count}')
+
+            for name, description, histograms in (
+                    ("http_request_duration_seconds", "Duration of requests.", self._latencies),
+                    ("http_request_sql_statements", "Number of SQL statements per request.", self._statements),
+                    ("http_request_sql_duration_seconds", "Time spent in SQL statements per request.",
+                     self._sql_durations)):
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                for (route, method), histogram in sorted(histograms.items()):
+                    lines += histogram.samples(name, labels(route, method))
+
+            lines += ["# HELP operation_duration_seconds Duration of CPU-bound operations.",
+                      "# TYPE operation_duration_seconds histogram"]
+            for operation, histogram in sorted(self._operations.items()):
+                lines += histogram.samples("operation_duration_seconds", f'operation="{operation}"')
+
+        return "\n".join(lines) + "\n"
+
+
+class OperationTimer:
+    """
+    A context manager recording the duration of an operation in Metrics, when they are enabled.
+    """
+
+    def __init__(self, metrics, operation):
+        self.metrics = metrics
+        self.operation = operation
+        self.begin = None
+
+    def __enter__(self):
+        if self.metrics.enabled:
+            self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.begin is not None:
+            self.metrics.observe_operation(self.operation, time.perf_counter() - self.begin)
+        return False
+
+
+def escape(value):
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
@@ -11,6 +11,8 @@ room_event_m2m = db.Table(
     "room_event",
     sa.Column("room_id", sa.ForeignKey('room.id')),
     sa.Column("event_id", sa.ForeignKey('event.id')),
+    sa.Index("ix_room_event_room_id_event_id", "room_id", "event_id", unique=True),
+    sa.Index("ix_room_event_event_id_room_id", "event_id", "room_id"),
 )
 
 
@@ -19,6 +21,38 @@ user_event_m2m = db.Table(
     "user_event",
     sa.Column("user_id", sa.ForeignKey('user.id')),
     sa.Column("event_id", sa.ForeignKey('event.id')),
+    sa.Index("ix_user_event_user_id_event_id", "user_id", "event_id", unique=True),
+    sa.Index("ix_user_event_event_id_user_id", "event_id", "user_id"),
+)
+
+
+room_series_m2m = db.Table(
+    # Reservations of recurring events (room_id, series_id)
+    "room_series",
+    sa.Column("room_id", sa.ForeignKey('room.id')),
+    sa.Column("series_id", sa.ForeignKey('event_series.id')),
+    sa.Index("ix_room_series_room_id_series_id", "room_id", "series_id", unique=True),
+    sa.Index("ix_room_series_series_id_room_id", "series_id", "room_id"),
+)
+
+
+room_event_archive_m2m = db.Table(
+    # Reservations of archived events (room_id, event_id)
+    "room_event_archive",
+    sa.Column("room_id", sa.ForeignKey('room.id')),
+    sa.Column("event_id", sa.ForeignKey('event_archive.id')),
+    sa.Index("ix_room_event_archive_room_id_event_id", "room_id", "event_id", unique=True),
+    sa.Index("ix_room_event_archive_event_id_room_id", "event_id", "room_id"),
+)
+
+
+user_event_archive_m2m = db.Table(
+    # Participants of archived events (event_id, user_id)
+    "user_event_archive",
+    sa.Column("user_id", sa.ForeignKey('user.id')),
+    sa.Column("event_id", sa.ForeignKey('event_archive.id')),
+    sa.Index("ix_user_event_archive_user_id_event_id", "user_id", "event_id", unique=True),
+    sa.Index("ix_user_event_archive_event_id_user_id", "event_id", "user_id"),
 )
 
 
@@ -114,6 +148,7 @@ class User(db.Model):
         lastName (str): The last name of the user.
         password (str): The hashed password of the user.
         role_id (int): The role ID of the user.
+        tokenVersion (int): The security version of the user. Tokens issued for an older version are rejected.
         events (list): The list of events associated with the user.
 
     Methods:
@@ -129,6 +164,7 @@ class User(db.Model):
     lastName = sa.Column(sa.String)
     password = sa.Column(sa.String, nullable=False)
     role_id = sa.Column(sa.ForeignKey(Role.id), default="1")
+    tokenVersion = sa.Column(sa.Integer, nullable=False, default=0, server_default="0")
     events = relationship("Event", secondary="user_event", backref='users')
 
     def obj_to_dict(self):
@@ -198,6 +234,11 @@ class Event(db.Model):
     Methods:
         obj_to_dict(): Converts the Event object to a dictionary.
     """
+    __table_args__ = (
+        sa.Index("ix_event_begin_end", "begin", "end"),
+        sa.Index("ix_event_ownerId_begin", "ownerId", "begin"),
+    )
+
     id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
     name = sa.Column(sa.String, nullable=False)
     description = sa.Column(sa.String)
@@ -228,6 +269,111 @@ class Event(db.Model):
 
 
 
+class ArchivedEvent(db.Model):
+    """
+    Represents a past event moved out of the event table by project.archive.EventArchive.
+
+    It keeps the ID and the columns of the Event, and its rooms and participants are moved to
+    the room_event_archive and user_event_archive tables.
+
+    Attributes:
+        id (int): The ID the event had in the event table.
+        name (str): The name of the event.
+        description (str): The description of the event.
+        link (str): The link associated with the event.
+        editPassword (str): The password for editing the event.
+        begin (datetime): The start time of the event.
+        end (datetime): The end time of the event.
+        ownerId (int): The ID of the owner of the event.
+    """
+    __tablename__ = "event_archive"
+    __table_args__ = (
+        sa.Index("ix_event_archive_begin_id", "begin", "id"),
+        sa.Index("ix_event_archive_ownerId_begin", "ownerId", "begin"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    name = sa.Column(sa.String, nullable=False)
+    description = sa.Column(sa.String)
+    link = sa.Column(sa.String)
+    editPassword = sa.Column(sa.String)
+    begin = sa.Column(sa.DateTime, nullable=False)
+    end = sa.Column(sa.DateTime, nullable=False)
+    ownerId = sa.Column(sa.Integer, sa.ForeignKey(User.id))
+
+
+class EventSeries(db.Model):
+    """
+    Represents a recurring event, stored once for all its occurrences.
+
+    Occurrences are not stored: they are expanded from the recurrence rule by
+    project.recurrence.occurrences for the time range a query asks for.
+
+    Attributes:
+        id (int): The unique identifier for the series.
+        name (str): The name of the events.
+        description (str): The description of the events.
+        link (str): The link associated with the events.
+        editPassword (str): The password for editing the series.
+        begin (datetime): The start time of the first occurrence.
+        end (datetime): The end time of the first occurrence.
+        ownerId (int): The ID of the owner of the series.
+        frequency (str): 'daily', 'weekly' or 'monthly'.
+        interval (int): The number of days, weeks or months between two occurrences.
+        count (int): The number of occurrences, or None if the series ends at 'until'.
+        until (datetime): The latest start of an occurrence, or None if the series ends after 'count' occurrences.
+        exceptions (list): The dates (in ISO format) of cancelled occurrences.
+        lastEnd (datetime): The end time of the last occurrence, to find the series overlapping a time range.
+        rooms (list): The list of rooms booked by the series.
+
+    Methods:
+        obj_to_dict(): Converts the EventSeries object to a dictionary.
+    """
+    __tablename__ = "event_series"
+    __table_args__ = (
+        sa.Index("ix_event_series_begin_lastEnd", "begin", "lastEnd"),
+        sa.Index("ix_event_series_ownerId_begin", "ownerId", "begin"),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    name = sa.Column(sa.String, nullable=False)
+    description = sa.Column(sa.String)
+    link = sa.Column(sa.String)
+    editPassword = sa.Column(sa.String)
+    begin = sa.Column(sa.DateTime, nullable=False)
+    end = sa.Column(sa.DateTime, nullable=False)
+    ownerId = sa.Column(sa.Integer, sa.ForeignKey(User.id))
+    frequency = sa.Column(sa.String, nullable=False)
+    interval = sa.Column(sa.Integer, nullable=False, default=1)
+    count = sa.Column(sa.Integer)
+    until = sa.Column(sa.DateTime)
+    exceptions = sa.Column(sa.JSON, nullable=False, default=list)
+    lastEnd = sa.Column(sa.DateTime, nullable=False)
+    rooms = relationship("Room", secondary="room_series")
+
+    def obj_to_dict(self):
+        """
+        Converts the EventSeries object to a dictionary.
+
+        Returns:
+            dict: A dictionary representation of the EventSeries object.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "link": self.link,
+            "begin": self.begin,
+            "end": self.end,
+            "ownerId": self.ownerId,
+            "frequency": self.frequency,
+            "interval": self.interval,
+            "count": self.count,
+            "until": self.until,
+            "exceptions": self.exceptions,
+        }
+
+
 class TokenBlacklist(db.Model):
     """
     Represents an event in the system.
@@ -238,5 +384,82 @@ class TokenBlacklist(db.Model):
         expiration_date (datetime): 
     """
     id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
-    tokenValue = sa.Column(sa.String, nullable=False)
-    expirationDate = sa.Column(sa.DateTime, nullable=False)
\ No newline at end of file
+    tokenValue = sa.Column(sa.String, nullable=False, index=True)
+    expirationDate = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+class UserTokenRevocation(db.Model):
+    """
+    Represents the revocation of all tokens of a user issued before a security version.
+
+    Attributes:
+        id (int): The unique identifier for the revocation.
+        userId (int): The ID of the user.
+        tokenVersion (int): The lowest security version still accepted for the user.
+        expirationDate (datetime): The date when the last token affected by the revocation expires.
+    """
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    userId = sa.Column(sa.Integer, sa.ForeignKey(User.id), nullable=False)
+    tokenVersion = sa.Column(sa.Integer, nullable=False)
+    expirationDate = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+class ChangeLog(db.Model):
+    """
+    Represents an entry of the append-only log of changes to rooms, events and series.
+
+    Entries are written in the transaction of the change they record, so their sequence
+    numbers follow the commit order of the changes.
+
+    Attributes:
+        seq (int): The sequence number of the entry, never reused.
+        entity (str): 'room', 'event' or 'series'.
+        entityId (int): The ID of the changed room, event or series.
+        operation (str): 'insert' or 'update'.
+        date (datetime): The date of the change.
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        sa.Index("ix_change_log_entity_entityId_seq", "entity", "entityId", "seq"),
+        {"sqlite_autoincrement": True},
+    )
+
+    seq = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    entity = sa.Column(sa.String, nullable=False)
+    entityId = sa.Column(sa.Integer, nullable=False)
+    operation = sa.Column(sa.String, nullable=False)
+    date = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+def upgrade_schema():
+    """
+    Brings an existing database up to date with the models without rebuilding it.
+
+    Missing tables are created, and missing columns and indexes are added to the existing ones.
+    Duplicate rows are removed from a table before a unique index is built on it, keeping the
+    oldest row. Must be called within an application context.
+    """
+    db.create_all()
+
+    with db.engine.begin() as connection:
+        inspector = sa.inspect(connection)
+        preparer = connection.dialect.identifier_preparer
+        for table in db.metadata.sorted_tables:
+            table_name = preparer.format_table(table)
+
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_spec = sa.schema.CreateColumn(column).compile(dialect=connection.dialect)
+                    connection.execute(sa.text(f"ALTER TABLE {table_name} ADD COLUMN {column_spec}"))
+
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                if index.unique:
+                    columns = ", ".join(preparer.quote(column.name) for column in index.columns)
+                    connection.execute(sa.text(
+                        f"DELETE FROM {table_name} WHERE rowid NOT IN "
+                        f"(SELECT MIN(rowid) FROM {table_name} GROUP BY {columns})"))
+                index.create(connection)
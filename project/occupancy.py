@@ -0,0 +1,229 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from project.models import Event, db, room_event_m2m
+from project.recurrence import find_series_occurrences
+
+SLOT_DURATION = timedelta(minutes=15)
+SLOTS_PER_DAY = timedelta(days=1) // SLOT_DURATION
+
+
+def slot_masks(begin, end, day):
+    """
+    Converts the part of a time range that falls on the given day into slot bitmaps.
+
+    Bit i of a bitmap stands for the i-th SLOT_DURATION slot of the day.
+
+    Args:
+        begin (datetime): The start of the time range.
+        end (datetime): The end of the time range.
+        day (date): The day.
+
+    Returns:
+        int, int: The bitmap of the slots the range touches, and the bitmap of the slots it fully covers.
+    """
+    midnight = datetime.combine(day, datetime.min.time())
+    begin = max(begin, midnight) - midnight
+    end = min(end, midnight + timedelta(days=1)) - midnight
+    if begin >= end:
+        return 0, 0
+
+    first_touched, first_covered = begin // SLOT_DURATION, -(-begin // SLOT_DURATION)
+    last_touched, last_covered = -(-end // SLOT_DURATION), end // SLOT_DURATION
+    touched = ((1 << (last_touched - first_touched)) - 1) << first_touched
+    covered = ((1 << (last_covered - first_covered)) - 1) << first_covered if last_covered > first_covered else 0
+    return touched, covered
+
+
+class OccupancyIndex:
+    """
+    Keeps, for each room and day, bitmaps of the SLOTS_PER_DAY slots occupied by its events.
+
+    A day is loaded from room_event and Event with one range query, plus the occurrences of the
+    series overlapping it, the first time it is
+    searched, and reloaded once it is older than OCCUPANCY_REFRESH_INTERVAL seconds so that
+    bookings made by other worker processes are picked up. Bookings made by this process are
+    applied right away with add_event and remove_event. At most OCCUPANCY_INDEX_DAYS days are
+    kept, the least recently searched ones are dropped first.
+
+    add_event and remove_event stamp each day they change with a new generation. A load whose
+    day was stamped while it ran may miss the change, so it is thrown away instead of stored,
+    and the rooms are checked against the database.
+
+    Two bitmaps are kept per room and day: the slots touched by any event, and the slots fully
+    covered by an event. A room whose touched slots miss the searched range is free, and a room
+    with a covered slot fully inside the range is busy. Only the remaining rooms, whose events
+    or searched range are not aligned to slots, need to be checked against the database.
+
+    Attributes:
+        app (Flask): The application whose database backs the index.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._days = OrderedDict()
+        self._generations = {}
+        self._stamps = itertools.count(1)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the occupancy index on the given application.
+
+        Args:
+            app (Flask): The application. The refresh interval in seconds is read from its
+                OCCUPANCY_REFRESH_INTERVAL setting and the number of kept days from OCCUPANCY_INDEX_DAYS.
+        """
+        self.app = app
+        app.config.setdefault("OCCUPANCY_REFRESH_INTERVAL", 5)
+        app.config.setdefault("OCCUPANCY_INDEX_DAYS", 366)
+        app.extensions["occupancy"] = self
+
+    def find_free_rooms(self, rooms_id, begin, end):
+        """
+        Selects the rooms that have no event overlapping the given time range.
+
+        Must be called within an application context.
+
+        Args:
+            rooms_id (list): The IDs of the candidate rooms.
+            begin (datetime): The start of the time range.
+            end (datetime): The end of the time range, on the same day as the start.
+
+        Returns:
+            list: The IDs of the free rooms, in the order of rooms_id.
+        """
+        touched_mask, covered_mask = slot_masks(begin, end, begin.date())
+        day = self._get_day(begin.date())
+        if day is None:
+            # No consistent snapshot of the day, every room is checked against the database.
+            day = {room_id: touched_mask for room_id in rooms_id}, {}
+        touched, covered = day
+
+        free, unsure = [], []
+        for room_id in rooms_id:
+            if not touched.get(room_id, 0) & touched_mask:
+                free.append(room_id)
+            elif not covered.get(room_id, 0) & covered_mask:
+                unsure.append(room_id)
+
+        if unsure:
+            busy = set(db.session.execute(
+                db.select(room_event_m2m.c.room_id).distinct()
+                .join(Event, room_event_m2m.c.event_id == Event.id)
+                .where(room_event_m2m.c.room_id.in_(unsure), Event.begin < end, Event.end > begin)).scalars())
+            busy.update(room_id for room_id, _, _, _ in find_series_occurrences(unsure, begin, end))
+            free_id = set(free).union(room_id for room_id in unsure if room_id not in busy)
+            free = [room_id for room_id in rooms_id if room_id in free_id]
+
+        return free
+
+    def add_event(self, rooms_id, begin, end):
+        """
+        Marks the slots of a newly booked event as occupied in the given rooms.
+
+        Args:
+            rooms_id (iterable): The IDs of the rooms of the event.
+            begin (datetime): The start of the event.
+            end (datetime): The end of the event.
+        """
+        with self._lock:
+            day = begin.date()
+            while day <= end.date():
+                entry = self._days.get(day)
+                touched_mask, covered_mask = slot_masks(begin, end, day)
+                if touched_mask:
+                    self._generations[day] = next(self._stamps)
+                if entry is not None and touched_mask:
+                    _, touched, covered = entry
+                    for room_id in rooms_id:
+                        touched[room_id] = touched.get(room_id, 0) | touched_mask
+                        covered[room_id] = covered.get(room_id, 0) | covered_mask
+                day += timedelta(days=1)
+
+    def remove_event(self, rooms_id, begin, end):
+        """
+        Frees the slots of a moved or cancelled event in the given rooms.
+
+        Other events may share the slots, so the affected rooms are reloaded for the days of
+        the event. A day changed again during the reload is dropped, to be loaded whole on its
+        next search. Must be called within an application context, after the change is committed.
+
+        Args:
+            rooms_id (iterable): The IDs of the rooms of the event.
+            begin (datetime): The former start of the event.
+            end (datetime): The former end of the event.
+        """
+        rooms_id = list(rooms_id)
+        with self._lock:
+            day = begin.date()
+            while day <= end.date():
+                if slot_masks(begin, end, day)[0]:
+                    self._generations[day] = next(self._stamps)
+                day += timedelta(days=1)
+            days = {day: self._generations[day] for day in self._days if slot_masks(begin, end, day)[0]}
+        for day, generation in days.items():
+            touched, covered = self._load_day(day, rooms_id)
+            with self._lock:
+                if self._generations.get(day) != generation:
+                    self._days.pop(day, None)
+                elif day in self._days:
+                    _, day_touched, day_covered = self._days[day]
+                    for room_id in rooms_id:
+                        day_touched[room_id] = touched.get(room_id, 0)
+                        day_covered[room_id] = covered.get(room_id, 0)
+
+    def clear(self):
+        """
+        Drops all loaded days.
+        """
+        with self._lock:
+            self._days.clear()
+            self._generations.clear()
+
+    def _get_day(self, day):
+        """
+        Returns the bitmaps of a day, or None if the day changed while it was loaded.
+        """
+        with self._lock:
+            entry = self._days.get(day)
+            if entry is not None and time.monotonic() - entry[0] < self.app.config["OCCUPANCY_REFRESH_INTERVAL"]:
+                self._days.move_to_end(day)
+                return entry[1], entry[2]
+            generation = self._generations.get(day)
+
+        loaded_at = time.monotonic()
+        touched, covered = self._load_day(day)
+        with self._lock:
+            if self._generations.get(day) != generation:
+                return None
+            self._days[day] = (loaded_at, touched, covered)
+            self._days.move_to_end(day)
+            while len(self._days) > self.app.config["OCCUPANCY_INDEX_DAYS"]:
+                self._days.popitem(last=False)
+        return touched, covered
+
+    def _load_day(self, day, rooms_id=None):
+        day_begin = datetime.combine(day, datetime.min.time())
+        day_end = day_begin + timedelta(days=1)
+        # Events never span more than a day, so the lower bound on begin keeps the range scan short.
+        query = db.select(room_event_m2m.c.room_id, Event.begin, Event.end) \
+            .join(Event, room_event_m2m.c.event_id == Event.id) \
+            .where(Event.begin >= day_begin - timedelta(days=1), Event.begin < day_end, Event.end > day_begin)
+        if rooms_id is not None:
+            query = query.where(room_event_m2m.c.room_id.in_(rooms_id))
+
+        rows = db.session.execute(query).all()
+        rows += [(room_id, begin, end) for room_id, begin, end, _ in find_series_occurrences(rooms_id, day_begin,
+                                                                                             day_end)]
+
+        touched, covered = {}, {}
+        for room_id, begin, end in rows:
+            touched_mask, covered_mask = slot_masks(begin, end, day)
+            touched[room_id] = touched.get(room_id, 0) | touched_mask
+            covered[room_id] = covered.get(room_id, 0) | covered_mask
+        return touched, covered
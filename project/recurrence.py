@@ -0,0 +1,187 @@
+import heapq
+import itertools
+from datetime import date, timedelta
+from project.models import EventSeries, db, room_series_m2m
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+MAX_OCCURRENCES = 500
+
+
+def add_months(value, months):
+    """
+    Moves a datetime by a number of months, keeping its day and time.
+
+    Returns:
+        datetime or None: The moved datetime, or None if the target month has no such day.
+    """
+    month = value.month - 1 + months
+    try:
+        return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        return None
+
+
+def _candidates(begin, frequency, interval, first_begin=None):
+    """
+    Yields (index, begin) of the occurrences of a rule, ignoring its count, until and exceptions.
+
+    Daily and weekly rules start right before first_begin instead of at the first occurrence.
+    Monthly rules skip months without the day of the first occurrence, and do not count them.
+    """
+    if frequency == "monthly":
+        index = 0
+        for months in itertools.count(0, interval):
+            occurrence_begin = add_months(begin, months)
+            if occurrence_begin is not None:
+                yield index, occurrence_begin
+                index += 1
+        return
+
+    step = timedelta(days=interval if frequency == "daily" else 7 * interval)
+    index = max(0, (first_begin - begin) // step) if first_begin is not None else 0
+    while True:
+        yield index, begin + index * step
+        index += 1
+
+
+def occurrences(series, window_begin=None, window_end=None):
+    """
+    Lazily expands the occurrences of a series that overlap a time range.
+
+    Occurrences on the dates of the exceptions of the series are skipped, but they still count
+    towards its count.
+
+    Args:
+        series (EventSeries): The series, or any object with its recurrence attributes.
+        window_begin (datetime): Only occurrences ending after it are yielded. Defaults to no limit.
+        window_end (datetime): Only occurrences beginning before it are yielded. Defaults to no limit.
+
+    Yields:
+        datetime, datetime: The begin and end of each occurrence, in chronological order.
+    """
+    duration = series.end - series.begin
+    exceptions = set(series.exceptions or ())
+    first_begin = window_begin - duration if window_begin is not None else None
+
+    for index, begin in _candidates(series.begin, series.frequency, series.interval, first_begin):
+        if series.count is not None and index >= series.count:
+            return
+        if series.until is not None and begin > series.until:
+            return
+        if window_end is not None and begin >= window_end:
+            return
+        if window_begin is not None and begin + duration <= window_begin:
+            continue
+        if begin.date().isoformat() in exceptions:
+            continue
+        yield begin, begin + duration
+
+
+def validate_recurrence(begin, recurrence):
+    """
+    Validates a recurrence rule sent by a client.
+
+    Args:
+        begin (datetime): The start of the first occurrence.
+        recurrence (dict): The rule, with 'frequency', and optionally 'interval', 'count',
+            'until' (datetime) and 'exceptions' (list of ISO dates).
+
+    Returns:
+        str or None: The description of the first broken rule, or None if the rule is valid.
+    """
+    if recurrence.get("frequency") not in FREQUENCIES:
+        return 'Invalid value for frequency parameter.'
+    interval = recurrence.get("interval", 1)
+    if type(interval) != int or interval < 1:
+        return 'Invalid value for interval parameter.'
+    count, until = recurrence.get("count"), recurrence.get("until")
+    if (count is None) == (until is None):
+        return 'Exactly one of count and until has to be provided.'
+    if count is not None and (type(count) != int or not 0 < count <= MAX_OCCURRENCES):
+        return f'Invalid value for count parameter, it has to be between 1 and {MAX_OCCURRENCES}.'
+    if until is not None and until < begin:
+        return 'Invalid value for until parameter.'
+    exceptions = recurrence.get("exceptions", [])
+    try:
+        if not isinstance(exceptions, list):
+            raise TypeError
+        for exception in exceptions:
+            date.fromisoformat(exception)
+    except (TypeError, ValueError):
+        return 'Invalid value for exceptions parameter.'
+    return None
+
+
+def find_series_occurrences(rooms_id, begin, end):
+    """
+    Finds the occurrences of the series booked in any of the given rooms that overlap a time range.
+
+    The series are fetched with one range query over the room_series association, then only
+    their occurrences inside the range are expanded.
+
+    Args:
+        rooms_id (iterable): The IDs of the rooms, or None for all rooms.
+        begin (datetime): The start of the time range.
+        end (datetime): The end of the time range.
+
+    Returns:
+        list: (room_id, begin, end, series) tuples, sorted by room and begin.
+    """
+    query = db.select(room_series_m2m.c.room_id, EventSeries) \
+        .join(EventSeries, room_series_m2m.c.series_id == EventSeries.id) \
+        .where(EventSeries.begin < end, EventSeries.lastEnd > begin)
+    if rooms_id is not None:
+        rooms_id = list(rooms_id)
+        if not rooms_id:
+            return []
+        query = query.where(room_series_m2m.c.room_id.in_(rooms_id))
+    rows = db.session.execute(query).all()
+
+    found = [(room_id, occurrence_begin, occurrence_end, series)
+             for room_id, series in rows for occurrence_begin, occurrence_end in occurrences(series, begin, end)]
+    found.sort(key=lambda occurrence: (occurrence[0], occurrence[1], occurrence[3].id))
+    return found
+
+
+def occurrence_to_dict(series, begin, end):
+    """
+    Converts an occurrence to a dictionary in the format of Event.obj_to_dict.
+
+    Occurrences are not stored, so their 'id' is None and they have the 'seriesId' of their series.
+
+    Returns:
+        dict: The dictionary representation of the occurrence.
+    """
+    return {
+        "id": None,
+        "seriesId": series.id,
+        "name": series.name,
+        "description": series.description,
+        "link": series.link,
+        "editPassword": series.editPassword,
+        "begin": begin,
+        "end": end,
+        "ownerId": series.ownerId,
+    }
+
+
+def merge_occurrences(series_list, after=None, limit=None):
+    """
+    Lazily merges the occurrences of many series in chronological order.
+
+    Args:
+        series_list (list): The series.
+        after (tuple): Only occurrences whose (begin, -series ID) sort key is greater are returned.
+            Defaults to all occurrences.
+        limit (int): The maximal number of occurrences to return. Defaults to no limit.
+
+    Returns:
+        list: Up to 'limit' (sort key, series, begin, end) tuples, sorted by sort key.
+    """
+    def expand(series):
+        for begin, end in occurrences(series, after[0] if after is not None else None):
+            if after is None or (begin, -series.id) > after:
+                yield (begin, -series.id), series, begin, end
+
+    merged = heapq.merge(*(expand(series) for series in series_list), key=lambda occurrence: occurrence[0])
+    return list(itertools.islice(merged, limit))
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import Response
+
+RESPONSE_CACHE_SIZE = 1024
+
+
+class ResponseCache:
+    """
+    Keeps serialized responses of rarely changing endpoints in memory, keyed by request.
+
+    Every entry carries a strong ETag computed from its body, so that the ETag of unchanged
+    data is the same in every worker process. Entries are dropped when the cached data changes
+    (bump) and are rebuilt once they are older than RESPONSE_CACHE_REFRESH_INTERVAL seconds, so
+    that changes made by other worker processes are picked up. At most RESPONSE_CACHE_SIZE
+    responses are kept, the least recently used ones are dropped first.
+
+    Attributes:
+        app (Flask): The application the cache belongs to.
+        version (int): The number of times the cached data changed in this process.
+    """
+
+    def __init__(self, app=None, max_size=RESPONSE_CACHE_SIZE):
+        self.app = None
+        self.max_size = max_size
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the response cache on the given application.
+
+        Args:
+            app (Flask): The application. The refresh interval in seconds is read from its
+                RESPONSE_CACHE_REFRESH_INTERVAL setting.
+        """
+        self.app = app
+        app.config.setdefault("RESPONSE_CACHE_REFRESH_INTERVAL", 5)
+        app.extensions["response_cache"] = self
+
+    def response(self, key, build):
+        """
+        Returns the cached response for the given key, building it on a miss.
+
+        Args:
+            key (hashable): Identifies the request, e.g. its path and query parameters.
+            build (callable): Creates the response when it is not cached.
+
+        Returns:
+            Response: A new response with the cached body and an ETag.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == self.version \
+                    and time.monotonic() - entry[1] < self.app.config["RESPONSE_CACHE_REFRESH_INTERVAL"]:
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+
+        if entry is None:
+            version = self.version
+            built = build()
+            body = built.get_data()
+            entry = (version, time.monotonic(), body, built.status_code, built.mimetype,
+                     [(name, value) for name, value in built.headers.items()
+                      if name not in ("Content-Type", "Content-Length")],
+                     hashlib.sha256(body).hexdigest())
+            with self._lock:
+                if version == self.version:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+
+        _, _, body, status, mimetype, headers, etag = entry
+        response = Response(body, status=status, mimetype=mimetype, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    def bump(self):
+        """
+        Drops all cached responses after the cached data changed.
+        """
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
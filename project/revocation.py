@@ -0,0 +1,197 @@
+import heapq
+import threading
+import time
+import sqlalchemy as sa
+from datetime import datetime
+from project.models import TokenBlacklist, UserTokenRevocation, db
+
+
+class RevocationList:
+    """
+    Keeps the set of revoked (logged out) tokens and the lowest accepted security version of
+    each user in memory.
+
+    The TokenBlacklist and UserTokenRevocation tables stay the source of truth shared by all
+    worker processes. Each
+    process loads it on first use, then a background sweeper periodically picks up tokens
+    revoked by other processes and purges expired ones, both from memory and from the table.
+    Revocations made by another process are therefore seen after at most one sweep interval.
+
+    Attributes:
+        app (Flask): The application whose database backs the list.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._expirations = {}
+        self._heap = []
+        self._last_id = 0
+        self._user_versions = {}
+        self._user_heap = []
+        self._last_user_revocation_id = 0
+        self._loaded = False
+        self._sweeper = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the revocation list on the given application.
+
+        Args:
+            app (Flask): The application. The sweep interval in seconds is read from its
+                REVOCATION_SWEEP_INTERVAL setting; 0 disables the background sweeper.
+        """
+        self.app = app
+        app.config.setdefault("REVOCATION_SWEEP_INTERVAL", 5)
+        app.extensions["revocations"] = self
+
+    def is_revoked(self, token):
+        """
+        Checks whether the given token has been revoked.
+
+        Args:
+            token (str): The JWT token.
+
+        Returns:
+            bool: True if the token has been revoked.
+        """
+        if not self._loaded:
+            self._load()
+        return token in self._expirations
+
+    def revoke(self, token, expiration_date):
+        """
+        Adds the given token to the in-memory list. The caller stores it in TokenBlacklist.
+
+        Args:
+            token (str): The JWT token.
+            expiration_date (datetime): The expiration date of the token.
+        """
+        with self._lock:
+            self._add(token, expiration_date)
+
+    def is_user_token_revoked(self, user_id, token_version):
+        """
+        Checks whether tokens of the given user and security version have been revoked.
+
+        Args:
+            user_id (int): The ID of the user.
+            token_version (int): The security version carried by the token.
+
+        Returns:
+            bool: True if the user's tokens of that version are no longer accepted.
+        """
+        if not self._loaded:
+            self._load()
+        entry = self._user_versions.get(user_id)
+        return entry is not None and token_version < entry[0]
+
+    def revoke_user_tokens(self, user_id, token_version, expiration_date):
+        """
+        Rejects the user's tokens issued for a security version lower than the given one. The
+        caller stores the revocation in UserTokenRevocation.
+
+        Args:
+            user_id (int): The ID of the user.
+            token_version (int): The lowest security version still accepted.
+            expiration_date (datetime): The date when the last affected token expires.
+        """
+        with self._lock:
+            self._add_user(user_id, token_version, expiration_date)
+
+    def sync(self):
+        """
+        Loads the revocations added to TokenBlacklist and UserTokenRevocation since the last sync.
+        Must be called within an application context.
+        """
+        now = datetime.now()
+        rows = db.session.execute(db.select(TokenBlacklist.id, TokenBlacklist.tokenValue,
+                                            TokenBlacklist.expirationDate)
+                                  .where(TokenBlacklist.id > self._last_id)
+                                  .where(TokenBlacklist.expirationDate >= now)).all()
+        user_rows = db.session.execute(db.select(UserTokenRevocation)
+                                       .where(UserTokenRevocation.id > self._last_user_revocation_id)
+                                       .where(UserTokenRevocation.expirationDate >= now)).scalars().all()
+        with self._lock:
+            for row in rows:
+                self._add(row.tokenValue, row.expirationDate)
+                self._last_id = max(self._last_id, row.id)
+            for row in user_rows:
+                self._add_user(row.userId, row.tokenVersion, row.expirationDate)
+                self._last_user_revocation_id = max(self._last_user_revocation_id, row.id)
+
+    def purge_expired(self, now=None):
+        """
+        Forgets revocations whose tokens have all expired, since those can no longer pass
+        signature verification.
+
+        Args:
+            now (datetime): The current date. Defaults to datetime.now().
+
+        Returns:
+            int: The number of forgotten tokens.
+        """
+        now = now or datetime.now()
+        purged = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] < now:
+                expiration_date, token = heapq.heappop(self._heap)
+                if self._expirations.get(token) == expiration_date:
+                    del self._expirations[token]
+                    purged += 1
+            while self._user_heap and self._user_heap[0][0] < now:
+                expiration_date, user_id, token_version = heapq.heappop(self._user_heap)
+                if self._user_versions.get(user_id) == (token_version, expiration_date):
+                    del self._user_versions[user_id]
+                    purged += 1
+        return purged
+
+    def sweep(self):
+        """
+        Runs one sweeper pass: syncs with the revocation tables and removes expired revocations
+        from memory and from the tables. Must be called within an application context.
+        """
+        self.sync()
+        self.purge_expired()
+        # The newest row is kept so that SQLite never hands out an id below the last synced one.
+        for model in (TokenBlacklist, UserTokenRevocation):
+            newest_id = db.select(sa.func.max(model.id)).scalar_subquery()
+            db.session.execute(db.delete(model).where(model.expirationDate < datetime.now(), model.id < newest_id))
+        db.session.commit()
+
+    def _add(self, token, expiration_date):
+        if token not in self._expirations:
+            self._expirations[token] = expiration_date
+            heapq.heappush(self._heap, (expiration_date, token))
+
+    def _add_user(self, user_id, token_version, expiration_date):
+        current_version, current_expiration_date = self._user_versions.get(user_id, (token_version, expiration_date))
+        entry = (max(token_version, current_version), max(expiration_date, current_expiration_date))
+        if self._user_versions.get(user_id) != entry:
+            self._user_versions[user_id] = entry
+            heapq.heappush(self._user_heap, (entry[1], user_id, entry[0]))
+
+    def _load(self):
+        with self._load_lock:
+            if self._loaded:
+                return
+            self.sync()
+            self._loaded = True
+
+            interval = self.app.config["REVOCATION_SWEEP_INTERVAL"]
+            if interval > 0:
+                self._sweeper = threading.Thread(target=self._run_sweeper, args=(interval,), daemon=True,
+                                                 name="revocation-sweeper")
+                self._sweeper.start()
+
+    def _run_sweeper(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    self.sweep()
+            except Exception:
+                self.app.logger.exception("Token revocation sweep failed.")
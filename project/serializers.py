@@ -0,0 +1,107 @@
+from collections import defaultdict
+import sqlalchemy as sa
+from project.models import Event, Room, db, room_event_m2m, room_series_m2m, user_event_m2m
+
+DETAIL_LEVELS = ("short", "full")
+
+# The boolean features of rooms.
+ROOM_FEATURES = ("projector", "conditioning", "tv", "ethernet", "wifi", "whiteboard")
+
+# The columns of Room.obj_to_dict_short and Room.obj_to_dict, by detail level.
+ROOM_COLUMNS = {
+    "short": (Room.id, Room.name, Room.description, Room.capacity),
+    "full": (Room.id, Room.name, Room.description, Room.capacity, Room.projector, Room.conditioning, Room.tv,
+             Room.ethernet, Room.wifi, Room.whiteboard),
+}
+
+# The columns of Event.obj_to_dict.
+EVENT_COLUMNS = (Event.id, Event.name, Event.description, Event.link, Event.editPassword, Event.begin, Event.end,
+                 Event.ownerId)
+
+
+def serialize_rows(rows):
+    """
+    Converts rows selected from ROOM_COLUMNS or EVENT_COLUMNS to dictionaries.
+
+    Selecting the columns as row tuples skips the hydration of ORM objects, and the
+    dictionaries are the same as the ones of obj_to_dict and obj_to_dict_short.
+
+    Args:
+        rows (list): The rows.
+
+    Returns:
+        list: The dictionaries, keyed by column name, in the order of rows.
+    """
+    return [row._asdict() for row in rows]
+
+
+def serialize_events(events, detail="short"):
+    """
+    Converts events to dictionaries.
+
+    Args:
+        events (list): The Event objects.
+        detail (str): 'short' for Event.obj_to_dict, 'full' to also include the rooms and the
+            number of participants of each event, see add_event_details.
+
+    Returns:
+        list: The dictionaries, in the order of events.
+    """
+    events = [event.obj_to_dict() for event in events]
+    if detail == "full":
+        add_event_details(events)
+    return events
+
+
+def add_event_details(events):
+    """
+    Adds the IDs of the rooms ('roomsId') and the number of participants ('participantsCount')
+    to event dictionaries.
+
+    The details of all events are loaded with two queries over the room_event and user_event
+    associations, whatever the number of events, instead of one lazy load of the rooms and
+    users relationships per event. The rooms of occurrences of recurring events are loaded
+    with one more query over room_series, and their only participant is their owner.
+
+    Args:
+        events (list): Event dictionaries holding at least the 'id' of the event, or the
+            'seriesId' and 'ownerId' of an occurrence.
+
+    Returns:
+        list: The same event dictionaries.
+    """
+    series_id = {event["seriesId"] for event in events if event["id"] is None}
+    if series_id:
+        series_rooms_id = defaultdict(list)
+        for event_series_id, room_id in db.session.execute(
+                db.select(room_series_m2m.c.series_id, room_series_m2m.c.room_id)
+                .where(room_series_m2m.c.series_id.in_(series_id))
+                .order_by(room_series_m2m.c.series_id, room_series_m2m.c.room_id)):
+            series_rooms_id[event_series_id].append(room_id)
+        for event in events:
+            if event["id"] is None:
+                event["roomsId"] = list(series_rooms_id[event["seriesId"]])
+                event["participantsCount"] = 0 if event["ownerId"] is None else 1
+
+    events_id = [event["id"] for event in events if event["id"] is not None]
+    if not events_id:
+        return events
+
+    rooms_id = defaultdict(list)
+    for event_id, room_id in db.session.execute(
+            db.select(room_event_m2m.c.event_id, room_event_m2m.c.room_id)
+            .where(room_event_m2m.c.event_id.in_(events_id))
+            .order_by(room_event_m2m.c.event_id, room_event_m2m.c.room_id)):
+        rooms_id[event_id].append(room_id)
+
+    participants_count = dict(db.session.execute(
+        db.select(user_event_m2m.c.event_id, sa.func.count())
+        .where(user_event_m2m.c.event_id.in_(events_id))
+        .group_by(user_event_m2m.c.event_id)).all())
+
+    for event in events:
+        if event["id"] is None:
+            continue
+        event["roomsId"] = rooms_id.get(event["id"], [])
+        event["participantsCount"] = participants_count.get(event["id"], 0)
+    return events
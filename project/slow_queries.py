@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import sqlalchemy as sa
+from flask import has_request_context, request
+from project.models import db
+
+JSON_TYPES = (str, int, float, bool, type(None))
+EXPLAINED_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class SlowQueryLog:
+    """
+    Records the SQL statements that run longer than the SLOW_QUERY_THRESHOLD setting.
+
+    Each entry holds the statement, its parameters, the route of the request that issued it,
+    its duration and, on SQLite, the output of EXPLAIN QUERY PLAN for it. Entries are logged
+    as warnings, with only the number and types of the parameters since they may hold emails or
+    password hashes, and the most recent SLOW_QUERY_LOG_SIZE ones are kept in memory with their
+    values, for administrators. The log is
+    opt-in: nothing is recorded while SLOW_QUERY_THRESHOLD is None.
+
+    Attributes:
+        app (Flask): The application whose engine is watched.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._entries = deque()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Registers the slow-query log on the given application and its database engine.
+
+        Args:
+            app (Flask): The application. The threshold in seconds is read from its
+                SLOW_QUERY_THRESHOLD setting (default None, disabled) and the number of kept
+                entries from SLOW_QUERY_LOG_SIZE (default 100).
+        """
+        self.app = app
+        app.config.setdefault("SLOW_QUERY_THRESHOLD", None)
+        app.config.setdefault("SLOW_QUERY_LOG_SIZE", 100)
+        app.extensions["slow_queries"] = self
+        with app.app_context():
+            sa.event.listen(db.engine, "before_cursor_execute", self._before_cursor_execute)
+            sa.event.listen(db.engine, "after_cursor_execute", self._after_cursor_execute)
+            sa.event.listen(db.engine, "handle_error", self._handle_error)
+
+    def entries(self):
+        """
+        Returns the recorded slow statements, the most recent first.
+
+        Returns:
+            list: Dictionaries with the 'statement', 'parameters', 'route', 'duration' in
+                seconds, 'date' and 'plan' (the EXPLAIN QUERY PLAN details, or None) of each entry.
+        """
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        """
+        Removes all recorded entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.app.config["SLOW_QUERY_THRESHOLD"] is not None:
+            conn.info.setdefault("slow_query_begin", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        begins = conn.info.get("slow_query_begin")
+        if not begins:
+            return
+        duration = time.perf_counter() - begins.pop()
+        threshold = self.app.config["SLOW_QUERY_THRESHOLD"]
+        if threshold is None or duration < threshold:
+            return
+
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        entry = {
+            "statement": statement,
+            "parameters": self._to_json(parameters),
+            "route": f"{request.method} {request.url_rule.rule}"
+                     if has_request_context() and request.url_rule is not None else None,
+            "duration": duration,
+            "date": datetime.now(),
+            "plan": self._explain(conn, statement, parameters),
+        }
+        self.app.logger.warning("Slow query (%.3f s) in %s: %s [%s]\n%s", duration, entry["route"], statement,
+                                self._describe(parameters), "\n".join(entry["plan"] or []))
+        with self._lock:
+            self._entries.append(entry)
+            while len(self._entries) > self.app.config["SLOW_QUERY_LOG_SIZE"]:
+                self._entries.popleft()
+
+    @staticmethod
+    def _handle_error(context):
+        # after_cursor_execute is not called for a failed statement.
+        begins = context.connection.info.get("slow_query_begin") if context.connection is not None else None
+        if begins:
+            begins.pop()
+
+    @staticmethod
+    def _explain(conn, statement, parameters):
+        keyword = statement.split(None, 1)[0].upper() if statement.strip() else ""
+        if conn.dialect.name != "sqlite" or keyword not in EXPLAINED_STATEMENTS:
+            return None
+        # A raw DBAPI cursor, so that the EXPLAIN statement does not trigger engine events.
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            return [row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+        except Exception:
+            return None
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _describe(parameters):
+        if isinstance(parameters, dict):
+            types = [f"{key}: {type(value).__name__}" for key, value in parameters.items()]
+        else:
+            types = [type(value).__name__ for value in parameters or ()]
+        return f"{len(types)} parameters: " + ", ".join(types) if types else "no parameters"
+
+    @staticmethod
+    def _to_json(parameters):
+        if isinstance(parameters, dict):
+            return {key: value if isinstance(value, JSON_TYPES) else str(value) for key, value in parameters.items()}
+        return [value if isinstance(value, JSON_TYPES) else str(value) for value in parameters or ()]
@@ -0,0 +1,91 @@
+import sqlalchemy as sa
+from project.models import db
+
+STORAGE_PROFILES = {
+    "default": {
+        "pragmas": {},
+        "engine_options": {},
+    },
+    "production": {
+        # Readers no longer wait for writers, and writers wait up to busy_timeout ms for the lock.
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -65536,
+            "mmap_size": 268435456,
+            "temp_store": "MEMORY",
+        },
+        "engine_options": {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+            "query_cache_size": 1200,
+            "connect_args": {"check_same_thread": False, "cached_statements": 256},
+        },
+    },
+}
+
+
+def is_file_sqlite(database_uri):
+    """
+    Checks whether the given URI points to a file-backed SQLite database.
+
+    Args:
+        database_uri (str): The URI of the database.
+
+    Returns:
+        bool: True for SQLite databases stored in a file, False for in-memory and other databases.
+    """
+    url = sa.engine.make_url(database_uri)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:") \
+        and url.query.get("mode") != "memory"
+
+
+def configure_storage(app, profile):
+    """
+    Applies a storage profile to the application. Must be called before db.init_app.
+
+    The engine options of the profile are stored in SQLALCHEMY_ENGINE_OPTIONS and its pragmas in
+    SQLITE_PRAGMAS, without overriding values already configured. Profiles only apply to
+    file-backed SQLite databases, in-memory databases keep the defaults of Flask-SQLAlchemy.
+
+    Args:
+        app (Flask): The application.
+        profile (str): The name of a profile of STORAGE_PROFILES.
+
+    Raises:
+        ValueError: If the profile does not exist.
+    """
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}")
+
+    app.config.setdefault("SQLITE_PRAGMAS", {})
+    if not is_file_sqlite(app.config["SQLALCHEMY_DATABASE_URI"]):
+        return
+
+    app.config["SQLITE_PRAGMAS"] = {**STORAGE_PROFILES[profile]["pragmas"], **app.config["SQLITE_PRAGMAS"]}
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {**STORAGE_PROFILES[profile]["engine_options"],
+                                               **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+
+
+def register_pragmas(app):
+    """
+    Sets the SQLITE_PRAGMAS of the application on every new database connection.
+    Must be called after db.init_app.
+
+    Args:
+        app (Flask): The application.
+    """
+    pragmas = app.config["SQLITE_PRAGMAS"]
+    if not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    with app.app_context():
+        sa.event.listen(db.engine, "connect", set_pragmas)
@@ -0,0 +1,360 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+from project.booking import validate_event_dates
+from project.functions import DATE_FORMAT, hash_password, validate_email
+from project.models import ArchivedEvent, Event, EventSeries, Room, User, db, room_event_archive_m2m, \
+    room_event_m2m, room_series_m2m, user_event_archive_m2m, user_event_m2m
+from project.recurrence import validate_recurrence
+from project.serializers import ROOM_FEATURES
+
+# The fields of the records of each kind, in the order of CSV columns.
+TRANSFER_FIELDS = {
+    "rooms": ("id", "name", "description", "capacity", "projector", "conditioning", "tv", "ethernet", "wifi",
+              "whiteboard"),
+    "events": ("id", "name", "description", "link", "editPassword", "begin", "end", "ownerId", "roomsId",
+               "participantsId"),
+    "users": ("id", "email", "firstName", "lastName", "password", "role_id"),
+    "series": ("id", "name", "description", "link", "editPassword", "begin", "end", "ownerId", "roomsId",
+               "frequency", "interval", "count", "until", "exceptions"),
+}
+# The owner that anonymous events had before they were stored with a null ownerId.
+ANONYMOUS_OWNER = "undefined"
+# The mimetype of each transfer format.
+TRANSFER_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+class InvalidRecord(ValueError):
+    """
+    Raised when an imported record breaks a validation rule. Its message describes the rule.
+    """
+
+
+def read_records(stream, fmt):
+    """
+    Parses the records of a CSV or NDJSON upload one at a time, without reading it whole.
+
+    CSV values are strings, and empty values become None. NDJSON values keep their JSON types.
+
+    Args:
+        stream (file): The binary stream of the upload, encoded in UTF-8.
+        fmt (str): 'csv' or 'ndjson'.
+
+    Yields:
+        dict or None: The record of each row or line, or None for a line that is not a JSON object.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for row in csv.DictReader(text):
+            yield {key: value if value != "" else None for key, value in row.items()}
+        return
+
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else None
+
+
+def format_records(records, kind, fmt):
+    """
+    Writes records as CSV or NDJSON, one chunk per record.
+
+    Lists are written to CSV as comma-separated values, so that the output of export_records
+    can be imported again.
+
+    Args:
+        records (iterable): The records to write.
+        kind (str): 'rooms', 'events', 'users' or 'series'.
+        fmt (str): 'csv' or 'ndjson'.
+
+    Yields:
+        str: The CSV header, then each record.
+    """
+    if fmt == "ndjson":
+        for record in records:
+            yield json.dumps(record) + "\n"
+        return
+
+    fields = TRANSFER_FIELDS[kind]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for record in records:
+        writer.writerow([",".join(map(str, value)) if isinstance(value, list) else value
+                         for value in (record[field] for field in fields)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _to_str(value):
+    if value is not None and not isinstance(value, str):
+        raise ValueError
+    return value
+
+
+def _to_int(value):
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+        raise ValueError
+    return value
+
+
+def _to_id(value):
+    value = _to_int(value)
+    if value is None or value <= 0:
+        raise ValueError
+    return value
+
+
+def _to_bool(value):
+    if isinstance(value, str) and value.lower() in ("true", "false", "1", "0"):
+        return value.lower() in ("true", "1")
+    if value is not None and not isinstance(value, bool):
+        raise ValueError
+    return value
+
+
+def _to_list(value):
+    if isinstance(value, str):
+        value = [part.strip() for part in value.split(",")]
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError
+    return value
+
+
+def _to_ids(value):
+    return {_to_id(item) for item in _to_list(value)}
+
+
+def _to_date(value):
+    return datetime.strptime(value, DATE_FORMAT) if value is not None else None
+
+
+def parse_room(record, restore=False):
+    """
+    Converts an imported room record into the columns of a new room, with the rules of POST /room.
+
+    Args:
+        record (dict): The record, holding every field of POST /room.
+        restore (bool): Whether the record comes from a backup and keeps its 'id'.
+
+    Returns:
+        dict: The column values of the room.
+
+    Raises:
+        InvalidRecord: If a field is missing or has an invalid value.
+    """
+    try:
+        row = {"name": _to_str(record["name"]), "description": _to_str(record["description"]),
+               "capacity": _to_int(record["capacity"])}
+        row.update({feature: _to_bool(record[feature]) for feature in ROOM_FEATURES})
+        if restore:
+            row["id"] = _to_id(record["id"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidRecord('Invalid room data.')
+    if row["name"] is None:
+        raise InvalidRecord('Invalid room data.')
+    return row
+
+
+def parse_user(record, restore=False):
+    """
+    Converts an imported user record into the columns of a new user, with the rules of POST /register.
+
+    Args:
+        record (dict): The record, holding the email, firstName, lastName and password of the user,
+            and optionally its role_id (1 by default).
+        restore (bool): Whether the record comes from a backup, keeps its 'id' and holds the
+            password hash instead of the password.
+
+    Returns:
+        dict: The column values of the user.
+
+    Raises:
+        InvalidRecord: If a field is missing or has an invalid value.
+    """
+    try:
+        row = {"email": _to_str(record["email"]), "firstName": _to_str(record["firstName"]),
+               "lastName": _to_str(record["lastName"]), "password": _to_str(record["password"]),
+               "role_id": _to_int(record.get("role_id")) or 1}
+        if restore:
+            row["id"] = _to_id(record["id"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidRecord('Invalid user data.')
+
+    if None in (row["email"], row["firstName"], row["lastName"], row["password"]):
+        raise InvalidRecord('All variables must be provided')
+    if not restore and len(row["password"]) < 6:
+        raise InvalidRecord('Password cannot be shorter than 6 characters')
+    if not validate_email(row["email"]):
+        raise InvalidRecord('Invalid email.')
+    if row["role_id"] not in (1, 2, 3, 4):
+        raise InvalidRecord('Invalid roleId value')
+    if not restore:
+        row["password"] = hash_password(row["password"])
+    return row
+
+
+def parse_event(record, restore=False):
+    """
+    Converts an imported event record into the columns of a new event, with the rules of POST /event.
+
+    Args:
+        record (dict): The record, holding every field of POST /event, and optionally the
+            'ownerId' of the event (None or ANONYMOUS_OWNER for anonymous events) and the
+            'participantsId' of its participants.
+        restore (bool): Whether the record comes from a backup: it keeps its 'id' and its
+            'editPassword' hash, and may begin in the past.
+
+    Returns:
+        dict: The column values of the event, with the sets of its 'roomsId' and 'participantsId'.
+
+    Raises:
+        InvalidRecord: If a field is missing or has an invalid value, or the dates break a booking rule.
+    """
+    try:
+        row = {"name": _to_str(record["name"]), "description": _to_str(record["description"]),
+               "link": _to_str(record["link"]), "begin": datetime.strptime(record["begin"], DATE_FORMAT),
+               "end": datetime.strptime(record["end"], DATE_FORMAT), "ownerId": None,
+               "roomsId": _to_ids(record["roomsId"]), "participantsId": _to_ids(record.get("participantsId"))}
+        if record.get("ownerId") not in (None, ANONYMOUS_OWNER):
+            row["ownerId"] = _to_id(record["ownerId"])
+        if restore:
+            row["id"] = _to_id(record["id"])
+            row["editPassword"] = _to_str(record.get("editPassword"))
+    except (KeyError, TypeError, ValueError):
+        raise InvalidRecord('Invalid event data.')
+    if row["name"] is None:
+        raise InvalidRecord('Invalid event data.')
+
+    error = validate_event_dates(row["begin"], row["end"], allow_past=restore)
+    if error is not None:
+        raise InvalidRecord(error)
+    return row
+
+
+def parse_series(record, restore=False):
+    """
+    Converts an imported series record into the columns of a new series, with the rules of
+    POST /event with a recurrence.
+
+    Args:
+        record (dict): The record, holding every field of POST /event, the 'frequency' of the
+            recurrence, either its 'count' or its 'until' date, and optionally its 'interval' (1 by
+            default), the list of its 'exceptions' and the 'ownerId' of the series.
+        restore (bool): Whether the record comes from a backup: it keeps its 'id' and its
+            'editPassword' hash, and may begin in the past.
+
+    Returns:
+        dict: The column values of the series, except 'lastEnd', with the set of its 'roomsId'.
+
+    Raises:
+        InvalidRecord: If a field is missing or has an invalid value, or the dates or the
+            recurrence break a rule.
+    """
+    try:
+        row = {"name": _to_str(record["name"]), "description": _to_str(record["description"]),
+               "link": _to_str(record["link"]), "begin": _to_date(record["begin"]), "end": _to_date(record["end"]),
+               "ownerId": None, "roomsId": _to_ids(record["roomsId"]), "frequency": _to_str(record["frequency"]),
+               "interval": _to_int(record.get("interval")), "count": _to_int(record.get("count")),
+               "until": _to_date(record.get("until")), "exceptions": _to_list(record.get("exceptions"))}
+        if record.get("ownerId") not in (None, ANONYMOUS_OWNER):
+            row["ownerId"] = _to_id(record["ownerId"])
+        if restore:
+            row["id"] = _to_id(record["id"])
+            row["editPassword"] = _to_str(record.get("editPassword"))
+    except (KeyError, TypeError, ValueError):
+        raise InvalidRecord('Invalid event data.')
+    if row["name"] is None or row["begin"] is None or row["end"] is None:
+        raise InvalidRecord('Invalid event data.')
+    if row["interval"] is None:
+        row["interval"] = 1
+
+    error = validate_event_dates(row["begin"], row["end"], allow_past=restore) \
+        or validate_recurrence(row["begin"], row)
+    if error is not None:
+        raise InvalidRecord(error)
+    row["exceptions"] = sorted(set(row["exceptions"]))
+    return row
+
+
+def _batches(columns, id_column, batch_size):
+    """
+    Reads rows ordered by ID in batches, each with its own keyset query, so that related rows
+    can be loaded per batch and no cursor stays open while the records are sent.
+    """
+    last_id = 0
+    while True:
+        rows = db.session.execute(db.select(*columns).where(id_column > last_id).order_by(id_column)
+                                  .limit(batch_size)).all()
+        if rows:
+            yield rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1].id
+
+
+def _group_ids(table, column, ids, key="event_id"):
+    grouped = defaultdict(list)
+    for object_id, related_id in db.session.execute(
+            db.select(table.c[key], table.c[column]).where(table.c[key].in_(ids))
+            .order_by(table.c[key], table.c[column])):
+        grouped[object_id].append(related_id)
+    return grouped
+
+
+def export_records(kind, batch_size):
+    """
+    Reads all rooms, events, users or series as records that the import accepts in restore mode.
+
+    Must be called within an application context. Events include the archived ones, with
+    their rooms ('roomsId') and participants ('participantsId'), and series their rooms and
+    recurrence rule. Users include their password hash. Dates are written in DATE_FORMAT.
+
+    Args:
+        kind (str): 'rooms', 'events', 'users' or 'series'.
+        batch_size (int): The number of rows read per query.
+
+    Yields:
+        dict: The record of each row, ordered by ID.
+    """
+    fields = TRANSFER_FIELDS[kind]
+    if kind == "series":
+        for rows in _batches(EventSeries.__table__.c, EventSeries.id, batch_size):
+            rooms_id = _group_ids(room_series_m2m, "room_id", [row.id for row in rows], key="series_id")
+            for row in rows:
+                record = dict(row._mapping, begin=row.begin.strftime(DATE_FORMAT), end=row.end.strftime(DATE_FORMAT),
+                              until=row.until.strftime(DATE_FORMAT) if row.until is not None else None,
+                              roomsId=rooms_id[row.id])
+                yield {field: record[field] for field in fields}
+        return
+
+    if kind != "events":
+        model = Room if kind == "rooms" else User
+        for rows in _batches([getattr(model, field) for field in fields], model.id, batch_size):
+            for row in rows:
+                yield dict(row._mapping)
+        return
+
+    for model, rooms_table, users_table in ((Event, room_event_m2m, user_event_m2m),
+                                            (ArchivedEvent, room_event_archive_m2m, user_event_archive_m2m)):
+        for rows in _batches(model.__table__.c, model.id, batch_size):
+            events_id = [row.id for row in rows]
+            rooms_id = _group_ids(rooms_table, "room_id", events_id)
+            participants_id = _group_ids(users_table, "user_id", events_id)
+            for row in rows:
+                record = dict(row._mapping, begin=row.begin.strftime(DATE_FORMAT), end=row.end.strftime(DATE_FORMAT),
+                              ownerId=row.ownerId if row.ownerId != ANONYMOUS_OWNER else None,
+                              roomsId=rooms_id[row.id], participantsId=participants_id[row.id])
+                yield {field: record[field] for field in fields}
@@ -1,4 +1,5 @@
 import pytest
+import sqlalchemy as sa
 from project.app import create_app
 from project.models import db, User
 
@@ -8,6 +9,9 @@ def app():
     app = create_app("sqlite://")
     app.config.update({
         "TESTING": True,
+        "REVOCATION_SWEEP_INTERVAL": 0,
+        "CHANGE_LOG_COMPACT_INTERVAL": 0,
+        "ARCHIVE_INTERVAL": 0,
     })
 
     with app.app_context():
@@ -24,3 +28,21 @@ def client(app):
     return app.test_client()
 
 
+@pytest.fixture()
+def statements(app):
+    """
+    Records the (statement, parameters) of every SQL statement the application executes.
+    Tests clear the list before the requests they measure.
+    """
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append((statement, parameters))
+
+    with app.app_context():
+        sa.event.listen(db.engine, "before_cursor_execute", record)
+    yield recorded
+    with app.app_context():
+        sa.event.remove(db.engine, "before_cursor_execute", record)
+
+
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from project.functions import generate_token
+from project.models import db, ArchivedEvent, Event, User, room_event_m2m, user_event_archive_m2m, user_event_m2m
+from tests.test_broker import read_change, stream
+from tests.test_event import add_room, event_data
+
+
+def test_archive(client, app):
+    first_room, second_room = add_room(app, "101"), add_room(app, "102")
+    headers = {"Authorization": "Bearer " + generate_token(1, 4)}
+    with app.app_context():
+        db.session.add(User(email="user@test.com", password="password", role_id=1))
+        db.session.commit()
+
+    events = [client.post("/event", json=event_data(hour, 0, hour + 1, 0, rooms_id), headers=headers).json
+              for hour, rooms_id in ((10, [first_room]), (12, [first_room, second_room]), (14, [second_room]))]
+    client.post(f"/event/{events[0]['id']}/user", json={"email": "user@test.com"}, headers=headers)
+
+    assert app.test_cli_runner().invoke(args=["archive-events"]).output == "Archived 0 events.\n"
+    with app.app_context():
+        archive = app.extensions["archive"]
+        assert archive.archive() == 0
+        assert archive.archive(datetime.now() + timedelta(days=32)) == 2
+        assert db.session.execute(db.select(Event.id)).scalars().all() == [events[2]["id"]]
+        assert db.session.execute(db.select(ArchivedEvent.id)).scalars().all() == [events[0]["id"], events[1]["id"]]
+        assert db.session.execute(db.select(room_event_m2m.c.event_id)).scalars().all() == [events[2]["id"]]
+        assert db.session.execute(db.select(user_event_m2m.c.event_id)).scalars().all() == [events[2]["id"]]
+        assert len(db.session.execute(db.select(user_event_archive_m2m)).all()) == 3
+
+    first_page = client.get("/events/history?limit=1")
+    last_page = client.get(f"/events/history?limit=1&cursor={first_page.headers['X-Next-Cursor']}")
+    in_room = client.get(f"/events/history?roomId={second_room}")
+    for_user = client.get("/user/events/history", headers=headers)
+
+    assert [(event["id"], event["roomsId"]) for event in first_page.json + last_page.json] == [
+        (events[0]["id"], [first_room]), (events[1]["id"], [first_room, second_room])]
+    assert first_page.json[0]["begin"][17:22] == "10:00" and "X-Next-Cursor" not in last_page.headers
+    assert [event["id"] for event in in_room.json] == [events[1]["id"]]
+    assert [event["id"] for event in for_user.json] == [events[0]["id"], events[1]["id"]]
+    assert client.get("/events/history?roomId=abc").status_code == 400
+
+    new_event = client.post("/event", json=event_data(16, 0, 17, 0, [first_room]), headers=headers).json
+    assert new_event["id"] > events[2]["id"]
+
+
+def test_archive_records_changes(stream, client, app):
+    room_id, other_room_id = add_room(app, "101"), add_room(app, "102")
+    headers = {"Authorization": "Bearer " + generate_token(1, 4)}
+    events = [client.post("/event", json=event_data(hour, 0, hour + 1, 0, [room_id]), headers=headers).json
+              for hour in (10, 12)]
+    app.config["SSE_MAX_DURATION"] = 5
+    messages = stream(f"/room/{room_id}/stream")
+    other_messages = stream(f"/room/{other_room_id}/stream")
+
+    with app.app_context():
+        assert app.extensions["archive"].archive(datetime.now() + timedelta(days=32)) == 1
+
+    kind, seq, entry = read_change(messages)
+    assert (kind, entry["entity"], entry["entityId"], entry["operation"]) \
+        == ("change", "event", events[0]["id"], "archive")
+    assert (entry["data"]["id"], entry["data"]["roomsId"]) == (events[0]["id"], [room_id])
+    assert client.get("/events/changes").json[-1]["seq"] == int(seq)
+    assert next(other_messages) == b": heartbeat\n\n"
@@ -0,0 +1,30 @@
+import asyncio
+import pytest
+import project.asgi
+
+
+def test_asgi_module_without_a2wsgi(monkeypatch):
+    monkeypatch.setattr(project.asgi, "WSGIMiddleware", None)
+
+    with pytest.raises(RuntimeError, match="a2wsgi"):
+        project.asgi.create_asgi_app("sqlite://")
+
+
+def test_asgi_app_serves_requests():
+    pytest.importorskip("a2wsgi")
+    asgi_app = project.asgi.create_asgi_app("sqlite://", workers=2)
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"", "headers": [],
+             "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 5000)}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+
+    assert messages[0]["type"] == "http.response.start" and messages[0]["status"] == 200
+    assert b"".join(message.get("body", b"") for message in messages[1:]).strip() == b'"Hello World!"'
@@ -0,0 +1,24 @@
+from benchmarks.datagen import generate_dataset
+from benchmarks.load import Scenario, run_test_client
+from project.booking import find_conflicting_events
+from project.models import db, Event, room_event_m2m
+
+
+def test_generate_dataset(app):
+    with app.app_context():
+        dataset = generate_dataset(rooms=5, events=200, users=20)
+
+        assert db.session.execute(db.select(db.func.count(Event.id))).scalar() == 200
+        for room_id, event_id, begin, end in db.session.execute(
+                db.select(room_event_m2m.c.room_id, Event.id, Event.begin, Event.end)
+                .join(Event, room_event_m2m.c.event_id == Event.id)):
+            assert begin.date() == end.date()
+            assert find_conflicting_events([room_id], begin, end, exclude_event_id=event_id) == []
+
+    results = run_test_client(app, Scenario(dataset), requests=2)
+
+    assert all(int(status) < 500 for summary in results.values() for status in summary["statuses"])
+    assert results["GET /stats/token-cache"]["statuses"] == {"200": 2}
+    for name in ("GET /events/history", "GET /events/changes", "POST /event?recurrence", "GET /rooms/available?series",
+                 "POST /admin/import/events", "GET /admin/export/rooms", "GET /user/events/history", "GET /metrics"):
+        assert results[name]["statuses"] == {"200": 2}
@@ -0,0 +1,85 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from project.app import DATE_FORMAT, create_app
+from project.booking import BookingCoordinator
+from project.models import db, Event, Room, room_event_m2m
+
+ROOMS = 3
+BOOKINGS = 300
+THREADS = 16
+
+
+class RecordingLock:
+    def __init__(self, stripe, acquired):
+        self.stripe = stripe
+        self.acquired = acquired
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        self.acquired.append(self.stripe)
+        self.lock.acquire()
+
+    def release(self):
+        self.lock.release()
+
+
+def test_lock_stripes_are_acquired_in_order(app):
+    app.config["BOOKING_LOCK_STRIPES"] = 4
+    coordinator = BookingCoordinator(app)
+    acquired = []
+    coordinator._stripes = [RecordingLock(stripe, acquired) for stripe in range(4)]
+
+    with app.app_context():
+        with coordinator.lock([7, 2, 5, 6]):
+            pass
+
+    assert acquired == [1, 2, 3]
+    assert not any(stripe.lock.locked() for stripe in coordinator._stripes)
+
+
+def test_concurrent_bookings_never_overlap(tmp_path):
+    # Two applications on one database file stand for two worker processes with their own locks.
+    apps = [create_app(f"sqlite:///{tmp_path / 'database.db'}") for _ in range(2)]
+    for app in apps:
+        app.config.update({"TESTING": True, "REVOCATION_SWEEP_INTERVAL": 0, "CHANGE_LOG_COMPACT_INTERVAL": 0})
+    with apps[0].app_context():
+        db.create_all()
+        rooms = [Room(name=str(number), capacity=10) for number in range(ROOMS)]
+        db.session.add_all(rooms)
+        db.session.commit()
+        rooms_id = [room.id for room in rooms]
+
+    day = datetime.today().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    rng = random.Random(0)
+    requests = []
+    for number in range(BOOKINGS):
+        begin = day + timedelta(minutes=15 * rng.randrange(16))
+        requests.append((apps[number % 2], {
+            "name": str(number), "description": None, "link": None, "begin": begin.strftime(DATE_FORMAT),
+            "end": (begin + timedelta(minutes=15 * rng.randint(1, 4))).strftime(DATE_FORMAT),
+            "roomsId": rng.sample(rooms_id, rng.randint(1, 2))}))
+
+    def book(request):
+        app, data = request
+        return app.test_client().post("/event", json=data).status_code
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        statuses = list(executor.map(book, requests))
+
+    with apps[0].app_context():
+        first, second = db.aliased(room_event_m2m), db.aliased(room_event_m2m)
+        first_event, second_event = db.aliased(Event), db.aliased(Event)
+        overlaps = db.session.execute(
+            db.select(db.func.count())
+            .select_from(first)
+            .join(second, (first.c.room_id == second.c.room_id) & (first.c.event_id < second.c.event_id))
+            .join(first_event, first_event.id == first.c.event_id)
+            .join(second_event, second_event.id == second.c.event_id)
+            .where(first_event.begin < second_event.end, second_event.begin < first_event.end)).scalar()
+        booked = db.session.execute(db.select(db.func.count(Event.id))).scalar()
+
+    assert set(statuses) <= {200, 400}
+    assert overlaps == 0
+    assert booked == statuses.count(200) > 0
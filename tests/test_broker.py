@@ -0,0 +1,98 @@
+import json
+import pytest
+import project.broker
+from tests.test_event import add_room, event_data
+
+
+@pytest.fixture()
+def stream(app, client):
+    app.config.update({"SSE_POLL_INTERVAL": 0, "SSE_HEARTBEAT_INTERVAL": 0.01})
+    responses = []
+
+    def open_stream(url, **kwargs):
+        response = client.get(url, **kwargs)
+        responses.append(response)
+        assert response.status_code == 200 and response.mimetype == "text/event-stream"
+        return iter(response.response)
+
+    yield open_stream
+    for response in responses:
+        response.close()
+
+
+def read_change(messages):
+    message = next(messages)
+    while message.startswith(b":"):
+        message = next(messages)
+    fields = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+    return fields["event"], fields.get("id"), json.loads(fields["data"])
+
+
+def test_room_stream(stream, client, app):
+    room_id, other_room_id = add_room(app, "101"), add_room(app, "102")
+    messages = stream(f"/room/{room_id}/stream")
+
+    client.post("/event", json=event_data(10, 0, 11, 0, [other_room_id]))
+    event = client.post("/event", json=event_data(10, 0, 11, 0, [room_id])).json
+    client.patch(f"/event/{event['id']}?password={event['password']}", json=event_data(9, 0, 10, 0, [room_id]))
+
+    kind, first_id, first = read_change(messages)
+    _, second_id, second = read_change(messages)
+    assert kind == "change" and (first["entityId"], first["operation"]) == (event["id"], "insert")
+    assert (second["entityId"], second["operation"]) == (event["id"], "update")
+    assert second["data"]["begin"][17:22] == "09:00" and int(second_id) > int(first_id)
+    assert next(messages) == b": heartbeat\n\n"
+
+
+def test_rooms_stream_resume(stream, client, app):
+    room_id, other_room_id = add_room(app, "101"), add_room(app, "102")
+    first = client.post("/event", json=event_data(10, 0, 11, 0, [room_id])).json
+    second = client.post("/event", json=event_data(10, 0, 11, 0, [other_room_id])).json
+    seq = client.get("/events/changes").json[0]["seq"]
+
+    messages = stream(f"/rooms/stream?roomsId={room_id},{other_room_id}", headers={"Last-Event-ID": str(seq)})
+    third = client.post("/event", json=event_data(12, 0, 13, 0, [room_id])).json
+
+    assert [read_change(messages)[2]["entityId"] for _ in range(2)] == [second["id"], third["id"]]
+    assert first["id"] not in (second["id"], third["id"])
+
+
+def test_stream_overflow(stream, client, app):
+    app.config["SSE_BUFFER_SIZE"] = 1
+    room_id = add_room(app)
+    messages = stream(f"/room/{room_id}/stream")
+
+    for hour in (8, 10, 12):
+        client.post("/event", json=event_data(hour, 0, hour + 1, 0, [room_id]))
+
+    _, seq, _ = read_change(messages)
+    assert read_change(messages) == ("overflow", None, {"lastEventId": int(seq)})
+
+
+@pytest.mark.parametrize("url,headers", [("/room/999/stream", {}), ("/room/abc/stream", {}),
+                                         ("/rooms/stream?roomsId=1,a", {}),
+                                         ("/rooms/stream", {"Last-Event-ID": "last"})])
+def test_stream_invalid(url, headers, client, app):
+    assert client.get(url, headers=headers).status_code == 400
+
+
+def test_backfill_batches(client, app, monkeypatch):
+    monkeypatch.setattr(project.broker, "BACKFILL_BATCH_SIZE", 1)
+    room_id = add_room(app)
+    for hour in (8, 10, 12):
+        client.post("/event", json=event_data(hour, 0, hour + 1, 0, [room_id]))
+
+    with app.app_context():
+        broker = app.extensions["broker"]
+        expected = broker.changes.changes(0, 10)
+        reads = []
+        changes = broker.changes.changes
+        monkeypatch.setattr(broker.changes, "changes",
+                            lambda since, limit: reads.append(since) or changes(since, limit))
+        subscription = broker.subscribe()
+        entries = broker.backfill(subscription, 0)
+
+        first = next(entries)
+        assert reads == [0]
+        assert [first] + list(entries) == expected and len(reads) == len(expected) + 1
+        broker.unsubscribe(subscription)
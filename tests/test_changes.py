@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from project.functions import generate_token
+from project.models import db, ChangeLog, User
+from tests.test_event import add_room, event_data
+
+
+def sync(client, since=None):
+    response = client.get("/events/changes", query_string={} if since is None else {"since": since})
+    return response.json, response.headers["X-Next-Cursor"]
+
+
+def test_changes(client, app):
+    room_id = add_room(app)
+    headers = {"Authorization": "Bearer " + generate_token(1, 4)}
+    with app.app_context():
+        db.session.add(User(email="user@test.com", password="password", role_id=1))
+        db.session.commit()
+
+    first = client.post("/event", json=event_data(10, 0, 11, 0, [room_id]), headers=headers).json
+    entries, cursor = sync(client)
+    second = client.post("/events/bulk", json={"events": [event_data(12, 0, 13, 0, [room_id])]}).json
+    client.patch(f"/event/{first['id']}?password={first['password']}", json=event_data(9, 0, 10, 0, [room_id]))
+    client.post(f"/event/{first['id']}/user", json={"email": "user@test.com"}, headers=headers)
+    changes, next_cursor = sync(client, cursor)
+
+    assert [(entry["entity"], entry["operation"]) for entry in entries] == [("event", "insert")]
+    assert [(entry["entityId"], entry["operation"]) for entry in changes] == [
+        (second["results"][0]["id"], "insert"), (first["id"], "update"), (first["id"], "update")]
+    assert changes[-1]["data"]["begin"][17:22] == "09:00" and changes[-1]["data"]["participantsCount"] == 2
+    assert sync(client, next_cursor) == ([], next_cursor)
+
+
+def test_changes_rooms_and_series(client, app):
+    headers = {"Authorization": "Bearer " + generate_token(1, 4)}
+    client.post("/room", json={"name": "101", "description": "", "capacity": 10, "projector": True,
+                               "conditioning": False, "tv": False, "ethernet": False, "whiteboard": False,
+                               "wifi": True}, headers=headers)
+    with app.app_context():
+        room_id = db.session.execute(db.select(ChangeLog.entityId)).scalar_one()
+    data = event_data(10, 0, 11, 0, [room_id])
+    data["recurrence"] = {"frequency": "weekly", "count": 2}
+    series_id = client.post("/event", json=data).json["seriesId"]
+
+    entries, _ = sync(client)
+
+    assert [(entry["entity"], entry["data"]["id"]) for entry in entries] == [("room", room_id), ("series", series_id)]
+    assert entries[0]["data"]["projector"] is True and entries[1]["data"]["roomsId"] == [room_id]
+
+
+def test_changes_compaction(client, app):
+    room_id = add_room(app)
+    event = client.post("/event", json=event_data(10, 0, 11, 0, [room_id])).json
+    for hour in (11, 12):
+        client.patch(f"/event/{event['id']}?password={event['password']}",
+                     json=event_data(hour, 0, hour + 1, 0, [room_id]))
+    other = client.post("/event", json=event_data(8, 0, 9, 0, [room_id])).json
+
+    with app.app_context():
+        removed = app.extensions["changes"].compact(datetime.now() + timedelta(days=8))
+
+    entries, _ = sync(client)
+    assert removed == 2
+    assert [(entry["entityId"], entry["operation"]) for entry in entries] == [(event["id"], "update"),
+                                                                              (other["id"], "insert")]
+
+
+def test_changes_invalid(client, app):
+    assert client.get("/events/changes?since=abc").status_code == 400
+    assert client.get("/events/changes?limit=101").status_code == 400
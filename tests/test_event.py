@@ -0,0 +1,254 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from project.app import DATE_FORMAT
+from project.booking import find_conflicting_events
+from project.functions import generate_token
+from project.models import db, Event, Room
+
+
+def add_room(app, name="101"):
+    with app.app_context():
+        room = Room(name=name, capacity=10)
+        db.session.add(room)
+        db.session.commit()
+        return room.id
+
+
+def event_data(begin_hour, begin_minute, end_hour, end_minute, rooms_id):
+    day = datetime.today() + timedelta(days=1)
+    return {
+        "name": "Event",
+        "description": "Test event",
+        "link": None,
+        "begin": day.replace(hour=begin_hour, minute=begin_minute, second=0).strftime(DATE_FORMAT),
+        "end": day.replace(hour=end_hour, minute=end_minute, second=0).strftime(DATE_FORMAT),
+        "roomsId": rooms_id
+    }
+
+
+def test_event_post(client, app):
+    room_id = add_room(app)
+
+    response = client.post("/event", json=event_data(10, 0, 11, 0, [room_id]))
+
+    assert response.status_code == 200
+    assert response.json["id"] is not None
+
+
+def test_event_post_invalid_room(client, app):
+    response = client.post("/event", json=event_data(10, 0, 11, 0, [999]))
+
+    assert response.status_code == 400
+
+
+def test_event_post_string_room_ids(client, app):
+    room_id = add_room(app)
+
+    response = client.post("/event", json=event_data(10, 0, 11, 0, [str(room_id)]))
+    series = dict(event_data(12, 0, 13, 0, [str(room_id)]), recurrence={"frequency": "weekly", "count": 2})
+
+    assert response.status_code == 200
+    assert client.get(f"/room/{room_id}/events").json[0]["id"] == response.json["id"]
+    assert client.post("/event", json=series).status_code == 200
+    assert client.post("/event", json=event_data(14, 0, 15, 0, ["abc"])).status_code == 400
+    assert client.post("/event", json=event_data(14, 0, 15, 0, 1)).status_code == 400
+
+
+@pytest.mark.parametrize(
+    "begin_hour,begin_minute,end_hour,end_minute,statuscode",
+    [
+        (10, 0, 11, 0, 400),
+        (9, 0, 12, 0, 400),
+        (10, 15, 10, 45, 400),
+        (9, 30, 10, 30, 400),
+        (10, 30, 11, 30, 400),
+        (9, 0, 10, 0, 200),
+        (11, 0, 12, 0, 200),
+    ]
+)
+def test_event_post_collision(begin_hour, begin_minute, end_hour, end_minute, statuscode, client, app):
+    room_id = add_room(app)
+    client.post("/event", json=event_data(10, 0, 11, 0, [room_id]))
+
+    response = client.post("/event", json=event_data(begin_hour, begin_minute, end_hour, end_minute, [room_id]))
+
+    assert response.status_code == statuscode
+
+
+def test_find_conflicting_events(client, app):
+    first_room_id = add_room(app, "101")
+    second_room_id = add_room(app, "102")
+    first_id = client.post("/event", json=event_data(10, 0, 11, 0, [first_room_id])).json["id"]
+    second_id = client.post("/event", json=event_data(10, 0, 11, 0, [second_room_id])).json["id"]
+
+    day = datetime.today() + timedelta(days=1)
+    begin = day.replace(hour=9, minute=0, second=0, microsecond=0)
+    end = day.replace(hour=12, minute=0, second=0, microsecond=0)
+    with app.app_context():
+        assert find_conflicting_events([first_room_id, second_room_id], begin, end) == [first_id, second_id]
+        assert find_conflicting_events([second_room_id], begin, end) == [second_id]
+        assert find_conflicting_events([first_room_id], begin, end, exclude_event_id=first_id) == []
+
+
+def test_events_pagination(client, app):
+    day = datetime.today().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    with app.app_context():
+        # Two events share a begin date to exercise the id tie-breaker.
+        db.session.add_all([Event(name=str(number), begin=day + timedelta(hours=number // 2),
+                                  end=day + timedelta(hours=number // 2, minutes=30)) for number in range(5)])
+        db.session.commit()
+
+    names = []
+    response = client.get("/events?limit=2")
+    while True:
+        assert response.status_code == 200
+        names += [event["name"] for event in response.json]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        response = client.get(f"/events?limit=2&cursor={response.headers['X-Next-Cursor']}")
+
+    assert names == ["0", "1", "2", "3", "4"]
+
+
+@pytest.mark.parametrize(
+    "path,headers",
+    [
+        ("/events/export", {}),
+        ("/events", {"Accept": "application/x-ndjson"}),
+    ]
+)
+def test_events_export(path, headers, client, app):
+    day = datetime.today().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    with app.app_context():
+        db.session.add_all([Event(name=str(number), begin=day - timedelta(hours=number),
+                                  end=day - timedelta(hours=number, minutes=-30)) for number in range(3)])
+        db.session.commit()
+
+    response = client.get(path, headers=headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["2", "1", "0"]
+
+
+def test_room_events(client, app):
+    room_id = add_room(app)
+    for hour in (12, 8, 10):
+        client.post("/event", json=event_data(hour, 0, hour + 1, 0, [room_id]))
+    day = datetime.today() + timedelta(days=1)
+
+    upcoming = client.get(f"/room/{room_id}/events?limit=2")
+    on_day = client.get(f"/room/{room_id}/events?day={day.day}&month={day.month}&year={day.year}")
+    in_range = client.get(f"/room/{room_id}/events", query_string={
+        "from": day.replace(hour=9, minute=30, second=0).strftime(DATE_FORMAT),
+        "to": day.replace(hour=12, minute=0, second=0).strftime(DATE_FORMAT)
+    })
+
+    assert [event["begin"][17:22] for event in upcoming.json] == ["08:00", "10:00"]
+    assert [event["begin"][17:22] for event in on_day.json] == ["08:00", "10:00", "12:00"]
+    assert [event["begin"][17:22] for event in in_range.json] == ["10:00"]
+
+
+@pytest.mark.parametrize(
+    "room,query",
+    [
+        ("999", ""),
+        ("abc", ""),
+        ("1", "limit=21"),
+        ("1", "day=32&month=1&year=2030"),
+        ("1", "day=1"),
+        ("1", "from=2030-01-01T10:00:00"),
+        ("1", "from=2030-01-01T10:00:00&to=2030-01-01T09:00:00"),
+        ("1", "from=2030-01-01T10:00:00&to=2030-03-01T10:00:00"),
+    ]
+)
+def test_room_events_invalid(room, query, client, app):
+    add_room(app)
+
+    response = client.get(f"/room/{room}/events?{query}")
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("mode", ["atomic", "partial"])
+def test_events_bulk(mode, client, app):
+    first_room_id = add_room(app, "101")
+    second_room_id = add_room(app, "102")
+    client.post("/event", json=event_data(8, 0, 9, 0, [first_room_id]))
+    events = [
+        event_data(10, 0, 11, 0, [first_room_id, second_room_id]),
+        event_data(8, 30, 9, 30, [first_room_id]),
+        event_data(10, 30, 11, 0, [second_room_id]),
+        event_data(11, 0, 11, 10, [second_room_id]),
+        event_data(11, 0, 12, 0, [999]),
+        event_data(11, 0, 12, 0, [second_room_id]),
+    ]
+
+    response = client.post("/events/bulk", json={"events": events, "mode": mode})
+
+    errors = [(result or {}).get("error") for result in response.json["results"]]
+    assert errors == [
+        None,
+        'Event date collides with an already existing event.',
+        'Event date collides with another event of the batch.',
+        'Event duration cant be shorter than 15 minutes.',
+        'Invalid value for roomsId parameter.',
+        None,
+    ]
+    with app.app_context():
+        booked = db.session.execute(db.select(Event.name)).scalars().all()
+    if mode == "atomic":
+        assert response.status_code == 400 and len(booked) == 1
+    else:
+        assert response.status_code == 200 and len(booked) == 3
+        assert client.get(f"/room/{second_room_id}/events").json[1]["id"] == response.json["results"][5]["id"]
+
+
+def test_events_bulk_batches_inserts(client, app, statements):
+    room_id = add_room(app)
+    events = [dict(event_data(hour, 0, hour + 1, 0, [room_id]), name=str(hour)) for hour in range(8, 20)]
+
+    statements.clear()
+    response = client.post("/events/bulk", json={"events": events})
+
+    assert sum(statement.startswith("INSERT INTO event ") for statement, _ in statements) == 1
+    with app.app_context():
+        names = dict(db.session.execute(db.select(Event.id, Event.name)).all())
+    assert [names[result["id"]] for result in response.json["results"]] == [event["name"] for event in events]
+
+
+@pytest.mark.parametrize("body", [[], [{"events": []}], "events", 1, {"events": []}, {"events": {}}])
+def test_events_bulk_invalid_body(body, client):
+    response = client.post("/events/bulk", json=body)
+
+    assert response.status_code == 400
+    assert b"Invalid value for events parameter." in response.data
+
+
+@pytest.mark.parametrize("path", ["/events?detail=full", "/user/events?detail=full",
+                                  "/room/{room_id}/events?detail=full", "/event/{event_id}?detail=full"])
+def test_event_details_query_count(path, client, app, statements):
+    first_room_id = add_room(app, "101")
+    second_room_id = add_room(app, "102")
+    headers = {"Authorization": f"Bearer {generate_token(1, 4, 0)}"}
+
+    def count_queries(url):
+        statements.clear()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        return len(statements), response.json
+
+    counts = []
+    for hours in ((8, 9), (10, 11, 12, 13)):
+        for hour in hours:
+            event_id = client.post("/event", headers=headers,
+                                   json=event_data(hour, 0, hour + 1, 0, [first_room_id, second_room_id])).json["id"]
+        count, payload = count_queries(path.format(room_id=first_room_id, event_id=event_id))
+        counts.append(count)
+
+    events = payload if isinstance(payload, list) else [payload]
+    assert counts[0] == counts[1]
+    assert all(event["roomsId"] == [first_room_id, second_room_id] and event["participantsCount"] == 1
+               for event in events)
@@ -0,0 +1,15 @@
+from datetime import datetime
+from flask.json.provider import DefaultJSONProvider
+from project.json_provider import FastJSONProvider
+
+
+def test_fast_json_provider_matches_default(app):
+    data = [{"id": 1, "name": "Event", "link": None, "begin": datetime(2030, 1, 1, 10, 0), "ownerId": "undefined"},
+            {"id": 2, "capacity": 10, "projector": True}]
+
+    fast = FastJSONProvider(app)
+    default = DefaultJSONProvider(app)
+
+    with app.app_context():
+        assert fast.response(data).get_data() == default.response(data).get_data()
+    assert fast.loads(fast.dumps(data)) == default.loads(default.dumps(data))
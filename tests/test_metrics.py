@@ -0,0 +1,62 @@
+import re
+import pytest
+import sqlalchemy as sa
+from project.app import create_app
+from project.metrics import metrics
+from project.models import db
+
+
+def sample(client, line_prefix):
+    text = client.get("/metrics").get_data(as_text=True)
+    match = re.search("^" + re.escape(line_prefix) + r" (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+def test_metrics(client):
+    requests = 'http_requests_total{route="/room/<room_id>",method="GET",status="400"}'
+    statements = 'http_request_sql_statements_sum{route="/room/<room_id>",method="GET"}'
+    hashes = 'operation_duration_seconds_count{operation="hash_password"}'
+    before = [sample(client, name) for name in (requests, statements, hashes)]
+
+    client.get("/room/999")
+    client.post("/login", json={"email": "admin", "password": "admin"})
+
+    after = [sample(client, name) for name in (requests, statements, hashes)]
+    assert after[0] == before[0] + 1
+    assert after[1] >= before[1] + 1
+    assert after[2] == before[2] + 1
+    assert client.get("/metrics").mimetype == "text/plain"
+
+
+def test_metrics_disabled(client, app):
+    requests = 'http_requests_total{route="/room/<room_id>",method="GET",status="400"}'
+    before = sample(client, requests)
+
+    app.config["METRICS_ENABLED"] = False
+    client.get("/room/999")
+    app.config["METRICS_ENABLED"] = True
+
+    assert sample(client, requests) == before
+
+
+def test_metrics_enabled_per_app(app):
+    other = create_app("sqlite://")
+    other.config.update({"TESTING": True, "METRICS_ENABLED": False, "REVOCATION_SWEEP_INTERVAL": 0,
+                         "CHANGE_LOG_COMPACT_INTERVAL": 0, "ARCHIVE_INTERVAL": 0})
+
+    other.test_client().get("/")
+
+    with app.app_context():
+        assert metrics.enabled
+    with other.app_context():
+        assert not metrics.enabled
+    assert not metrics.enabled
+
+
+def test_metrics_failed_statement(app):
+    with app.app_context():
+        connection = db.session.connection()
+        with pytest.raises(sa.exc.OperationalError):
+            connection.execute(sa.text("SELECT * FROM missing_table"))
+        assert connection.info.get("metrics_begin") == []
+        db.session.rollback()
@@ -0,0 +1,66 @@
+import sqlalchemy as sa
+from datetime import datetime, timedelta
+from project.app import DATE_FORMAT
+from project.functions import generate_token
+from project.models import db, Room, User, upgrade_schema
+
+
+def query_plans(app, statements):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            return [" | ".join(row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement,
+                                                                                parameters))
+                    for statement, parameters in list(statements) if statement.lstrip().upper().startswith("SELECT")]
+
+
+def assert_no_full_scan(plans, *tables):
+    for plan in plans:
+        for table in tables:
+            assert f"SCAN {table}" not in plan, plan
+
+
+def test_endpoint_queries_use_indexes(client, app, statements):
+    with app.app_context():
+        room = Room(name="101")
+        db.session.add(room)
+        db.session.commit()
+        room_id = room.id
+        admin_id = db.session.execute(db.select(User.id).filter_by(email="admin")).scalar_one()
+
+    headers = {"Authorization": f"Bearer {generate_token(admin_id)}"}
+    day = datetime.today() + timedelta(days=1)
+    data = {
+        "name": "Event",
+        "description": None,
+        "link": None,
+        "begin": day.replace(hour=10, minute=0).strftime(DATE_FORMAT),
+        "end": day.replace(hour=11, minute=0).strftime(DATE_FORMAT),
+        "roomsId": [room_id]
+    }
+
+    assert client.post("/event", headers=headers, json=data).status_code == 200
+    assert client.get(f"/room/{room_id}/events").status_code == 200
+    assert client.get("/user/events", headers=headers).status_code == 200
+    assert client.get("/user", headers=headers).status_code == 200
+
+    plans = query_plans(app, statements)
+    assert any("ix_room_event_room_id_event_id" in plan for plan in plans)
+    assert any("ix_event_ownerId_begin" in plan for plan in plans)
+    assert_no_full_scan(plans, "event", "room_event", "user_event", "token_blacklist")
+
+
+def test_upgrade_schema(app):
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(sa.text("DROP INDEX ix_room_event_room_id_event_id"))
+            connection.execute(sa.text("DROP INDEX ix_event_begin_end"))
+            connection.execute(sa.text("INSERT INTO room_event (room_id, event_id) VALUES (1, 1), (1, 1), (1, 2)"))
+
+        upgrade_schema()
+
+        indexes = {index["name"] for index in sa.inspect(db.engine).get_indexes("room_event")}
+        assert "ix_room_event_room_id_event_id" in indexes
+        indexes = {index["name"] for index in sa.inspect(db.engine).get_indexes("event")}
+        assert "ix_event_begin_end" in indexes
+        rows = db.session.execute(sa.text("SELECT room_id, event_id FROM room_event ORDER BY event_id")).all()
+        assert rows == [(1, 1), (1, 2)]
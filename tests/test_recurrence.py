@@ -0,0 +1,135 @@
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from project.app import DATE_FORMAT
+from project.functions import generate_token
+from project.models import db, EventSeries
+from project.recurrence import occurrences
+from tests.test_event import add_room, event_data
+
+
+def rule(begin, end, frequency, interval=1, count=None, until=None, exceptions=()):
+    return SimpleNamespace(begin=begin, end=end, frequency=frequency, interval=interval, count=count, until=until,
+                           exceptions=list(exceptions))
+
+
+def series_data(begin_hour, end_hour, rooms_id, **recurrence):
+    data = event_data(begin_hour, 0, end_hour, 0, rooms_id)
+    data["recurrence"] = {"frequency": "weekly", **recurrence}
+    return data
+
+
+def test_occurrences_weekly():
+    series = rule(datetime(2030, 1, 7, 10), datetime(2030, 1, 7, 11), "weekly", count=5, exceptions=["2030-01-21"])
+
+    assert [begin.day for begin, _ in occurrences(series)] == [7, 14, 28, 4]
+    assert list(occurrences(series, datetime(2030, 1, 14, 10, 30), datetime(2030, 1, 28, 10))) == \
+        [(datetime(2030, 1, 14, 10), datetime(2030, 1, 14, 11))]
+
+
+def test_occurrences_daily_until():
+    series = rule(datetime(2030, 1, 1, 10), datetime(2030, 1, 1, 11), "daily", interval=3,
+                  until=datetime(2030, 1, 10, 10))
+
+    assert [begin.day for begin, _ in occurrences(series)] == [1, 4, 7, 10]
+    assert [begin.day for begin, _ in occurrences(series, datetime(2030, 1, 5))] == [7, 10]
+
+
+def test_occurrences_monthly_skips_short_months():
+    series = rule(datetime(2030, 1, 31, 10), datetime(2030, 1, 31, 11), "monthly", count=3)
+
+    assert [begin.month for begin, _ in occurrences(series)] == [1, 3, 5]
+
+
+def test_series_post(client, app):
+    room_id = add_room(app)
+
+    response = client.post("/event", json=series_data(10, 11, [room_id], count=4, exceptions=[]))
+
+    assert response.status_code == 200
+    with app.app_context():
+        series = db.session.get(EventSeries, response.json["seriesId"])
+        assert series.lastEnd - series.end == timedelta(weeks=3)
+        assert [room.id for room in series.rooms] == [room_id]
+
+
+@pytest.mark.parametrize(
+    "recurrence",
+    [
+        {"frequency": "yearly", "count": 2},
+        {"frequency": "weekly"},
+        {"frequency": "weekly", "count": 2, "until": "2030-01-01T00:00:00"},
+        {"frequency": "weekly", "count": 501},
+        {"frequency": "weekly", "interval": 0, "count": 2},
+        {"frequency": "weekly", "until": "2000-01-01T00:00:00"},
+        {"frequency": "daily", "until": "2999-01-01T00:00:00"},
+        {"frequency": "weekly", "count": 2, "exceptions": ["tomorrow"]},
+    ]
+)
+def test_series_post_invalid(recurrence, client, app):
+    room_id = add_room(app)
+    data = event_data(10, 0, 11, 0, [room_id])
+    data["recurrence"] = recurrence
+
+    response = client.post("/event", json=data)
+
+    assert response.status_code == 400
+
+
+def test_series_collisions(client, app):
+    room_id = add_room(app)
+    week_later = event_data(10, 0, 11, 0, [room_id])
+    for key in ("begin", "end"):
+        week_later[key] = (datetime.strptime(week_later[key], DATE_FORMAT) + timedelta(weeks=1)).strftime(DATE_FORMAT)
+    client.post("/event", json=week_later)
+
+    colliding = client.post("/event", json=series_data(10, 11, [room_id], count=3))
+    excepted = client.post("/event", json=series_data(10, 11, [room_id], count=3, exceptions=[
+        week_later["begin"][:10]]))
+    single = client.post("/event", json=week_later | {"begin": week_later["begin"].replace("T10", "T11"),
+                                                      "end": week_later["end"].replace("T11", "T12")})
+    on_occurrence = client.post("/event", json=event_data(10, 30, 11, 30, [room_id]))
+    bulk = client.post("/events/bulk", json={"events": [event_data(10, 0, 10, 30, [room_id])]})
+
+    assert colliding.status_code == 400
+    assert excepted.status_code == 200
+    assert single.status_code == 200
+    assert on_occurrence.status_code == 400
+    assert bulk.json["results"][0]["error"] == 'Event date collides with an already existing event.'
+
+
+def test_series_room_events(client, app):
+    room_id = add_room(app)
+    series_id = client.post("/event", json=series_data(10, 11, [room_id], count=3)).json["seriesId"]
+    event_id = client.post("/event", json=event_data(8, 0, 9, 0, [room_id])).json["id"]
+    day = datetime.today() + timedelta(days=8)
+
+    upcoming = client.get(f"/room/{room_id}/events?limit=3&detail=full")
+    on_day = client.get(f"/room/{room_id}/events?day={day.day}&month={day.month}&year={day.year}")
+
+    assert [(event["id"], event.get("seriesId")) for event in upcoming.json] == \
+        [(event_id, None), (None, series_id), (None, series_id)]
+    assert upcoming.json[1]["roomsId"] == [room_id] and upcoming.json[1]["participantsCount"] == 0
+    assert [(event["seriesId"], event["begin"][17:22]) for event in on_day.json] == [(series_id, "10:00")]
+    assert client.get("/rooms/available", query_string={
+        "begin": day.replace(hour=10, minute=30, second=0).strftime(DATE_FORMAT),
+        "end": day.replace(hour=10, minute=45, second=0).strftime(DATE_FORMAT),
+    }).json == []
+
+
+def test_series_user_events(client, app):
+    room_id = add_room(app)
+    headers = {"Authorization": "Bearer " + generate_token(1, 4)}
+    client.post("/event", json=series_data(10, 11, [room_id], frequency="daily", count=5), headers=headers)
+    client.post("/event", json=event_data(12, 0, 13, 0, [room_id]), headers=headers)
+
+    pages, cursor = [], None
+    while True:
+        query = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = client.get("/user/events", query_string=query, headers=headers)
+        pages.append([event["id"] is None for event in response.json])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == [[True, False], [True, True], [True, True]]
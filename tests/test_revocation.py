@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from project.models import db, TokenBlacklist
+from project.revocation import RevocationList
+
+
+def test_revocation_sync(app):
+    first, second = RevocationList(), RevocationList()
+    first.init_app(app)
+    second.init_app(app)
+    expiration_date = datetime.now() + timedelta(hours=1)
+
+    with app.app_context():
+        assert not second.is_revoked("token")
+        db.session.add(TokenBlacklist(tokenValue="token", expirationDate=expiration_date))
+        db.session.commit()
+        first.revoke("token", expiration_date)
+
+        assert first.is_revoked("token")
+        assert not second.is_revoked("token")
+        second.sync()
+        assert second.is_revoked("token")
+
+
+def test_revocation_sweep(app):
+    revocations = RevocationList(app)
+    now = datetime.now()
+
+    with app.app_context():
+        db.session.add_all([
+            TokenBlacklist(tokenValue="expired", expirationDate=now - timedelta(hours=1)),
+            TokenBlacklist(tokenValue="expired-newest", expirationDate=now - timedelta(hours=1)),
+        ])
+        db.session.commit()
+        revocations.revoke("expired", now - timedelta(hours=1))
+        revocations.revoke("valid", now + timedelta(hours=1))
+
+        revocations.sweep()
+
+        assert not revocations.is_revoked("expired")
+        assert revocations.is_revoked("valid")
+        tokens = db.session.execute(db.select(TokenBlacklist.tokenValue)).scalars().all()
+        assert tokens == ["expired-newest"]
@@ -1,5 +1,9 @@
+import pytest
+from datetime import date, datetime, timedelta
+from project.app import DATE_FORMAT
 from project.functions import generate_token
-from project.models import db, User
+from project.models import db, Event, Room, User
+from project.occupancy import slot_masks
 
 
 def test_room_post(client, app):
@@ -24,3 +28,149 @@ def test_room_post(client, app):
     with app.app_context():
         response = client.post("/room", headers=headers, json=data)
     assert response.status_code == 200
+
+
+def test_rooms_pagination(client, app):
+    with app.app_context():
+        db.session.add_all([Room(name=str(number)) for number in range(5)])
+        db.session.commit()
+
+    first_page = client.get("/rooms?limit=2")
+    second_page = client.get(f"/rooms?limit=2&cursor={first_page.headers['X-Next-Cursor']}")
+    last_page = client.get(f"/rooms?limit=2&cursor={second_page.headers['X-Next-Cursor']}")
+
+    assert [room["name"] for room in first_page.json] == ["0", "1"]
+    assert [room["name"] for room in second_page.json] == ["2", "3"]
+    assert [room["name"] for room in last_page.json] == ["4"]
+    assert "X-Next-Cursor" not in last_page.headers
+
+
+@pytest.mark.parametrize("query", ["limit=101", "limit=-1", "cursor=abc", "cursor=WyJhIl0="])
+def test_rooms_pagination_invalid(query, client):
+    response = client.get(f"/rooms?{query}")
+    assert response.status_code == 400
+
+
+def test_room_post_authorizes_from_claims(client, app, statements):
+    data = {"name": "101", "description": None, "capacity": 10, "projector": True, "conditioning": False,
+            "tv": False, "ethernet": False, "wifi": True, "whiteboard": False}
+    editor_headers = {"Authorization": f"Bearer {generate_token(1000, 2, 0)}"}
+    user_headers = {"Authorization": f"Bearer {generate_token(1001, 1, 0)}"}
+
+    assert client.post("/room", headers=user_headers, json=data).status_code == 401
+    statements.clear()
+    response = client.post("/room", headers=editor_headers, json=data)
+
+    assert response.status_code == 200
+    assert [statement.split("(")[0].strip() for statement, _ in statements] == ["INSERT INTO room",
+                                                                               "INSERT INTO change_log"]
+
+
+def test_rooms_available(client, app):
+    day = datetime.today() + timedelta(days=1)
+
+    def at(hour, minute):
+        return day.replace(hour=hour, minute=minute, second=0).strftime(DATE_FORMAT)
+
+    with app.app_context():
+        rooms = [Room(name="101", capacity=10, projector=True), Room(name="102", capacity=30, projector=True),
+                 Room(name="103", capacity=30, projector=False)]
+        db.session.add_all(rooms)
+        db.session.commit()
+        rooms_id = [room.id for room in rooms]
+
+    def available(begin, end, **filters):
+        response = client.get("/rooms/available", query_string={"begin": begin, "end": end, **filters})
+        assert response.status_code == 200
+        return [room["name"] for room in response.json]
+
+    assert available(at(10, 0), at(11, 0)) == ["101", "102", "103"]
+    client.post("/event", json={"name": "Event", "description": None, "link": None, "begin": at(10, 0),
+                                "end": at(11, 0), "roomsId": [rooms_id[0]]})
+    client.post("/event", json={"name": "Event", "description": None, "link": None, "begin": at(9, 5),
+                                "end": at(9, 20), "roomsId": [rooms_id[1]]})
+
+    assert available(at(10, 0), at(11, 0)) == ["102", "103"]
+    assert available(at(9, 20), at(10, 0)) == ["101", "102", "103"]
+    assert available(at(9, 0), at(9, 10)) == ["101", "103"]
+    assert available(at(10, 30), at(12, 0), capacity=20, projector="true") == ["102"]
+
+
+@pytest.mark.parametrize("query", ["begin=2030-01-01T10:00:00", "begin=2030-01-01T10:00:00&end=2030-01-01T09:00:00",
+                                   "begin=2030-01-01T10:00:00&end=2030-01-02T09:00:00",
+                                   "begin=2030-01-01T10:00:00&end=2030-01-01T11:00:00&wifi=maybe"])
+def test_rooms_available_invalid(query, client):
+    response = client.get(f"/rooms/available?{query}")
+    assert response.status_code == 400
+
+
+def test_slot_masks():
+    day = datetime(2030, 1, 1)
+
+    assert slot_masks(day.replace(hour=10), day.replace(hour=11), day.date()) == (0b1111 << 40, 0b1111 << 40)
+    assert slot_masks(day.replace(hour=10, minute=5), day.replace(hour=10, minute=40), day.date()) \
+        == (0b111 << 40, 0b1 << 41)
+    assert slot_masks(day.replace(hour=10), day.replace(hour=11), date(2030, 1, 2)) == (0, 0)
+
+
+def test_room_conditional_get(client, app, statements):
+    data = {"name": "101", "description": None, "capacity": 10, "projector": True, "conditioning": False,
+            "tv": False, "ethernet": False, "wifi": True, "whiteboard": False}
+    headers = {"Authorization": f"Bearer {generate_token(1000, 2, 0)}"}
+    client.post("/room", headers=headers, json=data)
+
+    first = client.get("/rooms")
+    statements.clear()
+    cached = client.get("/rooms")
+    not_modified = client.get("/rooms", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert statements == []
+    assert cached.get_data() == first.get_data() and cached.headers["ETag"] == first.headers["ETag"]
+    assert not_modified.status_code == 304
+
+    client.post("/room", headers=headers, json=dict(data, name="102"))
+    changed = client.get("/rooms", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert changed.status_code == 200
+    assert [room["name"] for room in changed.json] == ["101", "102"]
+
+
+def test_occupancy_discards_loads_raced_by_bookings(app, monkeypatch):
+    day = datetime.today().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    occupancy = app.extensions["occupancy"]
+    load_day = occupancy._load_day
+
+    def book(name, hour):
+        event = Event(name=name, begin=day.replace(hour=hour), end=day.replace(hour=hour + 1), rooms=[room])
+        db.session.add(event)
+        db.session.commit()
+        occupancy.add_event([room.id], event.begin, event.end)
+        return event
+
+    def racing_load(name, hour):
+        def load(*args):
+            # The day is read before the booking commits, and stored after it is applied.
+            result = load_day(*args)
+            monkeypatch.setattr(occupancy, "_load_day", load_day)
+            book(name, hour)
+            return result
+        monkeypatch.setattr(occupancy, "_load_day", load)
+
+    with app.app_context():
+        room = Room(name="101")
+        db.session.add(room)
+        db.session.commit()
+
+        racing_load("First", 10)
+        assert occupancy.find_free_rooms([room.id], day, day.replace(hour=11)) == []
+        assert occupancy.find_free_rooms([room.id], day, day.replace(hour=11)) == []
+
+        moved = book("Moved", 14)
+        moved.begin, moved.end = day.replace(hour=16), day.replace(hour=17)
+        db.session.commit()
+        racing_load("Second", 12)
+        occupancy.remove_event([room.id], day.replace(hour=14), day.replace(hour=15))
+        occupancy.add_event([room.id], moved.begin, moved.end)
+
+        assert occupancy.find_free_rooms([room.id], day.replace(hour=12), day.replace(hour=13)) == []
+        assert occupancy.find_free_rooms([room.id], day.replace(hour=14), day.replace(hour=15)) == [room.id]
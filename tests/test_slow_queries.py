@@ -0,0 +1,44 @@
+import pytest
+import sqlalchemy as sa
+from project.functions import generate_token
+from project.models import db
+
+
+def test_slow_queries(client, app):
+    admin_headers = {"Authorization": f"Bearer {generate_token(1, 4, 0)}"}
+    user_headers = {"Authorization": f"Bearer {generate_token(1000, 1, 0)}"}
+
+    client.get("/room/1/events?day=1&month=1&year=2030")
+    assert client.get("/stats/slow-queries", headers=admin_headers).json == []
+
+    app.config["SLOW_QUERY_THRESHOLD"] = 0
+    client.get("/room/1/events?day=1&month=1&year=2030")
+    app.config["SLOW_QUERY_THRESHOLD"] = None
+
+    entries = client.get("/stats/slow-queries", headers=admin_headers).json
+    assert client.get("/stats/slow-queries", headers=user_headers).status_code == 401
+    assert entries[-1]["route"] == "GET /room/<room_id>/events"
+    assert entries[-1]["parameters"][0] == 1
+    assert any("ix_room_event_room_id_event_id" in detail for detail in entries[-1]["plan"])
+
+
+def test_slow_queries_log_redacts_parameters(client, app, caplog):
+    app.config["SLOW_QUERY_THRESHOLD"] = 0
+    client.post("/login", json={"email": "secret@test.com", "password": "password"})
+    app.config["SLOW_QUERY_THRESHOLD"] = None
+
+    messages = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Slow query")]
+    assert messages and not any("secret@test.com" in message for message in messages)
+    assert any(" parameters: str" in message for message in messages)
+    assert any("secret@test.com" in entry["parameters"] for entry in app.extensions["slow_queries"].entries())
+
+
+def test_slow_queries_failed_statement(app):
+    app.config["SLOW_QUERY_THRESHOLD"] = 0
+    with app.app_context():
+        connection = db.session.connection()
+        with pytest.raises(sa.exc.OperationalError):
+            connection.execute(sa.text("SELECT * FROM missing_table"))
+        assert connection.info.get("slow_query_begin") == []
+        db.session.rollback()
+    app.config["SLOW_QUERY_THRESHOLD"] = None
@@ -0,0 +1,60 @@
+import threading
+from datetime import datetime, timedelta
+from project.app import DATE_FORMAT, create_app
+from project.models import db, Event, Room
+
+READERS = 8
+WRITERS = 4
+EVENTS_PER_WRITER = 10
+
+
+def test_production_profile_concurrency(tmp_path):
+    app = create_app(f"sqlite:///{tmp_path / 'database.db'}")
+    app.config.update({"TESTING": True, "REVOCATION_SWEEP_INTERVAL": 0})
+    with app.app_context():
+        db.create_all()
+        rooms = [Room(name=str(number), capacity=10) for number in range(WRITERS)]
+        db.session.add_all(rooms)
+        db.session.commit()
+        rooms_id = [room.id for room in rooms]
+        journal_mode = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+
+    day = datetime.today().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    barrier = threading.Barrier(READERS + WRITERS)
+    writers_done = threading.Event()
+    statuses = []
+
+    def write(room_id):
+        client = app.test_client()
+        barrier.wait()
+        for number in range(EVENTS_PER_WRITER):
+            begin = day + timedelta(minutes=30 * number)
+            response = client.post("/event", json={"name": "Event", "description": None, "link": None,
+                                                   "begin": begin.strftime(DATE_FORMAT),
+                                                   "end": (begin + timedelta(minutes=30)).strftime(DATE_FORMAT),
+                                                   "roomsId": [room_id]})
+            statuses.append(response.status_code)
+
+    def read(number):
+        client = app.test_client()
+        barrier.wait()
+        while not writers_done.is_set():
+            room_id = rooms_id[number % len(rooms_id)]
+            statuses.append(client.get(f"/room/{room_id}/events?day={day.day}&month={day.month}&year={day.year}")
+                            .status_code)
+            statuses.append(client.get("/events?limit=20").status_code)
+
+    writers = [threading.Thread(target=write, args=(room_id,)) for room_id in rooms_id]
+    readers = [threading.Thread(target=read, args=(number,)) for number in range(READERS)]
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writers_done.set()
+    for thread in readers:
+        thread.join()
+
+    assert journal_mode == "wal"
+    assert set(statuses) == {200}
+    with app.app_context():
+        assert db.session.execute(db.select(db.func.count(Event.id))).scalar() == WRITERS * EVENTS_PER_WRITER
@@ -0,0 +1,242 @@
+import json
+from datetime import datetime, timedelta
+import project.app
+from project.app import DATE_FORMAT, create_app
+from project.functions import generate_token
+from project.models import db, ArchivedEvent, ChangeLog, Event, EventSeries, Room, user_event_m2m
+
+ADMIN_HEADERS = {"Authorization": f"Bearer {generate_token(1, 4, 0)}"}
+
+
+def ndjson(*records):
+    return "".join((record if isinstance(record, str) else json.dumps(record)) + "\n" for record in records)
+
+
+def post_import(client, kind, data, content_type="application/x-ndjson", query="", headers=ADMIN_HEADERS):
+    return client.post(f"/admin/import/{kind}{query}", data=data, content_type=content_type, headers=headers)
+
+
+def test_import_rooms(client, app):
+    data = "name,description,capacity,projector,conditioning,tv,ethernet,wifi,whiteboard\n" \
+           "101,Sala 101,10,true,false,,,1,0\n" \
+           "102,,ten,true,false,false,false,true,false\n" \
+           ",No name,10,true,false,false,false,true,false\n"
+
+    rejected = post_import(client, "rooms", data, "text/csv",
+                           headers={"Authorization": f"Bearer {generate_token(1000, 2, 0)}"})
+    response = post_import(client, "rooms", data, "text/csv")
+
+    assert rejected.status_code == 401
+    assert response.status_code == 200
+    assert response.json["results"][1:] == [{"error": "Invalid room data."}, {"error": "Invalid room data."}]
+    with app.app_context():
+        room = db.session.get(Room, response.json["results"][0]["id"])
+        assert (room.name, room.description, room.capacity, room.projector, room.tv, room.wifi) \
+            == ("101", "Sala 101", 10, True, None, True)
+        assert db.session.execute(db.select(ChangeLog.entityId).filter_by(entity="room")).scalars().all() \
+            == [room.id]
+    assert post_import(client, "rooms", data, "text/plain").status_code == 400
+
+
+def test_import_batches_inserts(client, app, statements):
+    rooms = [{"name": str(number), "description": None, "capacity": number, "projector": True, "conditioning": False,
+              "tv": False, "ethernet": False, "wifi": True, "whiteboard": False} for number in range(50)]
+
+    statements.clear()
+    response = post_import(client, "rooms", ndjson(*rooms))
+
+    assert [statement.split("(")[0].strip() for statement, _ in statements if statement.startswith("INSERT")] \
+        == ["INSERT INTO room", "INSERT INTO change_log"]
+    with app.app_context():
+        names = dict(db.session.execute(db.select(Room.id, Room.name)).all())
+    assert [names[result["id"]] for result in response.json["results"]] == [room["name"] for room in rooms]
+
+
+def test_import_events(client, app, monkeypatch):
+    monkeypatch.setattr(project.app, "IMPORT_BATCH_SIZE", 2)
+    with app.app_context():
+        room = Room(name="101")
+        db.session.add(room)
+        db.session.commit()
+        room_id = room.id
+    day = datetime.today().replace(second=0, microsecond=0) + timedelta(days=1)
+
+    def event(begin_hour, end_hour, **fields):
+        return dict({"name": "Event", "description": None, "link": None, "roomsId": [room_id],
+                     "begin": day.replace(hour=begin_hour, minute=0).strftime(DATE_FORMAT),
+                     "end": day.replace(hour=end_hour, minute=0).strftime(DATE_FORMAT)}, **fields)
+
+    response = post_import(client, "events", ndjson(
+        event(10, 11), event(10, 12), event(12, 13, roomsId=[room_id + 1]), event(12, 13, ownerId=1),
+        event(11, 13), "not json", event(14, 15, ownerId=2),
+        dict(event(14, 15), begin="2020-01-01T14:00:00", end="2020-01-01T15:00:00")))
+
+    results = response.json["results"]
+    assert [result.get("error") for result in results] == [
+        None, "Event date collides with another event of the batch.", "Invalid value for roomsId parameter.", None,
+        "Event date collides with an already existing event.", "Invalid event data.",
+        "User with provided id doesnt exist.", "Invalid begin date."]
+    assert all(len(results[index]["password"]) == 8 for index in (0, 3))
+
+    patched = client.patch(f"/event/{results[3]['id']}?password={results[3]['password']}", json=event(16, 17))
+    assert patched.status_code == 200
+    with app.app_context():
+        assert db.session.execute(db.select(user_event_m2m)).all() == [(1, results[3]["id"])]
+    assert [event["begin"][17:22] for event in client.get(f"/room/{room_id}/events").json] == ["10:00", "16:00"]
+
+
+def test_import_users(client):
+    user = {"email": "user@test.com", "firstName": "Jan", "lastName": "Kowalski", "password": "password"}
+
+    response = post_import(client, "users", ndjson(
+        user, dict(user, firstName="Anna"), dict(user, email="other@test.com", password="short"),
+        dict(user, email="invalid"), dict(user, email="editor@test.com", role_id=2),
+        dict(user, email="role@test.com", role_id=5), {"email": "none@test.com"}))
+
+    assert [result.get("error") for result in response.json["results"]] == [
+        None, "User with provided email already exist.", "Password cannot be shorter than 6 characters",
+        "Invalid email.", None, "Invalid roleId value", "Invalid user data."]
+    login = client.post("/login", json={"email": "editor@test.com", "password": "password"})
+    assert login.status_code == 200
+    assert client.get("/user", headers={"Authorization": f"Bearer {login.json['token']}"}).json["firstName"] == "Jan"
+
+
+def test_export_and_restore(client, app, tmp_path):
+    day = datetime.today().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    post_import(client, "rooms", "name,description,capacity,projector,conditioning,tv,ethernet,wifi,whiteboard\n"
+                                 "101,\"Sala, 101\",10,true,false,false,false,true,false\n102,,,,,,,,\n", "text/csv")
+    post_import(client, "users", ndjson({"email": "user@test.com", "firstName": "Jan", "lastName": "Kowalski",
+                                         "password": "password"}))
+    with app.app_context():
+        db.session.add(Event(name="Past", begin=day - timedelta(days=60), end=day - timedelta(days=60, hours=-1)))
+        db.session.commit()
+    post_import(client, "events", ndjson(
+        {"name": "Event", "description": "Ż", "link": None, "begin": day.strftime(DATE_FORMAT),
+         "end": (day + timedelta(hours=1)).strftime(DATE_FORMAT), "roomsId": [1, 2], "ownerId": 1,
+         "participantsId": [2]}))
+    series = client.post("/event", headers=ADMIN_HEADERS, json={
+        "name": "Series", "description": None, "link": None, "roomsId": [2],
+        "begin": (day + timedelta(hours=2)).strftime(DATE_FORMAT),
+        "end": (day + timedelta(hours=3)).strftime(DATE_FORMAT),
+        "recurrence": {"frequency": "weekly", "count": 3,
+                       "exceptions": [(day + timedelta(days=7)).date().isoformat()]}}).json
+    with app.app_context():
+        assert app.extensions["archive"].archive() == 1
+        assert db.session.execute(db.select(ArchivedEvent.name)).scalar_one() == "Past"
+
+    assert client.get("/admin/export/users", headers={"Authorization": f"Bearer {generate_token(2, 1, 0)}"}) \
+        .status_code == 401
+    assert client.get("/admin/export/users?format=xml", headers=ADMIN_HEADERS).status_code == 400
+    exports = {(kind, fmt): client.get(f"/admin/export/{kind}?format={fmt}", headers=ADMIN_HEADERS).get_data()
+               for kind in ("users", "rooms", "events", "series") for fmt in ("csv", "ndjson")}
+    events = [json.loads(line) for line in exports[("events", "ndjson")].splitlines()]
+    assert [(event["name"], event["roomsId"], event["participantsId"]) for event in events] == [
+        ("Event", [1, 2], [1, 2]), ("Past", [], [])]
+    assert [(record["id"], record["roomsId"], record["count"], len(record["exceptions"]))
+            for record in map(json.loads, exports[("series", "ndjson")].splitlines())] \
+        == [(series["seriesId"], [2], 3, 1)]
+
+    restored = create_app("sqlite://")
+    restored.config.update({"TESTING": True, "REVOCATION_SWEEP_INTERVAL": 0, "CHANGE_LOG_COMPACT_INTERVAL": 0,
+                            "ARCHIVE_INTERVAL": 0})
+    with restored.app_context():
+        db.create_all()
+    (tmp_path / "users.csv").write_bytes(exports[("users", "csv")])
+    (tmp_path / "rooms.csv").write_bytes(exports[("rooms", "csv")])
+    result = restored.test_cli_runner().invoke(args=["import-data", "users", str(tmp_path / "users.csv"),
+                                                     "--restore"])
+    # The default administrator has no name, which registration requires.
+    assert result.output == "Record 1: All variables must be provided\nImported 1 of 2 users.\n"
+    with restored.app_context():
+        db.session.execute(db.insert(project.models.User), [{"id": 1, "email": "admin", "password": "admin",
+                                                             "role_id": 4}])
+        db.session.commit()
+    restored.test_cli_runner().invoke(args=["import-data", "rooms", str(tmp_path / "rooms.csv"), "--restore"])
+    restored_client = restored.test_client()
+    response = post_import(restored_client, "events", exports[("events", "csv")], "text/csv", "?restore=true")
+    assert response.json["results"] == [{"id": events[0]["id"]}, {"id": events[1]["id"]}]
+    assert post_import(restored_client, "events", exports[("events", "ndjson")], query="?restore=true").json \
+        == {"results": [{"error": "Event with provided id already exist."}] * 2}
+    response = post_import(restored_client, "series", exports[("series", "csv")], "text/csv", "?restore=true")
+    assert response.json["results"] == [{"id": series["seriesId"]}]
+    with restored.app_context():
+        assert db.session.execute(db.select(ChangeLog.entityId).filter_by(entity="series")).scalars().all() \
+            == [series["seriesId"]]
+        # The restored past event is back in the hot table until the next archival.
+        assert restored.extensions["archive"].archive() == 1
+    for kind, fmt in exports:
+        export = restored_client.get(f"/admin/export/{kind}?format={fmt}", headers=ADMIN_HEADERS).get_data()
+        assert export == exports[(kind, fmt)]
+
+    result = restored.test_cli_runner().invoke(args=["export-data", "rooms", str(tmp_path / "backup.csv")])
+    assert result.exit_code == 0 and (tmp_path / "backup.csv").read_bytes() == exports[("rooms", "csv")]
+
+    # The occurrences of the restored series are booked, except on the dates of its exceptions.
+    assert [restored_client.post("/event", json={
+        "name": "Other", "description": None, "link": None, "roomsId": [2],
+        "begin": (day + timedelta(days=days, hours=2)).strftime(DATE_FORMAT),
+        "end": (day + timedelta(days=days, hours=3)).strftime(DATE_FORMAT)}).status_code for days in (14, 7)] \
+        == [400, 200]
+
+
+def test_import_series(client, app):
+    with app.app_context():
+        db.session.add(Room(name="101"))
+        db.session.commit()
+    day = datetime.today().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    def series(hours, **fields):
+        return dict({"name": "Series", "description": None, "link": None, "roomsId": [1], "frequency": "daily",
+                     "begin": (day + timedelta(hours=hours)).strftime(DATE_FORMAT),
+                     "end": (day + timedelta(hours=hours + 1)).strftime(DATE_FORMAT), "count": 3}, **fields)
+
+    client.post("/event", json={"name": "Event", "description": None, "link": None, "roomsId": [1],
+                                "begin": (day + timedelta(days=2)).strftime(DATE_FORMAT),
+                                "end": (day + timedelta(days=2, hours=1)).strftime(DATE_FORMAT)})
+    response = post_import(client, "series", ndjson(
+        series(2), series(2, interval=2), series(0), series(4, count=None), series(4, frequency="yearly"),
+        series(4, until=(day + timedelta(days=1)).strftime(DATE_FORMAT), count=None, exceptions=["x"]),
+        series(4, ownerId=1, exceptions=[(day + timedelta(days=1)).date().isoformat()])))
+
+    results = response.json["results"]
+    assert [result.get("error") for result in results] == [
+        None, "Event date collides with another event of the batch.",
+        "Event date collides with an already existing event.", "Exactly one of count and until has to be provided.",
+        "Invalid value for frequency parameter.", "Invalid value for exceptions parameter.", None]
+    assert len(results[0]["password"]) == 8
+    with app.app_context():
+        assert db.session.execute(db.select(EventSeries.exceptions, EventSeries.lastEnd)
+                                  .filter_by(id=results[6]["id"])).one() \
+            == ([(day + timedelta(days=1)).date().isoformat()], day + timedelta(days=2, hours=5))
+
+
+def test_export_and_restore_anonymous_events(client, app):
+    day = datetime.today().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    post_import(client, "rooms", ndjson({"name": "101", "description": None, "capacity": None, "projector": None,
+                                         "conditioning": None, "tv": None, "ethernet": None, "wifi": None,
+                                         "whiteboard": None}))
+    anonymous = client.post("/event", json={"name": "Anonymous", "description": None, "link": None, "roomsId": [1],
+                                            "begin": day.strftime(DATE_FORMAT),
+                                            "end": (day + timedelta(hours=1)).strftime(DATE_FORMAT)}).json
+    with app.app_context():
+        # Anonymous events used to be stored with an 'undefined' owner.
+        db.session.execute(db.insert(Event), [{"name": "Legacy", "begin": day + timedelta(hours=2),
+                                               "end": day + timedelta(hours=3), "ownerId": "undefined"}])
+        db.session.commit()
+        assert db.session.get(Event, anonymous["id"]).ownerId is None
+
+    rooms = client.get("/admin/export/rooms", headers=ADMIN_HEADERS).get_data()
+    events = client.get("/admin/export/events", headers=ADMIN_HEADERS).get_data()
+    assert [json.loads(line)["ownerId"] for line in events.splitlines()] == [None, None]
+
+    restored = create_app("sqlite://")
+    restored.config.update({"TESTING": True, "REVOCATION_SWEEP_INTERVAL": 0, "CHANGE_LOG_COMPACT_INTERVAL": 0,
+                            "ARCHIVE_INTERVAL": 0})
+    with restored.app_context():
+        db.create_all()
+    restored_client = restored.test_client()
+    post_import(restored_client, "rooms", rooms, query="?restore=true")
+    response = post_import(restored_client, "events", events, query="?restore=true")
+
+    assert [result.get("id") for result in response.json["results"]] == [anonymous["id"], anonymous["id"] + 1]
+    assert restored_client.get("/admin/export/events", headers=ADMIN_HEADERS).get_data() == events
@@ -1,5 +1,7 @@
+import re
 import pytest
-from project.models import User
+from project.functions import generate_token, token_cache
+from project.models import db, User
 
 
 @pytest.mark.parametrize(
@@ -58,3 +60,77 @@ def test_login(email, password, statuscode, client, app):
     response = client.post("/login", json={"email": email, "password": password})
 
     assert response.status_code == statuscode
+
+
+def test_token_cache(client, app):
+    response = client.post("/register", json={"email": "test@test.com", "firstName": "test",
+                                               "lastName": "test", "password": "test123"})
+    headers = {"Authorization": f"Bearer {response.json['token']}"}
+    token_cache.clear()
+
+    client.get("/user", headers=headers)
+    client.get("/user", headers=headers)
+    assert token_cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    client.get("/logout", headers=headers)
+    assert token_cache.stats()["size"] == 0
+    assert client.get("/user", headers=headers).status_code == 401
+
+
+def test_token_cache_stats_requires_admin(client):
+    user_headers = {"Authorization": f"Bearer {generate_token(1000, 1, 0)}"}
+    admin_headers = {"Authorization": f"Bearer {generate_token(1, 4, 0)}"}
+
+    assert client.get("/stats/token-cache").status_code == 401
+    assert client.get("/stats/token-cache", headers=user_headers).status_code == 401
+    assert client.get("/stats/token-cache", headers=admin_headers).json["size"] >= 1
+
+
+def test_change_user_role_revokes_tokens(client, app):
+    response = client.post("/register", json={"email": "test@test.com", "firstName": "test",
+                                               "lastName": "test", "password": "test123"})
+    user_headers = {"Authorization": f"Bearer {response.json['token']}"}
+    with app.app_context():
+        admin = db.session.execute(db.select(User).filter_by(email="admin")).scalar_one()
+        user_id = db.session.execute(db.select(User.id).filter_by(email="test@test.com")).scalar_one()
+        admin_headers = {"Authorization": f"Bearer {generate_token(admin.id, admin.role_id, admin.tokenVersion)}"}
+
+    assert client.get("/user", headers=user_headers).status_code == 200
+    response = client.patch(f"/user/{user_id}", headers=admin_headers, json={"roleId": 2})
+    assert response.status_code == 200
+
+    assert client.get("/user", headers=user_headers).status_code == 401
+    token = client.post("/login", json={"email": "test@test.com", "password": "test123"}).json["token"]
+    assert client.get("/user", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+
+def test_user_cache(client, app, statements):
+    response = client.post("/register", json={"email": "test@test.com", "firstName": "test",
+                                               "lastName": "test", "password": "test123"})
+    headers = {"Authorization": f"Bearer {response.json['token']}"}
+    user_cache = app.extensions["user_cache"]
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id).filter_by(email="test@test.com")).scalar_one()
+        admin_headers = {"Authorization": f"Bearer {generate_token(1, 4, 0)}"}
+
+    statements.clear()
+    first = client.get("/user", headers=headers)
+    second = client.get("/user", headers=headers)
+
+    assert first.json == second.json == {"email": "test@test.com", "firstName": "test", "lastName": "test"}
+    assert len([statement for statement, _ in statements if re.search(r"FROM user\s", statement)]) == 1
+    assert user_cache.stats()["hits"] == 1
+
+    client.patch(f"/user/{user_id}", headers=admin_headers, json={"roleId": 2})
+    with app.app_context():
+        assert user_cache.get(user_id).role_id == 2
+
+
+def test_user_events_rejects_revoked_token(client, app):
+    response = client.post("/register", json={"email": "test@test.com", "firstName": "test",
+                                               "lastName": "test", "password": "test123"})
+    headers = {"Authorization": f"Bearer {response.json['token']}"}
+
+    assert client.get("/user/events", headers=headers).status_code == 200
+    client.get("/logout", headers=headers)
+    assert client.get("/user/events", headers=headers).status_code == 401